@@ -27,12 +27,14 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/tms_cron.xml',
         'views/route_area_views.xml',
         'views/tms_route_views.xml',
         'views/tms_route_stop_views.xml',
         'views/stock_picking_batch_views.xml',
         'views/stock_picking_views.xml',
         'views/res_partner_views.xml',
+        'views/stock_warehouse_views.xml',
         'views/tms_menu.xml',
         'wizard/tms_route_stop_adjust_wizard_views.xml',
     ],
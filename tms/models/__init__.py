@@ -4,4 +4,5 @@ from . import tms_route_stop
 from . import stock_picking
 from . import stock_picking_batch
 from . import route_area
-from . import res_partner
\ No newline at end of file
+from . import res_partner
+from . import stock_warehouse
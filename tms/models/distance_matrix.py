@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import math
+
+# Radius of earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+# Distance returned when one of the points has no coordinates, so that such
+# stops are always considered far away (same convention as
+# tms.route._calculate_haversine_distance)
+UNKNOWN_DISTANCE = 999999
+
+
+class DistanceMatrix(object):
+    """
+    Haversine distance matrix over a fixed list of points.
+
+    Coordinates are converted to radians once and the full matrix is computed
+    in a single pass when the object is built. Sequencing, splitting and
+    combining heuristics then look up leg lengths by index instead of calling
+    the haversine formula pair by pair.
+
+    Points are identified by ``keys`` (stop ids, a depot marker, ...) and can be
+    looked up with ``index_of``.
+    """
+
+    def __init__(self, coordinates, keys=None):
+        self.coordinates = [(lat or 0.0, lng or 0.0) for lat, lng in coordinates]
+        self.keys = list(keys) if keys is not None else list(range(len(self.coordinates)))
+        if len(self.keys) != len(self.coordinates):
+            raise ValueError("DistanceMatrix needs one key per coordinate")
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        self.located = [bool(lat and lng) for lat, lng in self.coordinates]
+        self.rows = self._compute_rows()
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def _compute_rows(self):
+        """Compute the symmetric matrix, evaluating each pair only once"""
+        size = len(self.coordinates)
+        lats = [math.radians(lat) for lat, _lng in self.coordinates]
+        lngs = [math.radians(lng) for _lat, lng in self.coordinates]
+        cos_lats = [math.cos(lat) for lat in lats]
+        rows = [[0.0] * size for _i in range(size)]
+
+        for i in range(size):
+            row_i = rows[i]
+            if not self.located[i]:
+                for j in range(size):
+                    if j != i:
+                        row_i[j] = UNKNOWN_DISTANCE
+                        rows[j][i] = UNKNOWN_DISTANCE
+                continue
+            lat_i, lng_i, cos_i = lats[i], lngs[i], cos_lats[i]
+            for j in range(i + 1, size):
+                if not self.located[j]:
+                    continue
+                a = (math.sin((lats[j] - lat_i) / 2) ** 2 +
+                     cos_i * cos_lats[j] * math.sin((lngs[j] - lng_i) / 2) ** 2)
+                distance = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+                row_i[j] = distance
+                rows[j][i] = distance
+        return rows
+
+    def index_of(self, key):
+        return self._index[key]
+
+    def distance(self, i, j):
+        """Distance in km between the points at indexes ``i`` and ``j``"""
+        return self.rows[i][j]
+
+    def is_known(self, i, j):
+        """Whether both points have coordinates, i.e. the leg has a real length"""
+        return self.located[i] and self.located[j]
+
+    def route_length(self, sequence):
+        """
+        Total length of a path visiting ``sequence`` (indexes) in order.
+        Legs touching a point without coordinates are ignored.
+        """
+        rows = self.rows
+        located = self.located
+        total = 0.0
+        for i, j in zip(sequence, sequence[1:]):
+            if located[i] and located[j]:
+                total += rows[i][j]
+        return total
+
+    def nearest_neighbour(self, start, candidates):
+        """
+        Order ``candidates`` (indexes) by repeatedly visiting the closest
+        remaining point, starting from ``start``.
+
+        Points without coordinates cannot be compared: when the current
+        position is unknown or no remaining candidate is located, the next
+        candidate in input order is taken. The current position only moves to
+        points that have coordinates.
+        """
+        remaining = list(candidates)
+        ordered = []
+        current = start
+        rows = self.rows
+        located = self.located
+
+        while remaining:
+            best_pos = None
+            if current is not None and located[current]:
+                current_row = rows[current]
+                best_distance = float('inf')
+                for pos, candidate in enumerate(remaining):
+                    if located[candidate] and current_row[candidate] < best_distance:
+                        best_distance = current_row[candidate]
+                        best_pos = pos
+            if best_pos is None:
+                best_pos = 0
+
+            chosen = remaining.pop(best_pos)
+            ordered.append(chosen)
+            if located[chosen]:
+                current = chosen
+
+        return ordered
+
+    def min_distance_between(self, group_a, group_b):
+        """Smallest known distance between any point of ``group_a`` and ``group_b``"""
+        best = UNKNOWN_DISTANCE
+        for i in group_a:
+            if not self.located[i]:
+                continue
+            row = self.rows[i]
+            for j in group_b:
+                if self.located[j] and row[j] < best:
+                    best = row[j]
+        return best
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import time
+
+# Savings smaller than this (km) are treated as noise to avoid endless cycling
+# on floating point rounding
+MIN_SAVING = 1e-6
+
+
+def two_opt_pass(matrix, sequence):
+    """
+    One 2-opt pass over an open path whose first point is fixed.
+
+    Reverses the segment between two legs whenever that shortens the path and
+    returns the total distance saved by the pass (0.0 when nothing improved).
+    """
+    rows = matrix.rows
+    size = len(sequence)
+    saved = 0.0
+    for i in range(size - 2):
+        a, b = sequence[i], sequence[i + 1]
+        row_a = rows[a]
+        for j in range(i + 2, size):
+            c = sequence[j]
+            d = sequence[j + 1] if j + 1 < size else None
+            # Replace legs (a, b) and (c, d) with (a, c) and (b, d)
+            delta = row_a[c] - row_a[b]
+            if d is not None:
+                delta += rows[b][d] - rows[c][d]
+            if delta < -MIN_SAVING:
+                sequence[i + 1:j + 1] = reversed(sequence[i + 1:j + 1])
+                saved -= delta
+                b = sequence[i + 1]
+    return saved
+
+
+def or_opt_pass(matrix, sequence, max_segment=3):
+    """
+    One Or-opt pass over an open path whose first point is fixed.
+
+    Moves segments of 1 to ``max_segment`` consecutive points to the position
+    where they shorten the path the most (in their original or reversed
+    orientation) and returns the total distance saved by the pass.
+    """
+    rows = matrix.rows
+    saved = 0.0
+    for length in range(1, max_segment + 1):
+        start = 1
+        while start + length <= len(sequence):
+            end = start + length - 1
+            prev_point = sequence[start - 1]
+            first, last = sequence[start], sequence[end]
+            next_point = sequence[end + 1] if end + 1 < len(sequence) else None
+
+            # Gain of removing the segment from its current position
+            removal_gain = rows[prev_point][first]
+            if next_point is not None:
+                removal_gain += rows[last][next_point] - rows[prev_point][next_point]
+
+            segment = sequence[start:end + 1]
+            rest = sequence[:start] + sequence[end + 1:]
+            best = None
+            for pos in range(len(rest)):
+                if pos == start - 1:
+                    continue
+                left = rest[pos]
+                right = rest[pos + 1] if pos + 1 < len(rest) else None
+                for reverse in (False, True):
+                    head, tail = (last, first) if reverse else (first, last)
+                    insertion_cost = rows[left][head]
+                    if right is not None:
+                        insertion_cost += rows[tail][right] - rows[left][right]
+                    delta = insertion_cost - removal_gain
+                    if delta < -MIN_SAVING and (best is None or delta < best[0]):
+                        best = (delta, pos, reverse)
+
+            if best is None:
+                start += 1
+                continue
+
+            delta, pos, reverse = best
+            if reverse:
+                segment.reverse()
+            sequence[:] = rest[:pos + 1] + segment + rest[pos + 1:]
+            saved -= delta
+    return saved
+
+
+# Available improvement operators, in the order they are applied.
+# Other modules can register additional operators here; each one receives the
+# distance matrix and the sequence (list of matrix indexes, modified in place)
+# and returns the distance it saved.
+LOCAL_SEARCH_OPERATORS = {
+    'two_opt': two_opt_pass,
+    'or_opt': or_opt_pass,
+}
+
+
+def improve_sequence(matrix, sequence, operators=None, time_budget=None, max_iterations=100):
+    """
+    Improve a visiting sequence with local search until no operator finds a
+    shorter path, ``max_iterations`` is reached or ``time_budget`` (seconds)
+    is spent.
+
+    The first point of ``sequence`` is kept in place (start of the route).
+    Points without coordinates cannot be compared, they are kept at the end of
+    the sequence in their current order.
+
+    Returns the improved sequence and a list with one entry per iteration:
+    ``{'iteration': n, 'operator': name, 'saving': km}``.
+    """
+    if operators is None:
+        operators = list(LOCAL_SEARCH_OPERATORS)
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    if not sequence:
+        return [], []
+    located = [index for index in sequence[1:] if matrix.located[index]]
+    unlocated = [index for index in sequence[1:] if not matrix.located[index]]
+    if not matrix.located[sequence[0]]:
+        return list(sequence), []
+    path = [sequence[0]] + located
+
+    iterations = []
+    iteration = 0
+    while iteration < max_iterations:
+        improved = False
+        for name in operators:
+            if deadline and time.monotonic() > deadline:
+                break
+            saving = LOCAL_SEARCH_OPERATORS[name](matrix, path)
+            if saving > MIN_SAVING:
+                iteration += 1
+                iterations.append({'iteration': iteration, 'operator': name, 'saving': saving})
+                improved = True
+        if not improved or (deadline and time.monotonic() > deadline):
+            break
+
+    return path + unlocated, iterations
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+import time
+
+# Distance (km) assumed for a leg when one of its points has no coordinates,
+# same default as tms.route.stop.action_calculate_timing
+DEFAULT_LEG_DISTANCE = 5.0
+
+# Savings smaller than this (km) are treated as noise
+MIN_SAVING = 1e-6
+
+INFINITY = float('inf')
+
+
+class VrpSolver(object):
+    """
+    Vehicle routing solver with time windows and capacity constraints.
+
+    Builds feasible open routes (depot -> stops, no return leg) with a
+    cheapest-insertion heuristic, then improves them with relocate moves
+    inside and between routes. Feasibility of an insertion is checked in
+    constant time using, for each route, the service start time at every
+    stop and the latest start that keeps all later stops in their windows.
+
+    All times are expressed in minutes relative to the departure reference,
+    distances in km. Points are identified by their index in ``matrix``.
+
+    ``stops`` is a list of dicts with keys:
+        index     matrix index of the stop
+        weight    load weight
+        volume    load volume
+        ready     time window start (minutes), -INFINITY when not set
+        due       time window end (minutes), INFINITY when not set
+        service   service duration (minutes)
+        priority  priority stops are inserted before the others
+
+    ``vehicles`` is a list of dicts with keys:
+        depot       matrix index the vehicle departs from
+        start       departure time (minutes)
+        max_weight  capacity, None for no limit
+        max_volume  capacity, None for no limit
+    """
+
+    def __init__(self, matrix, stops, vehicles, speed_kmh=40.0,
+                 unknown_distance=DEFAULT_LEG_DISTANCE):
+        self.stops = stops
+        self.vehicles = vehicles
+        self.minutes_per_km = 60.0 / speed_kmh
+        self.rows = [
+            [matrix.rows[i][j] if matrix.is_known(i, j) else (0.0 if i == j else unknown_distance)
+             for j in range(len(matrix))]
+            for i in range(len(matrix))
+        ]
+        self.routes = [[] for _vehicle in vehicles]
+        self.loads = [[0.0, 0.0] for _vehicle in vehicles]
+        self.schedules = [([], []) for _vehicle in vehicles]
+        self._last_saving = 0.0
+
+    # ------------------------------------------------------------------
+    # Route bookkeeping
+    # ------------------------------------------------------------------
+
+    def _compute_schedule(self, vehicle, route):
+        """
+        Return (starts, latest) for ``route`` (list of stop positions), or None
+        if the route violates a time window.
+        """
+        rows = self.rows
+        stops = self.stops
+        starts = []
+        current_time = self.vehicles[vehicle]['start']
+        previous = self.vehicles[vehicle]['depot']
+        previous_service = 0.0
+        for position in route:
+            stop = stops[position]
+            current_time += previous_service + rows[previous][stop['index']] * self.minutes_per_km
+            if current_time < stop['ready']:
+                current_time = stop['ready']
+            if current_time > stop['due']:
+                return None
+            starts.append(current_time)
+            previous = stop['index']
+            previous_service = stop['service']
+
+        latest = [0.0] * len(route)
+        following = None
+        for k in range(len(route) - 1, -1, -1):
+            stop = stops[route[k]]
+            value = stop['due']
+            if following is not None:
+                next_stop = stops[route[following]]
+                value = min(value, latest[following] - stop['service']
+                            - rows[stop['index']][next_stop['index']] * self.minutes_per_km)
+            latest[k] = value
+            following = k
+        return starts, latest
+
+    def _refresh(self, vehicle):
+        self.schedules[vehicle] = self._compute_schedule(vehicle, self.routes[vehicle])
+        weight = volume = 0.0
+        for position in self.routes[vehicle]:
+            weight += self.stops[position]['weight']
+            volume += self.stops[position]['volume']
+        self.loads[vehicle] = [weight, volume]
+
+    def _fits_capacity(self, vehicle, weight, volume):
+        limits = self.vehicles[vehicle]
+        load_weight, load_volume = self.loads[vehicle]
+        if limits.get('max_weight') is not None and load_weight + weight > limits['max_weight'] + MIN_SAVING:
+            return False
+        if limits.get('max_volume') is not None and load_volume + volume > limits['max_volume'] + MIN_SAVING:
+            return False
+        return True
+
+    def _best_insertion(self, vehicle, position, route=None, schedule=None):
+        """
+        Cheapest feasible insertion of stop ``position`` in the route of
+        ``vehicle``. Returns (cost, route index) or None.
+        """
+        if route is None:
+            route = self.routes[vehicle]
+            schedule = self.schedules[vehicle]
+        if schedule is None:
+            return None
+        starts, latest = schedule
+        rows = self.rows
+        stops = self.stops
+        stop = stops[position]
+        node = stop['index']
+        node_row = rows[node]
+        depot = self.vehicles[vehicle]['depot']
+        minutes_per_km = self.minutes_per_km
+
+        best = None
+        for k in range(len(route) + 1):
+            if k == 0:
+                previous = depot
+                departure = self.vehicles[vehicle]['start']
+            else:
+                previous_stop = stops[route[k - 1]]
+                previous = previous_stop['index']
+                departure = starts[k - 1] + previous_stop['service']
+
+            start = departure + rows[previous][node] * minutes_per_km
+            if start < stop['ready']:
+                start = stop['ready']
+            if start > stop['due']:
+                continue
+
+            cost = rows[previous][node]
+            if k < len(route):
+                next_stop = stops[route[k]]
+                next_start = start + stop['service'] + node_row[next_stop['index']] * minutes_per_km
+                if next_start < next_stop['ready']:
+                    next_start = next_stop['ready']
+                if next_start > latest[k]:
+                    continue
+                cost += node_row[next_stop['index']] - rows[previous][next_stop['index']]
+
+            if best is None or cost < best[0]:
+                best = (cost, k)
+        return best
+
+    def _removal_gain(self, vehicle, k):
+        """Distance saved by removing the stop at route index ``k``"""
+        route = self.routes[vehicle]
+        rows = self.rows
+        node = self.stops[route[k]]['index']
+        previous = self.vehicles[vehicle]['depot'] if k == 0 else self.stops[route[k - 1]]['index']
+        gain = rows[previous][node]
+        if k + 1 < len(route):
+            following = self.stops[route[k + 1]]['index']
+            gain += rows[node][following] - rows[previous][following]
+        return gain
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def construct(self, initial_routes=None):
+        """
+        Insert every stop with the cheapest feasible insertion. Priority stops
+        are inserted first. ``initial_routes`` can pre-seed routes with stop
+        positions (kept only if feasible).
+
+        Returns the list of stop positions that could not be inserted.
+        """
+        assigned = set()
+        if initial_routes:
+            for vehicle, route in enumerate(initial_routes):
+                if self._compute_schedule(vehicle, route) is None:
+                    continue
+                self.routes[vehicle] = list(route)
+                self._refresh(vehicle)
+                if not self._fits_capacity(vehicle, 0.0, 0.0):
+                    self.routes[vehicle] = []
+                    self._refresh(vehicle)
+                    continue
+                assigned.update(route)
+        for vehicle in range(len(self.vehicles)):
+            if not self.routes[vehicle]:
+                self._refresh(vehicle)
+
+        pending = [position for position in range(len(self.stops)) if position not in assigned]
+        candidates = {}
+        for position in pending:
+            stop = self.stops[position]
+            candidates[position] = {
+                vehicle: self._best_insertion(vehicle, position)
+                for vehicle in range(len(self.vehicles))
+                if self._fits_capacity(vehicle, stop['weight'], stop['volume'])
+            }
+
+        unassigned = []
+        while candidates:
+            has_priority = any(self.stops[position]['priority'] for position in candidates)
+            best = None
+            for position, options in candidates.items():
+                if has_priority and not self.stops[position]['priority']:
+                    continue
+                for vehicle, insertion in options.items():
+                    if insertion is not None and (best is None or insertion[0] < best[0]):
+                        best = (insertion[0], position, vehicle, insertion[1])
+
+            if best is None:
+                if has_priority:
+                    # No feasible slot for the remaining priority stops
+                    for position in [p for p in candidates if self.stops[p]['priority']]:
+                        unassigned.append(position)
+                        del candidates[position]
+                    continue
+                unassigned.extend(candidates)
+                break
+
+            _cost, position, vehicle, k = best
+            self.routes[vehicle].insert(k, position)
+            self._refresh(vehicle)
+            del candidates[position]
+
+            # Only insertions into the modified route need to be re-evaluated
+            for other, options in candidates.items():
+                stop = self.stops[other]
+                if self._fits_capacity(vehicle, stop['weight'], stop['volume']):
+                    options[vehicle] = self._best_insertion(vehicle, other)
+                else:
+                    options.pop(vehicle, None)
+
+        return unassigned
+
+    # ------------------------------------------------------------------
+    # Local search
+    # ------------------------------------------------------------------
+
+    def improve(self, time_budget=None, max_passes=50):
+        """
+        Relocate stops inside and between routes while it shortens the total
+        distance and keeps every route feasible. Returns the list of passes
+        with the distance each one saved.
+        """
+        deadline = time.monotonic() + time_budget if time_budget else None
+        passes = []
+        for pass_number in range(1, max_passes + 1):
+            saved = 0.0
+            for vehicle in range(len(self.vehicles)):
+                k = 0
+                while k < len(self.routes[vehicle]):
+                    if deadline and time.monotonic() > deadline:
+                        break
+                    if self._relocate(vehicle, k):
+                        saved += self._last_saving
+                    else:
+                        k += 1
+            if saved > MIN_SAVING:
+                passes.append({'iteration': pass_number, 'operator': 'relocate', 'saving': saved})
+            if saved <= MIN_SAVING or (deadline and time.monotonic() > deadline):
+                break
+        return passes
+
+    def _relocate(self, vehicle, k):
+        """Move the stop at index ``k`` of ``vehicle`` to its best position, if it saves distance"""
+        route = self.routes[vehicle]
+        position = route[k]
+        stop = self.stops[position]
+        gain = self._removal_gain(vehicle, k)
+        if gain <= MIN_SAVING:
+            return False
+
+        reduced = route[:k] + route[k + 1:]
+        reduced_schedule = self._compute_schedule(vehicle, reduced)
+
+        best = None
+        for other in range(len(self.vehicles)):
+            if other == vehicle:
+                insertion = self._best_insertion(other, position, reduced, reduced_schedule)
+            else:
+                if not self._fits_capacity(other, stop['weight'], stop['volume']):
+                    continue
+                insertion = self._best_insertion(other, position)
+            if insertion is not None and insertion[0] < gain - MIN_SAVING:
+                if best is None or insertion[0] < best[0]:
+                    best = (insertion[0], other, insertion[1])
+
+        if best is None:
+            return False
+
+        cost, other, target = best
+        self.routes[vehicle] = reduced
+        self.routes[other].insert(target, position)
+        self._refresh(vehicle)
+        if other != vehicle:
+            self._refresh(other)
+        self._last_saving = gain - cost
+        return True
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+
+    def route_distance(self, vehicle):
+        rows = self.rows
+        previous = self.vehicles[vehicle]['depot']
+        total = 0.0
+        for position in self.routes[vehicle]:
+            node = self.stops[position]['index']
+            total += rows[previous][node]
+            previous = node
+        return total
+
+    def total_distance(self):
+        return sum(self.route_distance(vehicle) for vehicle in range(len(self.vehicles)))
+
+    def solve(self, initial_routes=None, time_budget=None):
+        """
+        Build and improve the routes. Returns a dict with:
+            routes      list (per vehicle) of stop positions in visiting order
+            starts      list (per vehicle) of service start times (minutes)
+            unassigned  stop positions that could not be served
+            iterations  local search passes with the distance each one saved
+            distance    total distance of the routes (km)
+        """
+        unassigned = self.construct(initial_routes=initial_routes)
+        iterations = self.improve(time_budget=time_budget)
+        return {
+            'routes': [list(route) for route in self.routes],
+            'starts': [list(schedule[0]) if schedule else [] for schedule in self.schedules],
+            'unassigned': unassigned,
+            'iterations': iterations,
+            'distance': self.total_distance(),
+        }
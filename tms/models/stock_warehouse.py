@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models
+
+
+class StockWarehouse(models.Model):
+    _inherit = 'stock.warehouse'
+
+    tms_local_search_time_budget = fields.Float(
+        string='Route Improvement Time Budget (s)',
+        default=2.0,
+        help='Maximum time in seconds spent improving the stop sequence of a route '
+             'departing from this warehouse (2-opt / Or-opt). 0 means no time limit.'
+    )
@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
 import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
 
+from .distance_matrix import DistanceMatrix
+from .route_local_search import improve_sequence
+from .route_vrp_solver import INFINITY, VrpSolver
+
 _logger = logging.getLogger(__name__)
 
 
@@ -184,30 +191,37 @@ class TmsRoute(models.Model):
         - Time windows
         - Geographic proximity (if coordinates available)
         - Vehicle capacity constraints
+
+        All constraints are handled in a single routing pass: stops that cannot
+        be served within their time window or the vehicle capacity are reported
+        and kept at the end of the route instead of aborting the suggestion.
         """
         for route in self:
             if not route.stop_ids:
                 continue
 
-            # Consider vehicle capacity constraints
-            if route.vehicle_id:
-                # Check if total weight/volume exceeds vehicle capacity
-                if route.total_weight > route.vehicle_id.max_weight:
-                    raise ValidationError(_("Total weight exceeds vehicle capacity!"))
-                if route.total_volume > route.vehicle_id.max_volume:
-                    raise ValidationError(_("Total volume exceeds vehicle capacity!"))
-
             # Update coordinates for all stops to ensure we have the latest
             route.stop_ids.update_coordinates()
 
-            # Sort stops using a more comprehensive algorithm considering geographic factors
-            sorted_stops = self._get_optimal_stop_sequence(route.stop_ids)
-
-            # Update sequence and return suggestions
-            for i, stop in enumerate(sorted_stops, start=1):
-                stop.sequence = i
+            result = route._solve_vehicle_routing()
+            route._apply_vehicle_routing(result)
 
             # Return action to reload the view with suggestions
+            if result['unassigned']:
+                return {
+                    'type': 'ir.actions.client',
+                    'tag': 'display_notification',
+                    'params': {
+                        'title': _('Route Optimization'),
+                        'message': _('Stops have been re-ordered, but %(count)s stop(s) cannot be served within '
+                                     'their time window or the vehicle capacity: %(stops)s') % {
+                            'count': len(result['unassigned']),
+                            'stops': ', '.join(result['unassigned'].mapped('partner_id.name')),
+                        },
+                        'type': 'warning',
+                        'sticky': True,
+                    }
+                }
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
@@ -219,84 +233,388 @@ class TmsRoute(models.Model):
                 }
             }
 
-    def _get_optimal_stop_sequence(self, stops):
+    def action_solve_vehicle_routing(self):
         """
-        Calculate optimal sequence considering priority, time windows, and geographic proximity.
-        This method implements an algorithm that considers the addresses of the pickings
-        in the batch to optimize route arrangement geographically.
+        Solve the selected draft routes together: stops are pooled and
+        re-assigned across the routes' vehicles with time windows and capacity
+        constraints, then sequenced to minimize the total distance.
         """
-        if not stops:
-            return stops
+        routes = self.filtered(lambda r: r.state == 'draft')
+        if not routes.stop_ids:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('No Stops'),
+                    'message': _('The selected draft routes have no stops to plan.'),
+                    'type': 'info',
+                    'sticky': False,
+                }
+            }
 
-        # First, separate priority and time-critical stops
-        priority_stops = stops.filtered(lambda s: s.is_priority_stop)
-        time_critical_stops = stops.filtered(lambda s: s.time_window_start and s.time_window_start <= fields.Datetime.now())
-        regular_stops = stops - priority_stops - time_critical_stops
+        routes.stop_ids.update_coordinates()
+        result = routes._solve_vehicle_routing()
+        routes._apply_vehicle_routing(result)
 
-        # Create a list of all stops that need to be ordered
-        ordered_stops = []
+        message = _('Planned %(stops)s stop(s) on %(routes)s route(s), total distance %(distance).2fkm.') % {
+            'stops': sum(len(stops) for stops in result['routes'].values()),
+            'routes': len(routes),
+            'distance': result['distance'],
+        }
+        if result['unassigned']:
+            message += ' ' + _('%(count)s stop(s) cannot be served within their time window or vehicle capacity: %(stops)s') % {
+                'count': len(result['unassigned']),
+                'stops': ', '.join(result['unassigned'].mapped('partner_id.name')),
+            }
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Vehicle Routing'),
+                'message': message,
+                'type': 'warning' if result['unassigned'] else 'success',
+                'sticky': bool(result['unassigned']),
+            }
+        }
 
-        # Add priority stops first
-        ordered_stops.extend(priority_stops)
+    def _get_vehicle_capacity(self):
+        """
+        Return the (max weight, max volume) of the route's vehicle for routing.
+        A capacity that is not configured is not enforced (None).
+        """
+        self.ensure_one()
+        vehicle = self.vehicle_id
+        return vehicle.max_weight or None, vehicle.max_volume or None
 
-        # Add time-critical stops next
-        ordered_stops.extend(time_critical_stops)
+    def _solve_vehicle_routing(self, stops=None, time_budget=None):
+        """
+        Build feasible stop sequences for the routes in ``self`` in one pass,
+        respecting stop time windows, service times and vehicle capacity
+        (insertion heuristic followed by relocate local search).
+
+        Each route is one vehicle. ``stops`` defaults to the stops of the routes;
+        when several routes are solved together their stops are pooled and can
+        move from one route to another.
+
+        Returns a dict with:
+            routes      {route: list of stops in visiting order}
+            planning    {stop: (planned arrival, planned departure)}
+            unassigned  stops that cannot be served
+            iterations  local search passes with the distance each one saved
+            distance    total distance (km)
+        """
+        routes = list(self)
+        if stops is None:
+            stops = self.mapped('stop_ids')
+        stops = list(stops)
+        if not routes:
+            return {'routes': {}, 'planning': {}, 'unassigned': self.env['tms.route.stop'],
+                    'iterations': [], 'distance': 0.0}
+
+        now = fields.Datetime.now()
+        reference = min(route.departure_time or now for route in routes)
+
+        def to_minutes(value):
+            return (value - reference).total_seconds() / 60.0
+
+        keys = []
+        coordinates = []
+        for route in routes:
+            keys.append(('depot', route.id))
+            coordinates.append(route._get_depot_coordinates())
+        for stop in stops:
+            keys.append(stop)
+            coordinates.append(self._get_stop_coordinates(stop))
+        matrix = DistanceMatrix(coordinates, keys=keys)
+
+        vehicles = []
+        for route in routes:
+            max_weight, max_volume = route._get_vehicle_capacity()
+            vehicles.append({
+                'depot': matrix.index_of(('depot', route.id)),
+                'start': to_minutes(route.departure_time or now),
+                'max_weight': max_weight,
+                'max_volume': max_volume,
+            })
 
-        # For the remaining stops, sort by geographic proximity starting from the warehouse
-        # Get warehouse location (assuming it's the departure location or vehicle location)
-        warehouse_lat = self.vehicle_id and self.vehicle_id.partner_id and self.vehicle_id.partner_id.partner_latitude
-        warehouse_lng = self.vehicle_id and self.vehicle_id.partner_id and self.vehicle_id.partner_id.partner_longitude
+        loads = self._get_stop_loads(stops)
+        stops_data = []
+        for stop in stops:
+            weight, volume = loads.get(stop.id, (0.0, 0.0))
+            stops_data.append({
+                'index': matrix.index_of(stop),
+                'weight': weight,
+                'volume': volume,
+                'ready': to_minutes(stop.time_window_start) if stop.time_window_start else -INFINITY,
+                'due': to_minutes(stop.time_window_end) if stop.time_window_end else INFINITY,
+                'service': stop._get_service_minutes(),
+                'priority': stop.is_priority_stop,
+            })
 
-        # If no warehouse location available, try to get location from default address
-        if not warehouse_lat or not warehouse_lng:
-            warehouse_partner = self.env['res.partner'].search([], limit=1)  # Default to first partner
-            warehouse_lat = warehouse_partner.partner_latitude if warehouse_partner else 0
-            warehouse_lng = warehouse_partner.partner_longitude if warehouse_partner else 0
+        # Start from the current assignment of the stops when it is feasible
+        initial_routes = []
+        for route in routes:
+            initial_routes.append([
+                position for position, stop in sorted(enumerate(stops), key=lambda item: item[1].sequence)
+                if stop.route_id == route
+            ])
 
-        # Sort remaining stops by proximity to warehouse initially, then by proximity to each other
-        remaining_stops = regular_stops
-        current_lat, current_lng = warehouse_lat, warehouse_lng
-        processed_stops = self.env['tms.route.stop']
+        solver = VrpSolver(matrix, stops_data, vehicles)
+        result = solver.solve(
+            initial_routes=initial_routes if len(routes) > 1 else None,
+            time_budget=time_budget if time_budget is not None else routes[0]._get_local_search_time_budget(),
+        )
+
+        planning = {}
+        routes_result = {}
+        route_distances = {}
+        for vehicle, route in enumerate(routes):
+            route_distances[route] = solver.route_distance(vehicle)
+            ordered = []
+            for position, start in zip(result['routes'][vehicle], result['starts'][vehicle]):
+                stop = stops[position]
+                arrival = reference + timedelta(minutes=start)
+                planning[stop] = (arrival, arrival + timedelta(minutes=stops_data[position]['service']))
+                ordered.append(stop)
+            routes_result[route] = ordered
+
+        for iteration in result['iterations']:
+            _logger.info(
+                "Vehicle routing for %s: local search pass %s saved %.2f km",
+                ', '.join(route.name for route in routes),
+                iteration['iteration'], iteration['saving']
+            )
 
-        while remaining_stops:
-            # Find the stop closest to the current location
-            closest_stop = min(remaining_stops, key=lambda s: self._calculate_distance(
-                current_lat, current_lng, s.latitude or 0, s.longitude or 0))
+        return {
+            'routes': routes_result,
+            'planning': planning,
+            'unassigned': self.env['tms.route.stop'].browse([stops[position].id for position in result['unassigned']]),
+            'iterations': result['iterations'],
+            'distance': result['distance'],
+            'route_distances': route_distances,
+        }
 
-            ordered_stops.append(closest_stop)
-            processed_stops |= closest_stop
-            remaining_stops -= closest_stop
+    def _get_stop_loads(self, stops):
+        """
+        Weight and volume of the deliveries of ``stops`` with a single grouped
+        query over their pickings' moves. Returns {stop id: (weight, volume)}.
+        """
+        stop_ids = [stop.id for stop in stops if isinstance(stop.id, int)]
+        if not stop_ids:
+            return {}
+
+        picking_field = self.env['tms.route.stop']._fields['picking_ids']
+        self.env['stock.move'].flush_model(['picking_id', 'product_id', 'product_uom_qty'])
+        self.env['product.product'].flush_model(['weight', 'volume'])
+        self.env['tms.route.stop'].flush_model(['picking_ids'])
+        self.env.cr.execute("""
+            SELECT rel.{stop_column},
+                   COALESCE(SUM(product.weight * move.product_uom_qty), 0.0),
+                   COALESCE(SUM(product.volume * move.product_uom_qty), 0.0)
+              FROM {relation} rel
+              JOIN stock_move move ON move.picking_id = rel.{picking_column}
+              JOIN product_product product ON product.id = move.product_id
+             WHERE rel.{stop_column} IN %s
+          GROUP BY rel.{stop_column}
+        """.format(
+            relation=picking_field.relation,
+            stop_column=picking_field.column1,
+            picking_column=picking_field.column2,
+        ), [tuple(stop_ids)])
+        return {stop_id: (weight, volume) for stop_id, weight, volume in self.env.cr.fetchall()}
 
-            # Update current location to the closest stop's location for next iteration
-            if closest_stop.latitude and closest_stop.longitude:
-                current_lat, current_lng = closest_stop.latitude, closest_stop.longitude
+    @api.model
+    def _optimize_fleet(self, date, warehouse=None):
+        """
+        Fleet-wide optimization of the draft routes departing on ``date``.
 
-        return ordered_stops
+        All routes and stops of the day are loaded at once and solved per depot
+        (warehouse) in a single routing problem, so stops can be rebalanced
+        between vehicles to minimize the total distance. Assignments, sequences
+        and planned times are written back in bulk.
 
-    def _calculate_distance(self, lat1, lng1, lat2, lng2):
+        Returns {warehouse: routing result}.
         """
-        Calculate the distance between two coordinates using the Haversine formula.
-        Returns a float distance in kilometers.
+        day_start = datetime.combine(date, time.min)
+        domain = [
+            ('state', '=', 'draft'),
+            ('departure_time', '>=', day_start),
+            ('departure_time', '<', day_start + timedelta(days=1)),
+        ]
+        if warehouse:
+            domain.append(('picking_batch_id.picking_type_id.warehouse_id', '=', warehouse.id))
+        routes = self.search(domain)
+
+        # Load every stop of the day and its coordinates in one go
+        routes.stop_ids.update_coordinates()
+
+        routes_by_warehouse = defaultdict(lambda: self.env['tms.route'])
+        for route in routes:
+            routes_by_warehouse[route.picking_batch_id.picking_type_id.warehouse_id] |= route
+
+        results = {}
+        route_distances = {}
+        for route_warehouse, warehouse_routes in routes_by_warehouse.items():
+            if not warehouse_routes.stop_ids:
+                continue
+            result = warehouse_routes._solve_vehicle_routing()
+            warehouse_routes._apply_vehicle_routing(result)
+            route_distances.update(result['route_distances'])
+            _logger.info(
+                "Fleet optimization for %s on %s: %s route(s), %.2f km, %s unassigned stop(s)",
+                route_warehouse.name or _('no warehouse'), date, len(warehouse_routes),
+                result['distance'], len(result['unassigned'])
+            )
+            results[route_warehouse] = result
+        self._write_total_distances(route_distances)
+        return results
+
+    def _write_total_distances(self, route_distances):
+        """Write the ``{route: distance}`` total distances with a single query"""
+        if not route_distances:
+            return
+        self.flush_model(['total_distance'])
+        values_sql = ', '.join(['(%s, %s::numeric)'] * len(route_distances))
+        params = [value for route, distance in route_distances.items() for value in (route.id, distance)]
+        self.env.cr.execute("""
+            UPDATE tms_route AS route
+               SET total_distance = v.distance,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM (VALUES """ + values_sql + """) AS v(id, distance)
+             WHERE route.id = v.id
+        """, [self.env.uid] + params)
+        self.browse([route.id for route in route_distances]).invalidate_recordset(
+            ['total_distance', 'write_uid', 'write_date'])
+
+    @api.model
+    def _cron_optimize_fleet(self):
+        """Nightly planning: optimize tomorrow's routes for every depot"""
+        self._optimize_fleet(fields.Date.context_today(self) + timedelta(days=1))
+
+    def action_optimize_fleet_for_day(self):
+        """Optimize all draft routes departing the same day from the same depot as this route"""
+        self.ensure_one()
+        if not self.departure_time:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('No Departure Time'),
+                    'message': _('Please set a departure time to optimize the routes of that day.'),
+                    'type': 'warning',
+                    'sticky': False,
+                }
+            }
+
+        warehouse = self.picking_batch_id.picking_type_id.warehouse_id
+        results = self._optimize_fleet(self.departure_time.date(), warehouse=warehouse or None)
+        route_count = sum(len(result['routes']) for result in results.values())
+        distance = sum(result['distance'] for result in results.values())
+        unassigned = sum(len(result['unassigned']) for result in results.values())
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Fleet Optimized'),
+                'message': _('Re-planned %(routes)s route(s) for a total of %(distance).2fkm, '
+                             '%(unassigned)s stop(s) could not be served.') % {
+                    'routes': route_count,
+                    'distance': distance,
+                    'unassigned': unassigned,
+                },
+                'type': 'warning' if unassigned else 'success',
+                'sticky': False,
+            }
+        }
+
+    def _apply_vehicle_routing(self, result):
         """
-        import math
+        Write a routing result back in bulk: stops moving to another route are
+        re-assigned with one write per target route, then the sequence and
+        planned times of all stops are updated with a single query.
+        Unassigned stops stay on their route, after the served ones.
+        """
+        Stop = self.env['tms.route.stop']
+        rows = []
+        moved_stop_ids = defaultdict(list)
+        for route, ordered_stops in result['routes'].items():
+            for sequence, stop in enumerate(ordered_stops, start=1):
+                arrival, departure = result['planning'][stop]
+                rows.append((stop.id, sequence, arrival, departure))
+                if stop.route_id != route:
+                    moved_stop_ids[route.id].append(stop.id)
+
+            last_sequence = len(ordered_stops)
+            for stop in result['unassigned'].filtered(lambda s: s.route_id == route).sorted('sequence'):
+                last_sequence += 1
+                rows.append((stop.id, last_sequence, None, None))
+
+        for route_id, stop_ids in moved_stop_ids.items():
+            Stop.browse(stop_ids).write({'route_id': route_id})
+
+        if not rows:
+            return
 
-        # If any coordinates are zero, return a large number so the stop is less prioritized
-        if lat1 == 0 and lng1 == 0 or lat2 == 0 and lng2 == 0:
-            return 999999
+        fnames = ['sequence', 'planned_arrival', 'planned_departure']
+        Stop.flush_model(fnames)
+        values_sql = ', '.join(['(%s, %s, %s::timestamp, %s::timestamp)'] * len(rows))
+        params = [value for row in rows for value in row]
+        self.env.cr.execute("""
+            UPDATE tms_route_stop AS stop
+               SET sequence = v.sequence,
+                   planned_arrival = v.arrival,
+                   planned_departure = v.departure,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM (VALUES """ + values_sql + """) AS v(id, sequence, arrival, departure)
+             WHERE stop.id = v.id
+        """, [self.env.uid] + params)
+        Stop.browse([row[0] for row in rows]).invalidate_recordset(fnames + ['write_uid', 'write_date'])
+
+    def _get_depot_coordinates(self):
+        """
+        Return the (latitude, longitude) the route departs from: the vehicle's
+        partner address, or the first partner as a fallback.
+        """
+        partner = self.vehicle_id.partner_id if len(self) == 1 else self.env['res.partner']
+        warehouse_lat = partner.partner_latitude
+        warehouse_lng = partner.partner_longitude
 
-        # Convert latitude and longitude from degrees to radians
-        lat1, lng1, lat2, lng2 = map(math.radians, [lat1, lng1, lat2, lng2])
+        # If no warehouse location available, try to get location from default address
+        if not warehouse_lat or not warehouse_lng:
+            warehouse_partner = self.env['res.partner'].search([], limit=1)  # Default to first partner
+            warehouse_lat = warehouse_partner.partner_latitude if warehouse_partner else 0
+            warehouse_lng = warehouse_partner.partner_longitude if warehouse_partner else 0
 
-        # Haversine formula
-        dlat = lat2 - lat1
-        dlon = lng2 - lng1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
+        return warehouse_lat, warehouse_lng
 
-        # Radius of earth in kilometers
-        r = 6371
+    def _get_stop_coordinates(self, stop):
+        """Coordinates of a stop, preferring the partner's geolocation over the stored ones"""
+        partner = stop.partner_id
+        if partner.partner_latitude and partner.partner_longitude:
+            return partner.partner_latitude, partner.partner_longitude
+        return stop.latitude or 0.0, stop.longitude or 0.0
 
-        return c * r
+    def _get_distance_matrix(self, stops, depot=None):
+        """
+        Build the distance matrix for ``stops`` (a recordset or a list of stops).
+
+        Coordinates are loaded once per stop (the stops are prefetched together)
+        and every pairwise distance is computed in a single pass. Matrix keys are
+        the stop records; when ``depot`` is given as a (latitude, longitude)
+        tuple it is added as the first point under the key ``'depot'``.
+        """
+        stops = list(stops)
+        keys = []
+        coordinates = []
+        if depot is not None:
+            keys.append('depot')
+            coordinates.append(depot)
+        for stop in stops:
+            keys.append(stop)
+            coordinates.append(self._get_stop_coordinates(stop))
+        return DistanceMatrix(coordinates, keys=keys)
 
     def action_check_capacity_constraints(self):
         """Check if the route fits within vehicle capacity"""
@@ -1026,22 +1344,18 @@ class TmsRoute(models.Model):
         """
         # If geographic coordinates are stored in the area, use them
         # For now, we'll use a simplified approach based on partner locations
-        area1_partners = self.env['res.partner'].search([('route_area_id', '=', area1.id)])
-        area2_partners = self.env['res.partner'].search([('route_area_id', '=', area2.id)])
-
-        # If we have geographic coordinates for partners in these areas,
-        # we can calculate the distance between the closest partners
-        for partner1 in area1_partners:
-            for partner2 in area2_partners:
-                if partner1.partner_latitude and partner1.partner_longitude and \
-                   partner2.partner_latitude and partner2.partner_longitude:
-                    distance = self._calculate_haversine_distance(
-                        partner1.partner_latitude, partner1.partner_longitude,
-                        partner2.partner_latitude, partner2.partner_longitude
-                    )
-                    if distance <= max_distance_km:
-                        return True
-        return False
+        partners = self.env['res.partner'].search_read(
+            [('route_area_id', 'in', [area1.id, area2.id])],
+            ['route_area_id', 'partner_latitude', 'partner_longitude'],
+        )
+        if not partners:
+            return False
+
+        # Compute all partner distances at once and compare the closest pair
+        matrix = DistanceMatrix([(p['partner_latitude'], p['partner_longitude']) for p in partners])
+        area1_indexes = [i for i, p in enumerate(partners) if p['route_area_id'][0] == area1.id]
+        area2_indexes = [i for i, p in enumerate(partners) if p['route_area_id'][0] == area2.id]
+        return matrix.min_distance_between(area1_indexes, area2_indexes) <= max_distance_km
 
     def _calculate_haversine_distance(self, lat1, lng1, lat2, lng2):
         """
@@ -1068,30 +1382,18 @@ class TmsRoute(models.Model):
 
         return c * r
 
-    def _calculate_route_distance(self, stops):
+    def _calculate_route_distance(self, stops, matrix=None):
         """
         Calculate total distance for a route visiting all stops in sequence.
+        An already built distance matrix covering the stops can be passed to
+        avoid recomputing it.
         """
         if len(stops) < 2:
             return 0.0
 
-        total_distance = 0.0
-        for i in range(len(stops) - 1):
-            stop1 = stops[i]
-            stop2 = stops[i + 1]
-
-            if stop1.partner_id.partner_latitude and stop1.partner_id.partner_longitude and \
-               stop2.partner_id.partner_latitude and stop2.partner_id.partner_longitude:
-
-                distance = self._calculate_haversine_distance(
-                    stop1.partner_id.partner_latitude,
-                    stop1.partner_id.partner_longitude,
-                    stop2.partner_id.partner_latitude,
-                    stop2.partner_id.partner_longitude
-                )
-                total_distance += distance
-
-        return total_distance
+        if matrix is None:
+            matrix = self._get_distance_matrix(stops)
+        return matrix.route_length([matrix.index_of(stop) for stop in stops])
 
     def action_optimize_route_by_distance(self):
         """
@@ -1115,16 +1417,21 @@ class TmsRoute(models.Model):
                 }
             }
 
-        # Sort stops by geographic proximity to minimize travel distance
-        optimized_stops = self._optimize_stops_by_distance(stops)
+        # Build the distance matrix once, it is shared by the optimization and the report
+        matrix = self._get_distance_matrix(stops)
+        original_distance = self._calculate_route_distance(stops.sorted('sequence'), matrix=matrix)
+
+        # Sort stops by geographic proximity to minimize travel distance,
+        # then improve the greedy sequence with local search
+        optimized_stops = self._optimize_stops_by_distance(stops, matrix=matrix)
+        optimized_stops, iterations = self._improve_stop_sequence(optimized_stops, matrix=matrix)
 
         # Update sequence numbers
         for i, stop in enumerate(optimized_stops, 1):
             stop.sequence = i
 
         # Calculate and show the improvement in distance
-        original_distance = self._calculate_route_distance(stops.sorted('sequence'))
-        optimized_distance = self._calculate_route_distance(optimized_stops)
+        optimized_distance = self._calculate_route_distance(optimized_stops, matrix=matrix)
 
         improvement = original_distance - optimized_distance
         status_msg = f'Route distance optimized from {original_distance:.2f}km to {optimized_distance:.2f}km'
@@ -1132,6 +1439,8 @@ class TmsRoute(models.Model):
             status_msg += f' (improved by {improvement:.2f}km)'
         else:
             status_msg += f' (change: {improvement:.2f}km)'
+        if iterations:
+            status_msg += '. ' + self._format_local_search_iterations(iterations)
 
         return {
             'type': 'ir.actions.client',
@@ -1144,7 +1453,7 @@ class TmsRoute(models.Model):
             }
         }
 
-    def _optimize_stops_by_distance(self, stops):
+    def _optimize_stops_by_distance(self, stops, matrix=None):
         """
         Optimize stop sequence to minimize total travel distance using a nearest neighbor algorithm.
         """
@@ -1156,39 +1465,65 @@ class TmsRoute(models.Model):
         if not stops_list:
             return stops
 
+        if matrix is None:
+            matrix = self._get_distance_matrix(stops_list)
+
         # For the nearest neighbor approach, start with a reference point
         # (in real usage, this might be the depot/warehouse location)
-        optimized_sequence = [stops_list[0]]  # Start with first stop
-        remaining_stops = stops_list[1:]
-
-        while remaining_stops:
-            current_stop = optimized_sequence[-1]
-            nearest_stop = None
-            nearest_distance = float('inf')
-
-            for stop in remaining_stops:
-                if current_stop.partner_id.partner_latitude and current_stop.partner_id.partner_longitude and \
-                   stop.partner_id.partner_latitude and stop.partner_id.partner_longitude:
-
-                    distance = self._calculate_haversine_distance(
-                        current_stop.partner_id.partner_latitude,
-                        current_stop.partner_id.partner_longitude,
-                        stop.partner_id.partner_latitude,
-                        stop.partner_id.partner_longitude
-                    )
-
-                    if distance < nearest_distance:
-                        nearest_distance = distance
-                        nearest_stop = stop
-
-            if nearest_stop:
-                optimized_sequence.append(nearest_stop)
-                remaining_stops.remove(nearest_stop)
-            else:
-                # If no distance could be calculated, just add the next available stop
-                optimized_sequence.append(remaining_stops.pop(0))
+        indexes = [matrix.index_of(stop) for stop in stops_list]
+        ordered = [indexes[0]] + matrix.nearest_neighbour(indexes[0], indexes[1:])
+        return [matrix.keys[index] for index in ordered]
+
+    def _get_local_search_operators(self):
+        """Names of the local search operators applied after sequencing, in order"""
+        return ['two_opt', 'or_opt']
+
+    def _get_local_search_time_budget(self):
+        """
+        Time budget (seconds) for improving the route's sequence, configured on
+        the warehouse the route departs from. Returns None for no time limit.
+        """
+        warehouse = self.picking_batch_id.picking_type_id.warehouse_id
+        if not warehouse:
+            warehouse = self.env['stock.warehouse'].search([('company_id', '=', self.env.company.id)], limit=1)
+        return warehouse.tms_local_search_time_budget or None
 
-        return optimized_sequence
+    def _improve_stop_sequence(self, stops, matrix=None):
+        """
+        Improve a visiting order with 2-opt / Or-opt local search over the
+        distance matrix. The first stop stays in place.
+
+        Returns the improved list of stops and the list of iterations with the
+        distance each one saved.
+        """
+        stops = list(stops)
+        if len(stops) < 3:
+            return stops, []
+
+        if matrix is None:
+            matrix = self._get_distance_matrix(stops)
+
+        sequence, iterations = improve_sequence(
+            matrix,
+            [matrix.index_of(stop) for stop in stops],
+            operators=self._get_local_search_operators(),
+            time_budget=self._get_local_search_time_budget(),
+        )
+        for iteration in iterations:
+            _logger.info(
+                "Route %s: local search iteration %s (%s) saved %.2f km",
+                self.name, iteration['iteration'], iteration['operator'], iteration['saving']
+            )
+        return [matrix.keys[index] for index in sequence], iterations
+
+    def _format_local_search_iterations(self, iterations):
+        """Human readable summary of the local search savings"""
+        total = sum(iteration['saving'] for iteration in iterations)
+        details = ', '.join(
+            f"#{iteration['iteration']} {iteration['operator']}: {iteration['saving']:.2f}km"
+            for iteration in iterations
+        )
+        return f'Local search saved {total:.2f}km in {len(iterations)} iteration(s) ({details})'
 
     def action_split_combine_for_adjacent_areas(self):
         """
@@ -1396,6 +1731,7 @@ class TmsRoute(models.Model):
         # Create new routes optimized for distance
         new_routes = []
         processed_stops = set()
+        distance_saved = 0.0
 
         # Process each area group
         for area_id, stops_in_area in area_stop_groups.items():
@@ -1420,7 +1756,8 @@ class TmsRoute(models.Model):
                         current_route_volume + stop.total_volume > max_volume):
                         # If we have stops, create a route
                         if current_route_stops:
-                            new_route = self._create_sub_route_for_stops(current_route_stops)
+                            new_route, saving = self._create_distance_optimized_sub_route(current_route_stops)
+                            distance_saved += saving
                             new_routes.append(new_route)
                             current_route_weight = stop.total_weight
                             current_route_volume = stop.total_volume
@@ -1444,7 +1781,8 @@ class TmsRoute(models.Model):
 
                 # Create route for remaining stops
                 if current_route_stops:
-                    new_route = self._create_sub_route_for_stops(current_route_stops)
+                    new_route, saving = self._create_distance_optimized_sub_route(current_route_stops)
+                    distance_saved += saving
                     new_routes.append(new_route)
             else:
                 # Area fits in one route, but we might be able to combine with nearby areas
@@ -1479,10 +1817,8 @@ class TmsRoute(models.Model):
 
                 # Create route for the combined stops
                 if current_route_stops:
-                    # Optimize the stop sequence within this route for distance
-                    optimized_stops = self._optimize_stops_by_distance(current_route_stops)
-                    stop_ids = [s.id for s in optimized_stops]
-                    new_route = self._create_sub_route_for_stops_stops(stop_ids)
+                    new_route, saving = self._create_distance_optimized_sub_route(current_route_stops)
+                    distance_saved += saving
                     new_routes.append(new_route)
 
                 processed_stops.add(area_id)
@@ -1493,7 +1829,8 @@ class TmsRoute(models.Model):
                 'tag': 'display_notification',
                 'params': {
                     'title': _('Routes Optimized for Distance'),
-                    'message': _('Reorganized route stops into {} routes optimized for minimal total distance traveled.').format(len(new_routes)),
+                    'message': _('Reorganized route stops into {} routes optimized for minimal total distance traveled '
+                                 '(local search saved {:.2f}km).').format(len(new_routes), distance_saved),
                     'type': 'success',
                     'sticky': False,
                 }
@@ -1510,6 +1847,18 @@ class TmsRoute(models.Model):
                 }
             }
 
+    def _create_distance_optimized_sub_route(self, stops):
+        """
+        Create a sub-route visiting ``stops`` in nearest neighbour order
+        improved by local search. Returns the route and the distance (km)
+        saved by the local search.
+        """
+        matrix = self._get_distance_matrix(stops)
+        optimized_stops = self._optimize_stops_by_distance(stops, matrix=matrix)
+        optimized_stops, iterations = self._improve_stop_sequence(optimized_stops, matrix=matrix)
+        new_route = self._create_sub_route_for_stops_stops([stop.id for stop in optimized_stops])
+        return new_route, sum(iteration['saving'] for iteration in iterations)
+
     def _create_sub_route_for_stops_stops(self, stop_ids_list):
         """Helper method to create a sub-route for a list of stop IDs"""
         # Create new route with same batch, area, and basic info
@@ -1520,10 +1869,10 @@ class TmsRoute(models.Model):
             'driver_familiarity_score': self.driver_familiarity_score,
         })
 
-        # Move stops to the new route
-        for stop_id in stop_ids_list:
+        # Move stops to the new route, keeping the given order as the visiting sequence
+        for sequence, stop_id in enumerate(stop_ids_list, start=1):
             stop = self.env['tms.route.stop'].browse(stop_id)
-            stop.route_id = new_route.id
+            stop.write({'route_id': new_route.id, 'sequence': sequence})
 
         return new_route
 
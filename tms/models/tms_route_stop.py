@@ -476,6 +476,17 @@ class TmsRouteStop(models.Model):
 
         return c * r
 
+    def _get_service_minutes(self):
+        """
+        Service duration at this stop in minutes: the customer's estimated
+        service time, or an estimate based on the deliveries count
+        (at least 15 mins, 5 mins per delivery).
+        """
+        self.ensure_one()
+        if self.partner_id.estimated_service_time:
+            return self.partner_id.estimated_service_time
+        return max(15, 5 * self.delivery_count)
+
     def action_calculate_timing(self):
         """
         Calculate arrival and departure times for all stops in the route
@@ -506,21 +517,18 @@ class TmsRouteStop(models.Model):
         warehouse_lat = route.vehicle_id and route.vehicle_id.partner_id and route.vehicle_id.partner_id.partner_latitude or 0
         warehouse_lng = route.vehicle_id and route.vehicle_id.partner_id and route.vehicle_id.partner_id.partner_longitude or 0
 
-        for i, stop in enumerate(stops):
+        # Compute every leg of the route at once
+        matrix = route._get_distance_matrix(stops, depot=(warehouse_lat, warehouse_lng))
+        previous_index = matrix.index_of('depot')
+
+        for stop in stops:
             # Calculate distance from previous stop (or warehouse for first stop)
-            if i == 0:
-                # Distance from warehouse to first stop
-                if warehouse_lat != 0 and warehouse_lng != 0 and stop.latitude and stop.longitude:
-                    distance_to_stop = self._get_distance_to_next_stop(
-                        type('obj', (object,), {'latitude': warehouse_lat, 'longitude': warehouse_lng})(),
-                        stop
-                    )
-                else:
-                    distance_to_stop = 5.0  # Default distance if coordinates unavailable
+            stop_index = matrix.index_of(stop)
+            if matrix.is_known(previous_index, stop_index):
+                distance_to_stop = matrix.distance(previous_index, stop_index)
             else:
-                # Distance from previous stop
-                prev_stop = stops[i-1]
-                distance_to_stop = self._get_distance_to_next_stop(prev_stop, stop)
+                distance_to_stop = 5.0  # Default distance if coordinates unavailable
+            previous_index = stop_index
 
             # Calculate travel time to this stop
             travel_time = self._calculate_travel_time(distance_to_stop)
@@ -536,10 +544,8 @@ class TmsRouteStop(models.Model):
             # Set planned arrival time
             stop.planned_arrival = planned_arrival
 
-            # Service time (for delivery) - estimate based on deliveries count, 15 mins per delivery min
-            delivery_count = stop.delivery_count
-            service_time_minutes = max(15, 5 * delivery_count)  # At least 15 mins, 5 mins per additional delivery
-            service_time = fields.timedelta(minutes=service_time_minutes)
+            # Service time (for delivery)
+            service_time = fields.timedelta(minutes=stop._get_service_minutes())
 
             # Calculate planned departure time
             planned_departure = planned_arrival + service_time
@@ -3,6 +3,10 @@ import math
 from odoo.tests import TransactionCase
 from odoo import fields
 
+from odoo.addons.tms.models.distance_matrix import DistanceMatrix, UNKNOWN_DISTANCE
+from odoo.addons.tms.models.route_local_search import improve_sequence
+from odoo.addons.tms.models.route_vrp_solver import INFINITY, VrpSolver
+
 
 class TestTmsRouteOptimization(TransactionCase):
     """
@@ -1053,4 +1057,171 @@ class TestTmsRouteOptimization(TransactionCase):
 
         # Each area should have 1 picking
         for area_id, pickings in area_picking_map.items():
-            self.assertEqual(len(pickings), 1, f"Area {area_id} should have 1 picking")
\ No newline at end of file
+            self.assertEqual(len(pickings), 1, f"Area {area_id} should have 1 picking")
+
+    def test_distance_matrix_matches_haversine(self):
+        """Test that the distance matrix agrees with the pairwise Haversine calculation"""
+        route = self.tms_route_model.new({})
+        partners = [self.partner_north_1, self.partner_north_2, self.partner_south_1, self.partner_east_1]
+        matrix = DistanceMatrix([(p.partner_latitude, p.partner_longitude) for p in partners])
+
+        self.assertEqual(len(matrix), 4, "Matrix should contain one point per partner")
+        for i, partner1 in enumerate(partners):
+            self.assertEqual(matrix.distance(i, i), 0.0, "Distance from a point to itself should be 0")
+            for j, partner2 in enumerate(partners):
+                expected = route._calculate_haversine_distance(
+                    partner1.partner_latitude, partner1.partner_longitude,
+                    partner2.partner_latitude, partner2.partner_longitude,
+                )
+                self.assertAlmostEqual(matrix.distance(i, j), expected, places=6,
+                                       msg="Matrix distance should match the Haversine formula")
+                self.assertEqual(matrix.distance(i, j), matrix.distance(j, i),
+                                 "Matrix should be symmetric")
+
+    def test_distance_matrix_missing_coordinates(self):
+        """Test that points without coordinates are pushed to the end of the sequence"""
+        matrix = DistanceMatrix([
+            (40.7128, -74.0060),
+            (0.0, 0.0),
+            (40.7228, -74.0160),
+            (40.6528, -74.0360),
+        ])
+
+        self.assertFalse(matrix.is_known(0, 1), "Leg to a point without coordinates should be unknown")
+        self.assertEqual(matrix.distance(0, 1), UNKNOWN_DISTANCE)
+
+        # The unlocated point is only visited once no located candidate is left
+        self.assertEqual(matrix.nearest_neighbour(0, [1, 2, 3]), [2, 3, 1])
+
+        # Legs to unlocated points do not count in the route length
+        self.assertAlmostEqual(matrix.route_length([0, 1, 2]), 0.0)
+        self.assertAlmostEqual(matrix.route_length([0, 2]), matrix.distance(0, 2))
+
+    def test_local_search_improves_crossing_sequence(self):
+        """Test that the 2-opt / Or-opt post-pass removes detours left by a bad sequence"""
+        # Points along a meridian, visited in a zig-zag order
+        matrix = DistanceMatrix([
+            (40.70, -74.00),
+            (40.72, -74.00),
+            (40.71, -74.00),
+            (40.74, -74.00),
+            (40.73, -74.00),
+        ])
+        sequence = [0, 1, 2, 3, 4]
+
+        improved, iterations = improve_sequence(matrix, sequence)
+
+        self.assertEqual(improved[0], 0, "The first point should stay in place")
+        self.assertEqual(sorted(improved), sequence, "All points should still be visited")
+        self.assertEqual(improved, [0, 2, 1, 4, 3], "Sequence should follow the meridian")
+        self.assertTrue(iterations, "At least one improving iteration should be reported")
+        self.assertAlmostEqual(
+            sum(iteration['saving'] for iteration in iterations),
+            matrix.route_length(sequence) - matrix.route_length(improved),
+            places=6,
+            msg="Reported savings should match the actual distance reduction",
+        )
+
+    def test_vrp_solver_time_windows_and_capacity(self):
+        """Test that the routing solver respects time windows and vehicle capacity"""
+        matrix = DistanceMatrix([
+            (40.70, -74.00),  # depot
+            (40.71, -74.00),
+            (40.72, -74.00),
+            (40.73, -74.00),
+        ])
+        stops = [
+            # Closest stop, but it can only be served late in the morning
+            {'index': 1, 'weight': 400.0, 'volume': 4.0, 'ready': 120.0, 'due': 180.0,
+             'service': 15.0, 'priority': False},
+            {'index': 2, 'weight': 400.0, 'volume': 4.0, 'ready': -INFINITY, 'due': INFINITY,
+             'service': 15.0, 'priority': False},
+            {'index': 3, 'weight': 400.0, 'volume': 4.0, 'ready': -INFINITY, 'due': 60.0,
+             'service': 15.0, 'priority': False},
+        ]
+        vehicles = [
+            {'depot': 0, 'start': 0.0, 'max_weight': 1000.0, 'max_volume': 50.0},
+            {'depot': 0, 'start': 0.0, 'max_weight': 1000.0, 'max_volume': 50.0},
+        ]
+
+        result = VrpSolver(matrix, stops, vehicles).solve()
+
+        self.assertFalse(result['unassigned'], "All stops should be served")
+        for vehicle, route in enumerate(result['routes']):
+            self.assertLessEqual(sum(stops[position]['weight'] for position in route), 1000.0,
+                                 "Vehicle capacity should be respected")
+            for position, start in zip(route, result['starts'][vehicle]):
+                self.assertGreaterEqual(start, stops[position]['ready'], "Service cannot start before the window")
+                self.assertLessEqual(start, stops[position]['due'], "Service cannot start after the window")
+
+        # A stop whose window closes before the vehicle can reach it cannot be served
+        stops[2]['due'] = 1.0
+        result = VrpSolver(matrix, stops, vehicles).solve()
+        self.assertEqual(result['unassigned'], [2], "Unreachable stop should be reported as unassigned")
+
+    def test_optimize_fleet_rebalances_routes(self):
+        """Test that the fleet optimizer plans all routes of a day in a single solve"""
+        departure = fields.Datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+        routes = self.tms_route_model
+        for name in ('Fleet Batch 1', 'Fleet Batch 2'):
+            batch = self.stock_picking_batch_model.create({
+                'name': name,
+                'departure_time': departure,
+            })
+            routes |= self.tms_route_model.create({
+                'picking_batch_id': batch.id,
+                'area_id': self.area_north.id,
+            })
+
+        partners = [self.partner_north_1, self.partner_south_1, self.partner_north_2, self.partner_east_1]
+        for sequence, partner in enumerate(partners, start=1):
+            self.tms_route_stop_model.create({
+                'route_id': routes[0].id,
+                'partner_id': partner.id,
+                'sequence': sequence,
+            })
+        stops = routes.stop_ids
+
+        results = self.tms_route_model._optimize_fleet(departure.date())
+
+        self.assertEqual(len(results), 1, "Routes without warehouse should be solved as one group")
+        result = list(results.values())[0]
+        self.assertFalse(result['unassigned'], "All stops should be planned")
+        self.assertEqual(set(routes.stop_ids.ids), set(stops.ids), "No stop should leave the day's routes")
+        for route in routes:
+            sequences = route.stop_ids.sorted('sequence').mapped('sequence')
+            self.assertEqual(sequences, list(range(1, len(sequences) + 1)),
+                             "Each route should have a contiguous sequence")
+            for stop in route.stop_ids:
+                self.assertTrue(stop.planned_arrival, "Planned stops should have an arrival time")
+
+    def test_optimize_all_routes_for_distance_split_sequences(self):
+        """Test that sub-routes split for capacity are sequenced for distance"""
+        batch = self.stock_picking_batch_model.create({
+            'name': 'Split Distance Test Batch',
+            'vehicle_id': self.vehicle.id,
+        })
+        route = self.tms_route_model.create({
+            'name': 'Split Distance Test Route',
+            'picking_batch_id': batch.id,
+            'area_id': self.area_north.id,
+            'vehicle_id': self.vehicle.id,
+        })
+        stops = self.tms_route_stop_model
+        for partner in (self.partner_north_1, self.partner_south_1, self.partner_north_2, self.partner_east_1):
+            stops |= self.tms_route_stop_model.create({
+                'route_id': route.id,
+                'partner_id': partner.id,
+                'area_id': self.area_north.id,
+                'total_weight': 400.0,
+                'total_volume': 5.0,
+            })
+
+        result = route.action_optimize_all_routes_for_distance()
+
+        self.assertEqual(result['params']['title'], 'Routes Optimized for Distance')
+        sub_routes = stops.mapped('route_id')
+        self.assertEqual(len(sub_routes), 2, "The area exceeds capacity and should be split in two")
+        for sub_route in sub_routes:
+            self.assertEqual(sorted(sub_route.stop_ids.mapped('sequence')), [1, 2],
+                             "Stops of each sub-route should be sequenced")
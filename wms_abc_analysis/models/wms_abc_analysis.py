@@ -64,126 +64,112 @@ class WmsAbcAnalysis(models.Model):
                 ('categ_id', '!=', False),
             ])
 
-            # Calculate metrics for each product
-            for product in products:
-                # Calculate product metrics (value, volume, frequency)
-                value = self._calculate_product_value(product, analysis.period_start, analysis.period_end)
-                volume = self._calculate_product_volume(product, analysis.period_start, analysis.period_end)
-                frequency = self._calculate_product_frequency(product, analysis.period_start, analysis.period_end)
-
-                # Determine ABC class based on the analysis method
-                abc_class = self._determine_abc_class(product, analysis, value, volume, frequency)
+            # Calculate metrics (value, volume, frequency) of all products at once
+            metrics = analysis._calculate_product_metrics(analysis.period_start, analysis.period_end)
 
-                # Create analysis line
-                self.env['wms.abc.analysis.line'].create({
+            # Classify all products together, then create the lines in one batch
+            classes = analysis._classify_products(products, metrics)
+            line_vals = []
+            for product in products:
+                value, volume, frequency = metrics.get(product.id, (0.0, 0.0, 0))
+                line_vals.append({
                     'analysis_id': analysis.id,
                     'product_id': product.id,
                     'value': value,
                     'volume': volume,
                     'frequency': frequency,
-                    'abc_class': abc_class,
+                    'abc_class': classes[product.id],
                     'unit_cost': product.standard_price,
                 })
+            self.env['wms.abc.analysis.line'].create(line_vals)
 
         self.write({'status': 'completed'})
 
-    def _calculate_product_value(self, product, start_date, end_date):
-        """Calculate the value of product movement during the period"""
-        # This is a simplified calculation - in a real implementation,
-        # this would look at actual stock movements
-        moves = self.env['stock.move'].search([
-            ('product_id', '=', product.id),
-            ('state', '=', 'done'),
-            ('date', '>=', start_date),
-            ('date', '<=', end_date),
-            ('picking_id.owner_id', '=', self.owner_id.id),
-        ])
-        total_value = 0.0
-        for move in moves:
-            total_value += move.value  # This is the accounting value of the move
-        return total_value
-
-    def _calculate_product_volume(self, product, start_date, end_date):
-        """Calculate the volume of product movement during the period"""
-        moves = self.env['stock.move'].search([
-            ('product_id', '=', product.id),
-            ('state', '=', 'done'),
-            ('date', '>=', start_date),
-            ('date', '<=', end_date),
-            ('picking_id.owner_id', '=', self.owner_id.id),
-        ])
-        total_volume = sum(moves.mapped('product_uom_qty'))
-        return total_volume
-
-    def _calculate_product_frequency(self, product, start_date, end_date):
-        """Calculate the frequency of product movement during the period"""
-        moves = self.env['stock.move'].search([
-            ('product_id', '=', product.id),
-            ('state', '=', 'done'),
-            ('date', '>=', start_date),
-            ('date', '<=', end_date),
-            ('picking_id.owner_id', '=', self.owner_id.id),
-        ])
-        return len(moves)
-
-    def _determine_abc_class(self, product, analysis, value, volume, frequency):
-        """Determine the ABC class based on rules"""
-        # Default rules if no custom rules defined
-        a_rules = analysis.abc_rules.filtered(lambda r: r.abc_class == 'A')
-        b_rules = analysis.abc_rules.filtered(lambda r: r.abc_class == 'B')
-        c_rules = analysis.abc_rules.filtered(lambda r: r.abc_class == 'C')
-
-        # Use default thresholds if no custom rules
-        if not a_rules:
-            a_rules = self.env['wms.abc.rule'].search([('default_rules', '=', True), ('abc_class', '=', 'A')], limit=1)
-        if not b_rules:
-            b_rules = self.env['wms.abc.rule'].search([('default_rules', '=', True), ('abc_class', '=', 'B')], limit=1)
-        if not c_rules:
-            c_rules = self.env['wms.abc.rule'].search([('default_rules', '=', True), ('abc_class', '=', 'C')], limit=1)
-
-        # Determine class based on method
-        if analysis.analysis_method == 'value':
-            # A class: top 20% by value
-            # B class: next 30% by value
-            # C class: remaining 50% by value
-            return self._classify_by_value(product, analysis, value)
-        elif analysis.analysis_method == 'volume':
-            # A class: top 20% by volume
-            # B class: next 30% by volume
-            # C class: remaining 50% by volume
-            return self._classify_by_volume(product, analysis, volume)
-        elif analysis.analysis_method == 'frequency':
-            # A class: top 20% by frequency
-            # B class: next 30% by frequency
-            # C class: remaining 50% by frequency
-            return self._classify_by_frequency(product, analysis, frequency)
-        else:  # combined
-            # Use combined approach
-            return self._classify_combined(product, analysis, value, volume, frequency)
-
-    def _classify_by_value(self, product, analysis, value):
-        """Classify product by value"""
-        # This would need to compare against other products' values
-        # For now, return 'C' as default
-        return 'C'
-
-    def _classify_by_volume(self, product, analysis, volume):
-        """Classify product by volume"""
-        # This would need to compare against other products' volumes
-        # For now, return 'C' as default
-        return 'C'
-
-    def _classify_by_frequency(self, product, analysis, frequency):
-        """Classify product by frequency"""
-        # This would need to compare against other products' frequencies
-        # For now, return 'C' as default
-        return 'C'
-
-    def _classify_combined(self, product, analysis, value, volume, frequency):
-        """Classify product by combined metrics"""
-        # This would use a weighted combination of all factors
-        # For now, return 'C' as default
-        return 'C'
+    def _calculate_product_metrics(self, start_date, end_date):
+        """
+        Calculate the value, volume and frequency of product movement during
+        the period for the analysis owner, with a single grouped query over the
+        done stock moves.
+
+        Returns {product_id: (value, volume, frequency)}
+        """
+        self.ensure_one()
+        self.env['stock.move'].flush_model(['product_id', 'state', 'date', 'picking_id', 'product_qty', 'price_unit'])
+        self.env['stock.picking'].flush_model(['owner_id'])
+        self.env.cr.execute("""
+            SELECT move.product_id,
+                   SUM(ABS(move.price_unit) * move.product_qty),
+                   SUM(move.product_qty),
+                   COUNT(move.id)
+              FROM stock_move move
+              JOIN stock_picking picking ON picking.id = move.picking_id
+             WHERE move.state = 'done'
+               AND move.date >= %s
+               AND move.date < %s
+               AND picking.owner_id = %s
+          GROUP BY move.product_id
+        """, (start_date, fields.Date.add(end_date, days=1), self.owner_id.partner_id.id))
+        return {
+            product_id: (value or 0.0, volume or 0.0, frequency)
+            for product_id, value, volume, frequency in self.env.cr.fetchall()
+        }
+
+    def _get_class_percentages(self):
+        """
+        Share of products (in %) in the A and B classes, from the analysis
+        rules, the default rules or the 20% / 30% / 50% split.
+        """
+        self.ensure_one()
+        percentages = {}
+        for abc_class, default in (('A', 20.0), ('B', 30.0)):
+            rule = self.abc_rules.filtered(lambda r: r.abc_class == abc_class)[:1]
+            if not rule:
+                rule = self.env['wms.abc.rule'].search([('default_rules', '=', True), ('abc_class', '=', abc_class)], limit=1)
+            percentages[abc_class] = rule.percentage or default
+        return percentages['A'], percentages['B']
+
+    def _classify_products(self, products, metrics):
+        """
+        Pareto classification of ``products`` in memory: products are ranked
+        by the metric of the analysis method, the top products are A class,
+        the next ones B class and the remaining ones (and every product
+        without movement) C class.
+
+        Returns {product_id: abc_class}
+        """
+        self.ensure_one()
+        totals = [sum(values[i] for values in metrics.values()) or 1.0 for i in range(3)]
+
+        def score(product_id):
+            value, volume, frequency = metrics.get(product_id, (0.0, 0.0, 0))
+            if self.analysis_method == 'value':
+                return value
+            elif self.analysis_method == 'volume':
+                return volume
+            elif self.analysis_method == 'frequency':
+                return frequency
+            # combined: average share of the three metrics
+            return (value / totals[0] + volume / totals[1] + frequency / totals[2]) / 3.0
+
+        scores = {product.id: score(product.id) for product in products}
+        ranked = sorted(scores, key=lambda product_id: scores[product_id], reverse=True)
+
+        a_percentage, b_percentage = self._get_class_percentages()
+        count = len(ranked)
+        a_limit = count * a_percentage / 100.0
+        b_limit = count * (a_percentage + b_percentage) / 100.0
+
+        classes = {}
+        for rank, product_id in enumerate(ranked):
+            if scores[product_id] <= 0:
+                classes[product_id] = 'C'
+            elif rank < a_limit:
+                classes[product_id] = 'A'
+            elif rank < b_limit:
+                classes[product_id] = 'B'
+            else:
+                classes[product_id] = 'C'
+        return classes
 
     def action_archive_analysis(self):
         """Archive the analysis record"""
@@ -254,4 +254,45 @@ class TestWmsAbcAnalysis(TransactionCase):
         })
 
         self.assertNotEqual(abc_analysis1.owner_id.id, abc_analysis2.owner_id.id)
-        self.assertNotEqual(abc_analysis1.name, abc_analysis2.name)
\ No newline at end of file
+        self.assertNotEqual(abc_analysis1.name, abc_analysis2.name)
+
+    def test_abc_pareto_classification(self):
+        """Test that products are classified together by their rank"""
+        abc_analysis = self.env['wms.abc.analysis'].create({
+            'name': 'Pareto Test',
+            'owner_id': self.test_owner.id,
+            'period_start': fields.Date.today(),
+            'period_end': fields.Date.add(fields.Date.today(), days=30),
+            'analysis_method': 'value',
+        })
+        products = self.env['product.product'].create([{
+            'name': f'Pareto Product {i}',
+            'type': 'product',
+            'categ_id': self.env.ref('product.product_category_all').id,
+        } for i in range(10)])
+
+        # Product i has a value of (10 - i) * 100, the last product never moved
+        metrics = {product.id: ((10 - i) * 100.0, 10.0, 1) for i, product in enumerate(products[:9])}
+
+        classes = abc_analysis._classify_products(products, metrics)
+
+        # Default split: top 20% A, next 30% B, remaining C
+        self.assertEqual([classes[p.id] for p in products],
+                         ['A', 'A', 'B', 'B', 'B', 'C', 'C', 'C', 'C', 'C'])
+
+    def test_abc_run_analysis_creates_lines(self):
+        """Test that running the analysis creates one line per product in one pass"""
+        abc_analysis = self.env['wms.abc.analysis'].create({
+            'name': 'Run Test',
+            'owner_id': self.test_owner.id,
+            'period_start': fields.Date.today(),
+            'period_end': fields.Date.add(fields.Date.today(), days=30),
+        })
+
+        abc_analysis.action_run_analysis()
+
+        self.assertEqual(abc_analysis.status, 'completed')
+        line = abc_analysis.analysis_lines.filtered(lambda l: l.product_id == self.test_product)
+        self.assertEqual(len(line), 1, "Each product should have one analysis line")
+        self.assertEqual(line.frequency, 0, "Product without movement should have no frequency")
+        self.assertEqual(line.abc_class, 'C', "Product without movement should be C class")
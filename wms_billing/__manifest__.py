@@ -11,6 +11,7 @@
     'data': [
         'security/ir.model.access.csv',
         'data/sequences.xml',
+        'data/billing_cron.xml',
         'views/wms_billing_rule_views.xml',
         'views/wms_billing_record_views.xml',
         'views/wms_invoice_views.xml',
@@ -1,3 +1,4 @@
 from . import wms_billing_rule
 from . import wms_billing_record
-from . import wms_invoice
\ No newline at end of file
+from . import wms_invoice
+from . import stock_picking
@@ -0,0 +1,109 @@
+from odoo import models, fields
+from collections import defaultdict
+
+# Billing operation types charged when a picking of the given type is done
+PICKING_BILLING_OPERATIONS = {
+    'incoming': ('inbound', 'overweight', 'oversize'),
+    'outgoing': ('outbound', 'pick_pack', 'overweight', 'oversize'),
+}
+
+
+class StockPicking(models.Model):
+    _inherit = 'stock.picking'
+
+    def _action_done(self):
+        res = super()._action_done()
+        self._capture_billing_charges()
+        return res
+
+    def _get_billing_line_data(self):
+        """
+        Done quantities of the pickings, with one grouped query:
+        {picking_id: [(quantity, unit weight, unit volume, package_id), ...]}
+        """
+        self.env['stock.move.line'].flush_model(['picking_id', 'product_id', 'quantity_product_uom', 'result_package_id'])
+        self.env.cr.execute("""
+            SELECT ml.picking_id, SUM(ml.quantity_product_uom)::float,
+                   COALESCE(pp.weight, 0)::float, COALESCE(pp.volume, 0)::float, ml.result_package_id
+            FROM stock_move_line ml
+            JOIN product_product pp ON pp.id = ml.product_id
+            WHERE ml.picking_id = ANY(%s)
+            GROUP BY ml.picking_id, ml.product_id, pp.weight, pp.volume, ml.result_package_id
+        """, [self.ids])
+        lines = defaultdict(list)
+        for picking_id, quantity, weight, volume, package_id in self.env.cr.fetchall():
+            lines[picking_id].append((quantity, weight, volume, package_id))
+        return lines
+
+    def _get_billing_quantity(self, rule, lines):
+        """Quantity charged by ``rule`` for the done ``lines`` of one picking, None if not applicable"""
+        if rule.operation_type == 'overweight':
+            lines = [line for line in lines if line[1] > rule.threshold]
+        elif rule.operation_type == 'oversize':
+            lines = [line for line in lines if line[2] > rule.threshold]
+        if not lines:
+            return None
+
+        if rule.price_type in ('per_order', 'fixed'):
+            return 1.0
+        if rule.price_type == 'per_unit':
+            return sum(quantity for quantity, _weight, _volume, _package in lines)
+        if rule.price_type == 'per_kg':
+            return sum(quantity * weight for quantity, weight, _volume, _package in lines)
+        if rule.price_type == 'per_cbm':
+            return sum(quantity * volume for quantity, _weight, volume, _package in lines)
+        if rule.price_type == 'per_pallet':
+            return float(len({package for _quantity, _weight, _volume, package in lines if package}) or 1)
+        # per_hour and percentage charges cannot be derived from the operation
+        return None
+
+    def _capture_billing_charges(self):
+        """
+        Create the billing records of the done pickings from their owner's
+        rules, in one create, inside the validation transaction.
+        """
+        pickings = self.filtered(
+            lambda picking: picking.state == 'done' and picking.owner_id
+            and picking.picking_type_code in PICKING_BILLING_OPERATIONS
+        )
+        if not pickings:
+            return self.env['wms.billing.record']
+
+        owners = {
+            owner.partner_id.id: owner
+            for owner in self.env['wms.owner'].search([('partner_id', 'in', pickings.owner_id.ids)])
+        }
+        captured = set(self.env['wms.billing.record'].search([
+            ('related_picking_id', 'in', pickings.ids),
+            ('calculated_by', '=', 'capture'),
+        ]).related_picking_id.ids)
+
+        Rule = self.env['wms.billing.rule']
+        line_data = pickings._get_billing_line_data()
+        vals_list = []
+        for picking in pickings:
+            owner = owners.get(picking.owner_id.id)
+            if not owner or picking.id in captured:
+                continue
+            rule_table = Rule._get_owner_rule_table(owner.id)
+            for operation_type in PICKING_BILLING_OPERATIONS[picking.picking_type_code]:
+                for rule in Rule.browse(rule_table.get(operation_type, ())):
+                    quantity = picking._get_billing_quantity(rule, line_data.get(picking.id, []))
+                    if not quantity:
+                        continue
+                    unit_price = rule.unit_price
+                    if rule.apply_seasonal_factor:
+                        unit_price *= rule.seasonal_factor
+                    vals_list.append({
+                        'owner_id': owner.id,
+                        'operation_type': rule.operation_type,
+                        'service_type': rule.service_type,
+                        'operation_date': picking.date_done or fields.Datetime.now(),
+                        'quantity': quantity,
+                        'unit_price': unit_price,
+                        'billing_rule_id': rule.id,
+                        'related_picking_id': picking.id,
+                        'calculated_by': 'capture',
+                        'calculation_method': rule.price_type,
+                    })
+        return self.env['wms.billing.record'].create(vals_list)
@@ -1,4 +1,27 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, _
+from odoo.tools import date_utils, split_every
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+import logging
+import math
+
+_logger = logging.getLogger(__name__)
+
+# Volume (CBM) of a standard pallet, used to count pallets for stock that is
+# not in a package
+STANDARD_PALLET_VOLUME = 1.5
+
+# Billing records created per batch by the storage billing run
+BILLING_CREATE_BATCH = 1000
+
+# Snapshot measure billed by each storage price type
+STORAGE_PRICE_BASIS = {
+    'per_cbm': 'volume',
+    'per_kg': 'weight',
+    'per_pallet': 'pallets',
+    'per_unit': 'quantity',
+    'fixed': None,
+}
 
 
 class WmsBillingRecord(models.Model):
@@ -17,6 +40,8 @@ class WmsBillingRecord(models.Model):
         ('pick_pack', 'Pick & Pack'),
         ('palletizing', 'Palletizing'),
         ('repackaging', 'Repackaging'),
+        ('overweight', 'Overweight Handling'),
+        ('oversize', 'Oversize Handling'),
     ], 'Operation Type', required=True)
     service_type = fields.Char('Service Type')
     operation_date = fields.Datetime('Operation Date', required=True, default=fields.Datetime.now)
@@ -39,11 +64,12 @@ class WmsBillingRecord(models.Model):
     calculated_by = fields.Char('Calculated By')
     calculation_method = fields.Char('Calculation Method')
 
-    @api.model
-    def create(self, vals):
-        if not vals.get('name'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('wms.billing.record') or '/'
-        return super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if not vals.get('name'):
+                vals['name'] = self.env['ir.sequence'].next_by_code('wms.billing.record') or '/'
+        return super().create(vals_list)
 
     @api.depends('quantity', 'unit_price')
     def _compute_amount(self):
@@ -65,6 +91,7 @@ class WmsBillingRecord(models.Model):
 
     def action_create_invoice(self):
         """Create an invoice for the billing records"""
+        invoice_defaults = {}
         for record in self:
             if record.state != 'confirmed':
                 continue
@@ -78,20 +105,108 @@ class WmsBillingRecord(models.Model):
                 'partner_id': record.owner_id.partner_id.id,
                 'move_type': 'out_invoice',
                 'invoice_date': fields.Date.context_today(self),
-                'invoice_line_ids': [(0, 0, {
-                    'name': f'{record.operation_type} - {record.service_type or ""}',
-                    'quantity': record.quantity or 1,
-                    'price_unit': record.unit_price,
-                    'account_id': self.env['account.account'].search([
-                        ('user_type_id.type', '=', 'income'),
-                        ('company_id', '=', self.env.company.id)
-                    ], limit=1).id
-                })]
+                'invoice_line_ids': [(0, 0, record._prepare_invoice_line_vals(invoice_defaults))]
             }
             invoice = self.env['account.move'].create(invoice_vals)
             record.invoice_id = invoice.id
             record.state = 'invoiced'
 
+    def _get_invoice_defaults(self, cache):
+        """
+        Income account and sale taxes of the record's company, resolved once
+        per company and kept in ``cache`` for the other records.
+        """
+        company = self.owner_id.company_id or self.env.company
+        if company.id not in cache:
+            account = self.env['account.account'].search([
+                ('account_type', '=', 'income'),
+                ('company_ids', 'in', company.id),
+            ], limit=1)
+            cache[company.id] = {
+                'account_id': account.id,
+                'tax_ids': company.account_sale_tax_id.ids,
+            }
+        return cache[company.id]
+
+    def _prepare_invoice_line_vals(self, cache):
+        """Invoice line of the record; min / max charges are kept in the unit price"""
+        self.ensure_one()
+        defaults = self._get_invoice_defaults(cache)
+        quantity = self.quantity or 1
+        price_unit = self.unit_price
+        if self.amount and self.quantity and self.unit_price and self.amount != self.quantity * self.unit_price:
+            price_unit = self.amount / quantity
+        return {
+            'name': f'{self.operation_type} - {self.service_type or ""}',
+            'quantity': quantity,
+            'price_unit': price_unit,
+            'account_id': defaults['account_id'],
+            'tax_ids': [(6, 0, defaults['tax_ids'])],
+        }
+
+    def _get_billing_period(self):
+        """Billing period (start, end) of the record, following the owner's billing cycle"""
+        self.ensure_one()
+        day = fields.Date.to_date(self.operation_date)
+        cycle = self.owner_id.billing_cycle or 'monthly'
+        if cycle == 'daily':
+            return day, day
+        if cycle == 'weekly':
+            start = day - timedelta(days=day.weekday())
+            return start, start + timedelta(days=6)
+        return date_utils.start_of(day, 'month'), date_utils.end_of(day, 'month')
+
+    def action_create_consolidated_invoice(self):
+        """
+        Create one invoice per owner and billing period for the confirmed,
+        not yet invoiced records, with one line per record. All invoices are
+        created with a single create.
+        """
+        records = self.filtered(lambda record: record.state == 'confirmed' and not record.invoice_id)
+        if not records:
+            return False
+
+        groups = defaultdict(list)
+        for record in records.sorted('operation_date'):
+            groups[(record.owner_id, record._get_billing_period())].append(record)
+
+        invoice_defaults = {}
+        today = fields.Date.context_today(self)
+        keys = list(groups)
+        invoice_vals_list = []
+        for owner, (period_start, period_end) in keys:
+            invoice_vals_list.append({
+                'partner_id': owner.partner_id.id,
+                'move_type': 'out_invoice',
+                'invoice_date': today,
+                'invoice_origin': '%s - %s' % (period_start, period_end),
+                'invoice_line_ids': [
+                    (0, 0, record._prepare_invoice_line_vals(invoice_defaults))
+                    for record in groups[(owner, (period_start, period_end))]
+                ],
+            })
+        invoices = self.env['account.move'].create(invoice_vals_list)
+
+        wms_invoice_vals_list = []
+        for key, invoice in zip(keys, invoices):
+            group = self.browse([record.id for record in groups[key]])
+            group.write({'invoice_id': invoice.id, 'state': 'invoiced'})
+            wms_invoice_vals_list.append({
+                'account_move_id': invoice.id,
+                'billing_records_ids': [(6, 0, group.ids)],
+                'billing_period_start': key[1][0],
+                'billing_period_end': key[1][1],
+            })
+        self.env['wms.invoice'].create(wms_invoice_vals_list)
+
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Invoices'),
+            'res_model': 'account.move',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', invoices.ids)],
+        }
+
     def action_mark_paid(self):
         self.write({'state': 'paid'})
 
@@ -99,4 +214,105 @@ class WmsBillingRecord(models.Model):
         self.write({'state': 'cancelled'})
 
     def action_reset_to_draft(self):
-        self.write({'state': 'draft'})
\ No newline at end of file
+        self.write({'state': 'draft'})
+
+    @api.model
+    def _get_storage_snapshot(self, partner_ids):
+        """
+        Stock held in internal locations per owner partner, with one grouped
+        query over stock.quant joined to the product dimensions.
+
+        Returns {partner_id: {'quantity', 'volume', 'weight', 'pallets'}}.
+        Packaged stock counts one pallet per package, loose stock is
+        converted with STANDARD_PALLET_VOLUME.
+        """
+        if not partner_ids:
+            return {}
+        self.env['stock.quant'].flush_model(['location_id', 'owner_id', 'product_id', 'package_id', 'quantity'])
+        self.env['product.product'].flush_model(['volume', 'weight'])
+        self.env.cr.execute("""
+            SELECT q.owner_id,
+                   SUM(q.quantity)::float,
+                   SUM(q.quantity * COALESCE(pp.volume, 0))::float,
+                   SUM(q.quantity * COALESCE(pp.weight, 0))::float,
+                   COUNT(DISTINCT q.package_id),
+                   SUM(CASE WHEN q.package_id IS NULL THEN q.quantity * COALESCE(pp.volume, 0) ELSE 0 END)::float
+            FROM stock_quant q
+            JOIN product_product pp ON pp.id = q.product_id
+            JOIN stock_location l ON l.id = q.location_id
+            WHERE l.usage = 'internal'
+              AND q.quantity > 0
+              AND q.owner_id = ANY(%s)
+            GROUP BY q.owner_id
+        """, [list(partner_ids)])
+        snapshot = {}
+        for partner_id, quantity, volume, weight, packages, loose_volume in self.env.cr.fetchall():
+            snapshot[partner_id] = {
+                'quantity': quantity,
+                'volume': volume,
+                'weight': weight,
+                'pallets': packages + math.ceil(max(loose_volume, 0.0) / STANDARD_PALLET_VOLUME),
+            }
+        return snapshot
+
+    @api.model
+    def _run_storage_billing(self, billing_date=None):
+        """
+        Create the storage charges of ``billing_date`` (default today) for
+        every owner with active storage rules, from one stock snapshot.
+
+        Rules already billed for that day are skipped, so the run can be
+        restarted. Returns the created billing records.
+        """
+        billing_date = billing_date or fields.Date.context_today(self)
+        rules = self.env['wms.billing.rule'].search([
+            ('operation_type', '=', 'storage'),
+            ('price_type', 'in', list(STORAGE_PRICE_BASIS)),
+            ('active', '=', True),
+        ])
+        operation_date = datetime.combine(billing_date, time(23, 59, 59))
+        billed = self.search([
+            ('operation_type', '=', 'storage'),
+            ('billing_rule_id', 'in', rules.ids),
+            ('operation_date', '>=', datetime.combine(billing_date, time.min)),
+            ('operation_date', '<=', operation_date),
+        ]).billing_rule_id
+        rules -= billed
+
+        snapshot = self._get_storage_snapshot(set(rules.owner_id.partner_id.ids))
+        vals_list = []
+        for rule in rules:
+            stock = snapshot.get(rule.owner_id.partner_id.id)
+            if not stock:
+                continue
+            basis = STORAGE_PRICE_BASIS[rule.price_type]
+            quantity = stock[basis] if basis else 1.0
+            if quantity <= 0:
+                continue
+            unit_price = rule.unit_price
+            if rule.apply_seasonal_factor:
+                unit_price *= rule.seasonal_factor
+            vals_list.append({
+                'owner_id': rule.owner_id.id,
+                'operation_type': 'storage',
+                'service_type': rule.service_type,
+                'operation_date': operation_date,
+                'quantity': quantity,
+                'unit_price': unit_price,
+                'billing_rule_id': rule.id,
+                'calculated_by': 'storage_billing',
+                'calculation_method': rule.price_type,
+            })
+
+        record_ids = []
+        for batch in split_every(BILLING_CREATE_BATCH, vals_list, list):
+            record_ids += self.create(batch).ids
+        records = self.browse(record_ids)
+        _logger.info("Storage billing of %s: %s record(s) created", billing_date, len(records))
+        return records
+
+    @api.model
+    def _cron_storage_billing(self):
+        """Nightly storage billing"""
+        self._run_storage_billing()
+        return True
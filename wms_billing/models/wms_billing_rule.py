@@ -1,4 +1,4 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 
 
@@ -46,6 +46,9 @@ class WmsBillingRule(models.Model):
     max_charge = fields.Float('Maximum Charge')
     apply_seasonal_factor = fields.Boolean('Apply Seasonal Factor')
     seasonal_factor = fields.Float('Seasonal Factor', default=1.0)
+    threshold = fields.Float('Threshold',
+                             help='Overweight: unit weight (kg) above which a product is charged. '
+                                  'Oversize: unit volume (CBM) above which a product is charged.')
     active = fields.Boolean('Active', default=True)
 
     @api.constrains('unit_price', 'min_charge', 'max_charge')
@@ -62,4 +65,32 @@ class WmsBillingRule(models.Model):
     def _check_seasonal_factor(self):
         for rule in self:
             if rule.apply_seasonal_factor and rule.seasonal_factor <= 0:
-                raise ValidationError("Seasonal factor must be positive.")
\ No newline at end of file
+                raise ValidationError("Seasonal factor must be positive.")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache('owner_id')
+    def _get_owner_rule_table(self, owner_id):
+        """
+        Active rules of an owner as {operation_type: (rule ids)}, cached until
+        a billing rule is created, modified or deleted.
+        """
+        table = {}
+        for rule in self.search([('owner_id', '=', owner_id), ('active', '=', True)], order='id'):
+            table.setdefault(rule.operation_type, []).append(rule.id)
+        return {operation_type: tuple(rule_ids) for operation_type, rule_ids in table.items()}
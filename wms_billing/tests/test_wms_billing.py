@@ -212,4 +212,145 @@ class TestWmsBilling(TransactionCase):
         })
 
         self.assertNotEqual(rule1.owner_id.id, rule2.owner_id.id)
-        self.assertNotEqual(rule1.billing_method, rule2.billing_method)
\ No newline at end of file
+        self.assertNotEqual(rule1.billing_method, rule2.billing_method)
+
+    def test_storage_billing_run(self):
+        """Test the nightly storage billing from a quant snapshot"""
+        product = self.env['product.product'].create({
+            'name': 'Stored Product',
+            'type': 'product',
+            'weight': 2.0,
+            'volume': 0.5,
+        })
+        stock = self.env.ref('stock.stock_location_stock')
+        self.env['stock.quant']._update_available_quantity(
+            product, stock, 10.0, owner_id=self.test_owner.partner_id)
+
+        rule_kg = self.env['wms.billing.rule'].create({
+            'name': 'Storage per KG',
+            'owner_id': self.test_owner.id,
+            'operation_type': 'storage',
+            'price_type': 'per_kg',
+            'unit_price': 0.5,
+            'apply_seasonal_factor': True,
+            'seasonal_factor': 2.0,
+        })
+        rule_cbm = self.env['wms.billing.rule'].create({
+            'name': 'Storage per CBM',
+            'owner_id': self.test_owner.id,
+            'operation_type': 'storage',
+            'price_type': 'per_cbm',
+            'unit_price': 1.0,
+            'min_charge': 20.0,
+        })
+
+        records = self.env['wms.billing.record']._run_storage_billing()
+        self.assertEqual(len(records), 2)
+        record_kg = records.filtered(lambda r: r.billing_rule_id == rule_kg)
+        self.assertAlmostEqual(record_kg.quantity, 20.0)
+        self.assertAlmostEqual(record_kg.amount, 20.0)
+        record_cbm = records.filtered(lambda r: r.billing_rule_id == rule_cbm)
+        self.assertAlmostEqual(record_cbm.quantity, 5.0)
+        self.assertAlmostEqual(record_cbm.amount, 20.0)
+
+        # A second run on the same day does not bill twice
+        self.assertFalse(self.env['wms.billing.record']._run_storage_billing())
+
+    def test_consolidated_invoice(self):
+        """Test one invoice per owner and billing period"""
+        owner2 = self.env['wms.owner'].create({
+            'name': 'Consolidated Owner',
+            'code': 'CO',
+            'is_warehouse_owner': True,
+        })
+        rule = self.env['wms.billing.rule'].create({
+            'name': 'Outbound with minimum',
+            'owner_id': self.test_owner.id,
+            'operation_type': 'outbound',
+            'unit_price': 1.0,
+            'min_charge': 50.0,
+        })
+        Record = self.env['wms.billing.record']
+        operation_date = fields.Datetime.now()
+        records = Record.create([{
+            'owner_id': owner.id,
+            'operation_type': 'outbound',
+            'operation_date': operation_date,
+            'quantity': quantity,
+            'unit_price': 1.0,
+            'billing_rule_id': rule_id,
+        } for owner, quantity, rule_id in (
+            (self.test_owner, 10.0, rule.id),
+            (self.test_owner, 5.0, False),
+            (owner2, 3.0, False),
+        )])
+        records.action_confirm()
+
+        records.action_create_consolidated_invoice()
+        self.assertTrue(all(record.state == 'invoiced' for record in records))
+        invoices = records.invoice_id
+        self.assertEqual(len(invoices), 2)
+        invoice = records[0].invoice_id
+        self.assertEqual(records[1].invoice_id, invoice)
+        self.assertEqual(len(invoice.invoice_line_ids), 2)
+        # The minimum charge is carried by the invoice line
+        self.assertAlmostEqual(sum(invoice.invoice_line_ids.mapped('price_subtotal')), 55.0)
+        wms_invoice = self.env['wms.invoice'].search([('account_move_id', '=', invoice.id)])
+        self.assertEqual(wms_invoice.billing_records_ids, records[:2])
+
+    def test_billing_capture_on_validation(self):
+        """Test that validating a receipt captures its charges"""
+        product = self.env['product.product'].create({
+            'name': 'Heavy Product',
+            'type': 'product',
+            'weight': 40.0,
+        })
+        Rule = self.env['wms.billing.rule']
+        rule_inbound = Rule.create({
+            'name': 'Inbound per unit',
+            'owner_id': self.test_owner.id,
+            'operation_type': 'inbound',
+            'price_type': 'per_unit',
+            'unit_price': 2.0,
+        })
+        rule_overweight = Rule.create({
+            'name': 'Overweight per KG',
+            'owner_id': self.test_owner.id,
+            'operation_type': 'overweight',
+            'price_type': 'per_kg',
+            'unit_price': 0.1,
+            'threshold': 30.0,
+        })
+        # Outbound rules do not apply to receipts
+        Rule.create({
+            'name': 'Outbound per order',
+            'owner_id': self.test_owner.id,
+            'operation_type': 'outbound',
+            'price_type': 'per_order',
+            'unit_price': 5.0,
+        })
+
+        supplier = self.env.ref('stock.stock_location_suppliers')
+        stock = self.env.ref('stock.stock_location_stock')
+        receipt = self.env['stock.picking'].create({
+            'picking_type_id': self.env.ref('stock.picking_type_in').id,
+            'location_id': supplier.id,
+            'location_dest_id': stock.id,
+            'owner_id': self.test_owner.partner_id.id,
+            'move_ids': [(0, 0, {
+                'name': product.name,
+                'product_id': product.id,
+                'product_uom_qty': 3.0,
+                'product_uom': product.uom_id.id,
+                'location_id': supplier.id,
+                'location_dest_id': stock.id,
+            })],
+        })
+        receipt.action_confirm()
+        receipt.move_ids.quantity = 3.0
+        receipt.button_validate()
+
+        records = self.env['wms.billing.record'].search([('related_picking_id', '=', receipt.id)])
+        self.assertEqual(records.billing_rule_id, rule_inbound | rule_overweight)
+        self.assertAlmostEqual(records.filtered(lambda r: r.billing_rule_id == rule_inbound).amount, 6.0)
+        self.assertAlmostEqual(records.filtered(lambda r: r.billing_rule_id == rule_overweight).quantity, 120.0)
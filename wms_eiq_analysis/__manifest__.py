@@ -20,6 +20,7 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/eiq_cron.xml',
         'views/eiq_analysis_views.xml',
     ],
     'demo': [
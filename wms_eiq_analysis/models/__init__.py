@@ -1 +1,2 @@
-from . import eiq_analysis
\ No newline at end of file
+from . import eiq_analysis
+from . import eiq_daily_partial
@@ -1,8 +1,26 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
+from odoo.tools import split_every
+from collections import Counter
 from datetime import datetime, timedelta
 import json
 
+from .eiq_engine import EiqAccumulator, QUANTITY_DIGITS, abc_ranking, histogram_stats
+
+# Number of pickings whose move lines are aggregated per query
+EIQ_CHUNK_SIZE = 5000
+
+# Largest items kept in the persisted ABC summary
+ABC_TOP_ITEMS = 20
+
+# Picking type codes analysed by each analysis type
+ANALYSIS_PICKING_CODES = {
+    'inbound': ['incoming'],
+    'outbound': ['outgoing'],
+    'internal': ['internal'],
+    'combined': ['incoming', 'outgoing', 'internal'],
+}
+
 
 class WmsEiqAnalysis(models.Model):
     """
@@ -116,13 +134,60 @@ class WmsEiqAnalysis(models.Model):
             })
 
     def _calculate_eiq_stats(self):
-        """Calculate EIQ statistics"""
+        """
+        Calculate EIQ statistics. Days covered by the EIQ daily partials are
+        assembled by merging them; only the remaining days are streamed from
+        the move lines.
+        """
         self.ensure_one()
-
-        # Get relevant data based on analysis type
-        operations = self._get_operations_for_analysis()
-
-        if not operations:
+        covered_from, covered_to = self.env['wms.eiq.daily.partial']._get_covered_range()
+        if not covered_from or self.period_start < covered_from or covered_to < self.period_start:
+            return self._compute_eiq_stats(self._accumulate_eiq())
+
+        partials_to = min(self.period_end, covered_to)
+        accumulator = self._get_daily_partials(self.period_start, partials_to)._get_accumulator()
+        if partials_to < self.period_end:
+            accumulator.merge(self._accumulate_eiq(date_from=partials_to + timedelta(days=1)))
+        return self._compute_eiq_stats(accumulator)
+
+    def _get_daily_partials(self, date_from, date_to):
+        """EIQ daily partials matching the analysis between two days (included)"""
+        domain = [
+            ('date', '>=', date_from),
+            ('date', '<=', date_to),
+            ('owner_id', '=', self.owner_id.id),
+            ('picking_type_code', 'in', ANALYSIS_PICKING_CODES[self.analysis_type]),
+        ]
+        if self.warehouse_id:
+            domain.append(('warehouse_id', '=', self.warehouse_id.id))
+        return self.env['wms.eiq.daily.partial'].search(domain)
+
+    def _accumulate_eiq(self, date_from=None, date_to=None):
+        """
+        Stream the (picking, product, quantity) tuples of the analysed
+        operations into an EIQ accumulator, EIQ_CHUNK_SIZE pickings at a time.
+        Move lines are aggregated in SQL and never loaded as records.
+        """
+        accumulator = EiqAccumulator()
+        picking_ids = self._get_operations_for_analysis(date_from=date_from, date_to=date_to).ids
+        if not picking_ids:
+            return accumulator
+
+        self.env['stock.move.line'].flush_model(['picking_id', 'product_id', 'quantity'])
+        for chunk in split_every(EIQ_CHUNK_SIZE, sorted(picking_ids)):
+            self.env.cr.execute("""
+                SELECT ml.picking_id, ml.product_id, SUM(ml.quantity)
+                FROM stock_move_line ml
+                WHERE ml.picking_id = ANY(%s)
+                GROUP BY ml.picking_id, ml.product_id
+                ORDER BY ml.picking_id
+            """, [list(chunk)])
+            accumulator.consume(self.env.cr.fetchall())
+        return accumulator
+
+    def _compute_eiq_stats(self, accumulator):
+        """Derive the EIQ indicators and summary distributions from an accumulator"""
+        if not accumulator.entries:
             return {
                 'total_orders': 0,
                 'total_items': 0,
@@ -136,244 +201,130 @@ class WmsEiqAnalysis(models.Model):
                 'detailed_stats': {}
             }
 
-        # Count orders, items, quantities
-        orders = {}
-        items = {}
-        total_qty = 0.0
-
-        for operation in operations:
-            order_id = operation.id
-            orders[order_id] = {
-                'items': set(),
-                'quantity': 0.0
-            }
-
-            # Get product lines in operation
-            if hasattr(operation, 'move_line_ids'):
-                moves = operation.move_line_ids
-            elif hasattr(operation, 'move_ids'):
-                moves = operation.move_ids
-            else:
-                continue
-
-            for move in moves:
-                product_id = move.product_id.id
-                qty = move.qty_done or move.product_uom_qty
-
-                # Count order-level information
-                orders[order_id]['items'].add(product_id)
-                orders[order_id]['quantity'] += qty
-                total_qty += qty
-
-                # Count item-level information
-                if product_id not in items:
-                    items[product_id] = {
-                        'orders': set(),
-                        'quantity': 0.0,
-                        'total_qty': 0.0
-                    }
-                items[product_id]['orders'].add(order_id)
-                items[product_id]['quantity'] += qty
-                items[product_id]['total_qty'] += qty
-
-        # Calculate statistics
-        total_orders = len(orders)
-        total_items = len(items)
-        total_quantity = total_qty
-
         # EIQ Core Indicators
-        entries = total_orders  # E - Order count
-        e_items = total_items   # I - Item count
-        e_quantity = total_quantity  # Q - Total Quantity
+        entries = accumulator.entries   # E - Order count
+        e_items = accumulator.items     # I - Item count
+        e_quantity = accumulator.quantity  # Q - Total Quantity
 
         # Calculate ratios
-        eoq = (e_items / entries) if entries > 0 else 0.0  # I/E - Average items per order
-        qoe = (e_quantity / entries) if entries > 0 else 0.0  # Q/E - Average quantity per order
+        eoq = e_items / entries  # I/E - Average items per order
+        qoe = e_quantity / entries  # Q/E - Average quantity per order
         qoi = (e_quantity / e_items) if e_items > 0 else 0.0  # Q/I - Average quantity per item
 
-        # Order Analysis
-        items_per_order = [len(order['items']) for order in orders.values()] if orders else [0]
-        max_items_per_order = max(items_per_order) if items_per_order else 0
-        min_items_per_order = min(items_per_order) if items_per_order else 0
-        avg_items_per_order = sum(items_per_order) / len(items_per_order) if items_per_order else 0.0
-
-        # Item Analysis
-        orders_per_item = [len(item['orders']) for item in items.values()] if items else [0]
-        max_orders_per_item = max(orders_per_item) if orders_per_item else 0
-        min_orders_per_item = min(orders_per_item) if orders_per_item else 0
-        avg_orders_per_item = sum(orders_per_item) / len(orders_per_item) if orders_per_item else 0.0
+        # Order Analysis (EN) and Item Analysis (IK)
+        en_histogram = accumulator.en
+        ik_histogram = accumulator.ik_histogram()
+        items_distribution = histogram_stats(en_histogram)
+        orders_distribution = histogram_stats(ik_histogram)
+        iq_histogram = Counter(round(qty, QUANTITY_DIGITS) for qty in accumulator.iq.values())
 
-        # Detailed Statistics
+        # Detailed Statistics: summary histograms only, no per-order data
         detailed_stats = {
             'orders': {
-                'count': total_orders,
-                'items_distribution': self._calculate_distribution(items_per_order),
-                'quantity_distribution': [order['quantity'] for order in orders.values()]
+                'count': entries,
+                'items_distribution': items_distribution,
+                'quantity_distribution': histogram_stats(accumulator.eq),
             },
             'items': {
-                'count': total_items,
-                'orders_distribution': self._calculate_distribution(orders_per_item),
-                'quantity_distribution': [item['total_qty'] for item in items.values()]
+                'count': e_items,
+                'orders_distribution': orders_distribution,
+                'quantity_distribution': histogram_stats(iq_histogram),
             },
-            'items_per_order_analysis': self._analyze_items_per_order(orders),
-            'orders_per_item_analysis': self._analyze_orders_per_item(items),
-            'abc_analysis': self._calculate_abc_analysis(items)
+            'items_per_order_analysis': self._analyze_items_per_order(en_histogram),
+            'orders_per_item_analysis': self._analyze_orders_per_item(ik_histogram),
+            'abc_summary': self._summarize_abc_analysis(accumulator.iq),
         }
 
         return {
-            'total_orders': total_orders,
-            'total_items': total_items,
-            'total_quantity': total_quantity,
+            'total_orders': entries,
+            'total_items': e_items,
+            'total_quantity': e_quantity,
             'entries': entries,
             'items': e_items,
             'quantity': e_quantity,
             'eoq': eoq,
             'qoe': qoe,
             'qoi': qoi,
-            'max_items_per_order': max_items_per_order,
-            'min_items_per_order': min_items_per_order,
-            'avg_items_per_order': avg_items_per_order,
-            'max_orders_per_item': max_orders_per_item,
-            'min_orders_per_item': min_orders_per_item,
-            'avg_orders_per_item': avg_orders_per_item,
+            'max_items_per_order': items_distribution['max'],
+            'min_items_per_order': items_distribution['min'],
+            'avg_items_per_order': items_distribution['avg'],
+            'max_orders_per_item': orders_distribution['max'],
+            'min_orders_per_item': orders_distribution['min'],
+            'avg_orders_per_item': orders_distribution['avg'],
             'detailed_stats': detailed_stats
         }
 
-    def _get_operations_for_analysis(self):
+    def _get_operations_for_analysis(self, date_from=None, date_to=None):
         """根据分析类型获取相关的操作数据"""
+        date_from = date_from or self.period_start
+        date_to = date_to or self.period_end
         domain = [
-            ('date', '>=', self.period_start),
-            ('date', '<=', self.period_end),
+            ('date', '>=', datetime.combine(date_from, datetime.min.time())),
+            ('date', '<', datetime.combine(date_to + timedelta(days=1), datetime.min.time())),
             ('state', '=', 'done'),  # 只分析已完成的操作
         ]
 
         if self.owner_id:
             if 'owner_id' in self.env['stock.picking']._fields:
-                domain.append(('owner_id', '=', self.owner_id.id))
+                # stock.picking.owner_id is the partner of the WMS owner
+                domain.append(('owner_id', '=', self.owner_id.partner_id.id))
 
         if self.warehouse_id:
             domain.append(('picking_type_id.warehouse_id', '=', self.warehouse_id.id))
 
-        operations = []
-
-        if self.analysis_type in ['inbound', 'combined']:
-            # 入库操作 - receipt pickings
-            inbound_domain = domain + [('picking_type_id.code', '=', 'incoming')]
-            inbound_ops = self.env['stock.picking'].search(inbound_domain)
-            operations += inbound_ops.ids
+        # 入库 / 出库 / 库内操作
+        domain.append(('picking_type_id.code', 'in', ANALYSIS_PICKING_CODES[self.analysis_type]))
 
-        if self.analysis_type in ['outbound', 'combined']:
-            # 出库操作 - delivery pickings
-            outbound_domain = domain + [('picking_type_id.code', '=', 'outgoing')]
-            outbound_ops = self.env['stock.picking'].search(outbound_domain)
-            operations += outbound_ops.ids
+        return self.env['stock.picking'].search(domain, order='id')
 
-        if self.analysis_type in ['internal', 'combined']:
-            # 库内操作 - internal transfers
-            internal_domain = domain + [('picking_type_id.code', '=', 'internal')]
-            internal_ops = self.env['stock.picking'].search(internal_domain)
-            operations += internal_ops.ids
-
-        # 去除重复ID并获取记录
-        unique_ops = list(set(operations))
-        return self.env['stock.picking'].browse(unique_ops)
-
-    def _calculate_distribution(self, values):
-        """计算数值分布"""
-        if not values:
-            return {'min': 0, 'max': 0, 'avg': 0, 'total': 0}
-
-        return {
-            'min': min(values),
-            'max': max(values),
-            'avg': sum(values) / len(values),
-            'total': sum(values),
-            'count': len(values)
-        }
-
-    def _analyze_items_per_order(self, orders):
-        """分析每订单品项数"""
-        if not orders:
-            return {}
-
-        item_counts = [len(order['items']) for order in orders.values()]
-        if not item_counts:
+    def _analyze_items_per_order(self, en_histogram):
+        """分析每订单品项数 (EN histogram: items per order -> orders)"""
+        if not en_histogram:
             return {}
 
         return {
-            'single_item_orders': len([c for c in item_counts if c == 1]),
-            'multi_item_orders': len([c for c in item_counts if c > 1]),
-            'high_complexity_orders': len([c for c in item_counts if c > 10]),  # 超过10个品项的订单
-            'distribution': self._get_frequency_distribution(item_counts)
+            'single_item_orders': en_histogram.get(1, 0),
+            'multi_item_orders': sum(n for count, n in en_histogram.items() if count > 1),
+            'high_complexity_orders': sum(n for count, n in en_histogram.items() if count > 10),  # 超过10个品项的订单
+            'distribution': dict(Counter(en_histogram).most_common(10))
         }
 
-    def _analyze_orders_per_item(self, items):
-        """分析每品项订单数"""
-        if not items:
-            return {}
-
-        order_counts = [len(item['orders']) for item in items.values()]
-        if not order_counts:
+    def _analyze_orders_per_item(self, ik_histogram):
+        """分析每品项订单数 (IK histogram: orders per item -> items)"""
+        if not ik_histogram:
             return {}
 
         return {
-            'low_frequency_items': len([c for c in order_counts if c <= 2]),  # 2个订单以内的品项
-            'high_frequency_items': len([c for c in order_counts if c > 10]),  # 10个订单以上的品项
-            'distribution': self._get_frequency_distribution(order_counts)
+            'low_frequency_items': sum(n for count, n in ik_histogram.items() if count <= 2),  # 2个订单以内的品项
+            'high_frequency_items': sum(n for count, n in ik_histogram.items() if count > 10),  # 10个订单以上的品项
+            'distribution': dict(Counter(ik_histogram).most_common(10))
         }
 
-    def _get_frequency_distribution(self, values):
-        """获取频次分布"""
-        from collections import Counter
-        counter = Counter(values)
-        return dict(counter.most_common(10))  # 返回前10个最常见的值
-
-    def _calculate_abc_analysis(self, items):
-        """基于EIQ数据计算ABC分析"""
-        if not items:
-            return []
-
-        # 按总数量排序
-        sorted_items = sorted(
-            items.items(),
-            key=lambda x: x[1]['total_qty'],
-            reverse=True
-        )
-
-        total_qty = sum(item[1]['total_qty'] for item in sorted_items)
-        if total_qty == 0:
-            return []
-
-        abc_analysis = []
-        cumulative_qty = 0
-        cumulative_percent = 0
-
-        for i, (item_id, item_data) in enumerate(sorted_items):
-            product = self.env['product.product'].browse(item_id)
-            item_qty = item_data['total_qty']
-            item_percent = (item_qty / total_qty) * 100
-            cumulative_qty += item_qty
-            cumulative_percent = (cumulative_qty / total_qty) * 100
-
-            # ABC分类
-            if cumulative_percent <= 70:
-                category = 'A'
-            elif cumulative_percent <= 90:
-                category = 'B'
-            else:
-                category = 'C'
-
-            abc_analysis.append({
-                'rank': i + 1,
-                'product_id': item_id,
-                'product_name': product.display_name,
-                'quantity': item_qty,
-                'percent': round(item_percent, 2),
-                'cumulative_percent': round(cumulative_percent, 2),
-                'category': category
-            })
-
-        return abc_analysis
+    def _format_abc_ranking(self, ranking):
+        products = self.env['product.product'].browse([entry['item'] for entry in ranking])
+        names = {product.id: product.display_name for product in products}
+        return [{
+            'rank': entry['rank'],
+            'product_id': entry['item'],
+            'product_name': names.get(entry['item'], ''),
+            'quantity': entry['quantity'],
+            'percent': entry['percent'],
+            'cumulative_percent': entry['cumulative_percent'],
+            'category': entry['category'],
+        } for entry in ranking]
+
+    def _summarize_abc_analysis(self, item_quantities):
+        """
+        ABC summary persisted with the analysis: item count and quantity per
+        class plus the ABC_TOP_ITEMS largest items, instead of the full ranking.
+        """
+        ranking = abc_ranking(item_quantities)
+        summary = {category: {'items': 0, 'quantity': 0.0} for category in ('A', 'B', 'C')}
+        for entry in ranking:
+            summary[entry['category']]['items'] += 1
+            summary[entry['category']]['quantity'] += entry['quantity']
+        summary['top_items'] = self._format_abc_ranking(ranking[:ABC_TOP_ITEMS])
+        return summary
 
     def _format_analysis_results(self, stats):
         """Format analysis results to HTML"""
@@ -482,11 +433,10 @@ class WmsEiqAnalysis(models.Model):
             recommendations.append("I/E ratio is low ({}), indicating orders contain few items, consider batch picking.".format(round(eoq, 2)))
 
         # ABC analysis recommendations
-        abc_analysis = stats.get('detailed_stats', {}).get('abc_analysis', [])
-        if abc_analysis:
-            a_items = [item for item in abc_analysis if item['category'] == 'A']
-            if len(a_items) > 0:
-                recommendations.append("A-class items ({} items) have high frequency, suggest placing them in the most convenient locations.".format(len(a_items)))
+        abc_summary = stats.get('detailed_stats', {}).get('abc_summary', {})
+        a_items = abc_summary.get('A', {}).get('items', 0)
+        if a_items > 0:
+            recommendations.append("A-class items ({} items) have high frequency, suggest placing them in the most convenient locations.".format(a_items))
 
         if not recommendations:
             recommendations.append("Current EIQ analysis shows reasonable operation mode, recommend continuous monitoring.")
@@ -0,0 +1,163 @@
+from odoo import models, fields, api
+from datetime import datetime, timedelta
+from itertools import groupby
+import json
+import logging
+
+from .eiq_engine import EiqAccumulator
+
+_logger = logging.getLogger(__name__)
+
+# Days computed by the first run of the cron
+EIQ_PARTIAL_BACKFILL_DAYS = 365
+
+# ir.config_parameter keys tracking which days the partials cover
+PARAM_DATE_FROM = 'wms_eiq_analysis.partials_date_from'
+PARAM_LAST_RUN = 'wms_eiq_analysis.partials_last_run'
+
+PICKING_CODES = ('incoming', 'outgoing', 'internal')
+
+
+class WmsEiqDailyPartial(models.Model):
+    """
+    EIQ Daily Partial - EIQ aggregate of one day of done operations for one
+    owner, warehouse and operation type.
+
+    Filled incrementally by a cron; period analyses merge the partials of
+    their days instead of rescanning the move lines.
+    """
+    _name = 'wms.eiq.daily.partial'
+    _description = 'WMS EIQ Daily Partial'
+    _order = 'date desc, owner_id, warehouse_id'
+
+    date = fields.Date('Date', required=True, index=True)
+    owner_id = fields.Many2one('wms.owner', 'Owner', required=True, index=True, ondelete='cascade')
+    warehouse_id = fields.Many2one('stock.warehouse', 'Warehouse', ondelete='cascade')
+    picking_type_code = fields.Selection([
+        ('incoming', 'Receipt'),
+        ('outgoing', 'Delivery'),
+        ('internal', 'Internal Transfer'),
+    ], string='Operation Type', required=True)
+
+    entries = fields.Integer('Orders (E)', readonly=True)
+    items = fields.Integer('Items (I)', readonly=True)
+    quantity = fields.Float('Quantity (Q)', readonly=True)
+    payload = fields.Text('EIQ Aggregate', readonly=True, help='Serialized EIQ accumulator in JSON format')
+
+    _sql_constraints = [
+        ('partial_unique', 'unique(date, owner_id, warehouse_id, picking_type_code)',
+         'There can be only one EIQ partial per day, owner, warehouse and operation type.'),
+    ]
+
+    def _get_accumulator(self):
+        """Merge the partials of the recordset into one accumulator"""
+        accumulator = EiqAccumulator()
+        for partial in self:
+            accumulator.merge(EiqAccumulator.from_dict(json.loads(partial.payload or '{}')))
+        return accumulator
+
+    @api.model
+    def _get_covered_range(self):
+        """
+        First and last day whose partials are complete, or (None, None). The
+        day of the last run is still open and is never considered covered.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        date_from = params.get_param(PARAM_DATE_FROM)
+        last_run = params.get_param(PARAM_LAST_RUN)
+        if not date_from or not last_run:
+            return None, None
+        return fields.Date.to_date(date_from), fields.Datetime.to_datetime(last_run).date() - timedelta(days=1)
+
+    @api.model
+    def _get_days_to_refresh(self, now):
+        """
+        Days to (re)compute: every day since the last run, plus the days of
+        operations validated since then (backdated or late pickings).
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        last_run = params.get_param(PARAM_LAST_RUN)
+        if not last_run:
+            start = now.date() - timedelta(days=EIQ_PARTIAL_BACKFILL_DAYS)
+            params.set_param(PARAM_DATE_FROM, fields.Date.to_string(start))
+            days = {start + timedelta(days=n) for n in range((now.date() - start).days + 1)}
+            return sorted(days)
+
+        last_run = fields.Datetime.to_datetime(last_run)
+        days = {last_run.date() + timedelta(days=n) for n in range((now.date() - last_run.date()).days + 1)}
+        self.env['stock.picking'].flush_model(['date', 'date_done', 'state'])
+        self.env.cr.execute("""
+            SELECT DISTINCT p.date::date
+            FROM stock_picking p
+            WHERE p.state = 'done' AND p.date_done >= %s
+        """, [last_run])
+        date_from = fields.Date.to_date(params.get_param(PARAM_DATE_FROM))
+        days.update(day for day, in self.env.cr.fetchall() if day and day >= date_from)
+        return sorted(days)
+
+    @api.model
+    def _compute_day(self, day):
+        """
+        Rebuild the partials of ``day`` with one grouped query over its done
+        operations. Returns the number of partials created.
+        """
+        for model, names in (
+            ('stock.move.line', ['picking_id', 'product_id', 'quantity']),
+            ('stock.picking', ['date', 'state', 'owner_id', 'picking_type_id']),
+        ):
+            self.env[model].flush_model(names)
+        start = datetime.combine(day, datetime.min.time())
+        self.env.cr.execute("""
+            SELECT p.owner_id, pt.warehouse_id, pt.code, ml.picking_id, ml.product_id, SUM(ml.quantity)
+            FROM stock_move_line ml
+            JOIN stock_picking p ON p.id = ml.picking_id
+            JOIN stock_picking_type pt ON pt.id = p.picking_type_id
+            WHERE p.state = 'done'
+              AND p.owner_id IS NOT NULL
+              AND pt.code IN %s
+              AND p.date >= %s AND p.date < %s
+            GROUP BY p.owner_id, pt.warehouse_id, pt.code, ml.picking_id, ml.product_id
+            ORDER BY p.owner_id, pt.warehouse_id, pt.code, ml.picking_id
+        """, [PICKING_CODES, start, start + timedelta(days=1)])
+        rows = self.env.cr.fetchall()
+
+        self.search([('date', '=', day)]).unlink()
+        if not rows:
+            return 0
+
+        partner_ids = list({row[0] for row in rows})
+        owners = {
+            owner['partner_id'][0]: owner['id']
+            for owner in self.env['wms.owner'].search_read([('partner_id', 'in', partner_ids)], ['partner_id'])
+        }
+
+        vals_list = []
+        for (partner_id, warehouse_id, code), group in groupby(rows, key=lambda row: row[:3]):
+            if partner_id not in owners:
+                continue
+            accumulator = EiqAccumulator().consume(row[3:] for row in group)
+            vals_list.append({
+                'date': day,
+                'owner_id': owners[partner_id],
+                'warehouse_id': warehouse_id,
+                'picking_type_code': code,
+                'entries': accumulator.entries,
+                'items': accumulator.items,
+                'quantity': accumulator.quantity,
+                'payload': json.dumps(accumulator.to_dict()),
+            })
+        self.create(vals_list)
+        return len(vals_list)
+
+    @api.model
+    def _cron_update_partials(self):
+        """Incrementally refresh the EIQ daily partials"""
+        now = fields.Datetime.now()
+        days = self._get_days_to_refresh(now)
+        created = 0
+        for day in days:
+            created += self._compute_day(day)
+        self.env['ir.config_parameter'].sudo().set_param(PARAM_LAST_RUN, fields.Datetime.to_string(now))
+        _logger.info("EIQ partials refreshed for %s day(s), %s partial(s) created", len(days), created)
+        return True
+
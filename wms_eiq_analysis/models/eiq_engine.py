@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+# Percentiles reported for every distribution
+PERCENTILES = (50, 80, 90, 95)
+
+# Cumulative quantity share (%) closing the A and B classes of the EIQ ABC
+# analysis
+ABC_A_LIMIT = 70
+ABC_B_LIMIT = 90
+
+# Precision used to bucket order quantities in the EQ histogram
+QUANTITY_DIGITS = 2
+
+
+def histogram_stats(histogram):
+    """
+    Distribution summary of a histogram ``{value: occurrences}``: min, max,
+    avg, total, count and the percentiles listed in ``PERCENTILES``.
+
+    Works on the distinct values only, so the cost does not depend on the
+    number of observations.
+    """
+    count = sum(histogram.values())
+    if not count:
+        return {'min': 0, 'max': 0, 'avg': 0, 'total': 0, 'count': 0, 'percentiles': {}}
+
+    values = sorted(histogram)
+    total = sum(value * occurrences for value, occurrences in histogram.items())
+    percentiles = {}
+    targets = [(p, count * p / 100.0) for p in PERCENTILES]
+    cumulative = 0
+    position = 0
+    for value in values:
+        cumulative += histogram[value]
+        while position < len(targets) and cumulative >= targets[position][1]:
+            percentiles['p%d' % targets[position][0]] = value
+            position += 1
+    return {
+        'min': values[0],
+        'max': values[-1],
+        'avg': total / count,
+        'total': total,
+        'count': count,
+        'percentiles': percentiles,
+    }
+
+
+def abc_ranking(item_quantities, a_limit=ABC_A_LIMIT, b_limit=ABC_B_LIMIT):
+    """
+    Rank items by quantity and classify them on the cumulative quantity share.
+
+    ``item_quantities`` maps an item to its quantity. Returns a list of dicts
+    (rank, item, quantity, percent, cumulative_percent, category), largest
+    item first, or an empty list when there is no quantity.
+    """
+    total = sum(item_quantities.values())
+    if not total:
+        return []
+
+    ranking = []
+    cumulative = 0.0
+    ordered = sorted(item_quantities.items(), key=lambda item: item[1], reverse=True)
+    for rank, (item, quantity) in enumerate(ordered, start=1):
+        cumulative += quantity
+        cumulative_percent = cumulative / total * 100
+        if cumulative_percent <= a_limit:
+            category = 'A'
+        elif cumulative_percent <= b_limit:
+            category = 'B'
+        else:
+            category = 'C'
+        ranking.append({
+            'rank': rank,
+            'item': item,
+            'quantity': quantity,
+            'percent': round(quantity / total * 100, 2),
+            'cumulative_percent': round(cumulative_percent, 2),
+            'category': category,
+        })
+    return ranking
+
+
+class EiqAccumulator(object):
+    """
+    Streaming EIQ aggregate.
+
+    Orders are folded in one at a time and only the sparse order x item
+    incidence needed by the EIQ indicators is kept:
+
+        en   histogram of the number of items per order (EN)
+        eq   histogram of the quantity per order (EQ)
+        ik   number of orders per item (IK), keyed by item
+        iq   quantity per item (IQ), keyed by item
+
+    The memory used grows with the number of distinct items and histogram
+    buckets, not with the number of orders or lines. Two accumulators over
+    disjoint sets of orders can be combined with ``merge``.
+    """
+
+    def __init__(self):
+        self.entries = 0
+        self.quantity = 0.0
+        self.en = Counter()
+        self.eq = Counter()
+        self.ik = Counter()
+        self.iq = Counter()
+
+    def add_order(self, lines):
+        """Fold one order given as an iterable of ``(item, quantity)``"""
+        order_items = Counter()
+        for item, quantity in lines:
+            order_items[item] += quantity or 0.0
+        if not order_items:
+            return
+        order_quantity = sum(order_items.values())
+        self.entries += 1
+        self.quantity += order_quantity
+        self.en[len(order_items)] += 1
+        self.eq[round(order_quantity, QUANTITY_DIGITS)] += 1
+        for item, quantity in order_items.items():
+            self.ik[item] += 1
+            self.iq[item] += quantity
+
+    def consume(self, rows):
+        """
+        Fold ``(order, item, quantity)`` rows. Rows of an order must be
+        contiguous (e.g. fetched ordered by order), each order is folded as
+        soon as the next one starts.
+        """
+        current = None
+        lines = []
+        for order, item, quantity in rows:
+            if order != current:
+                if lines:
+                    self.add_order(lines)
+                current = order
+                lines = []
+            lines.append((item, quantity))
+        if lines:
+            self.add_order(lines)
+        return self
+
+    def merge(self, other):
+        """Add the orders aggregated by ``other`` (disjoint orders)"""
+        self.entries += other.entries
+        self.quantity += other.quantity
+        self.en.update(other.en)
+        self.eq.update(other.eq)
+        self.ik.update(other.ik)
+        self.iq.update(other.iq)
+        return self
+
+    @property
+    def items(self):
+        return len(self.ik)
+
+    def ik_histogram(self):
+        """Histogram of the number of orders per item"""
+        return Counter(self.ik.values())
+
+    def to_dict(self):
+        """JSON serializable representation (histogram keys become strings)"""
+        return {
+            'entries': self.entries,
+            'quantity': self.quantity,
+            'en': {str(key): value for key, value in self.en.items()},
+            'eq': {str(key): value for key, value in self.eq.items()},
+            'ik': {str(key): value for key, value in self.ik.items()},
+            'iq': {str(key): value for key, value in self.iq.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        accumulator = cls()
+        accumulator.entries = data.get('entries', 0)
+        accumulator.quantity = data.get('quantity', 0.0)
+        accumulator.en = Counter({int(key): value for key, value in data.get('en', {}).items()})
+        accumulator.eq = Counter({float(key): value for key, value in data.get('eq', {}).items()})
+        accumulator.ik = Counter({int(key): value for key, value in data.get('ik', {}).items()})
+        accumulator.iq = Counter({int(key): value for key, value in data.get('iq', {}).items()})
+        return accumulator
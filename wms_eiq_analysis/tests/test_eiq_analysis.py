@@ -1,6 +1,10 @@
 from odoo.tests import TransactionCase, tagged
 from odoo.exceptions import ValidationError
 from datetime import datetime, timedelta
+import json
+from collections import Counter
+
+from odoo.addons.wms_eiq_analysis.models.eiq_engine import EiqAccumulator, abc_ranking, histogram_stats
 
 
 @tagged('wms_eiq_analysis', 'at_install')
@@ -154,29 +158,19 @@ class TestWmsEiqAnalysis(TransactionCase):
             'analysis_type': 'combined',
         })
 
-        # Test the private methods
-        # Test _calculate_distribution method
-        values = [1, 2, 3, 4, 5]
-        distribution = analysis._calculate_distribution(values)
+        # Test the distribution summary of a histogram
+        distribution = histogram_stats(Counter([1, 2, 3, 4, 5]))
         self.assertEqual(distribution['min'], 1)
         self.assertEqual(distribution['max'], 5)
         self.assertEqual(distribution['avg'], 3.0)
         self.assertEqual(distribution['total'], 15)
         self.assertEqual(distribution['count'], 5)
 
-        # Test _get_frequency_distribution method
-        freq_dist = analysis._get_frequency_distribution([1, 1, 2, 3, 3, 3])
-        self.assertEqual(freq_dist[1], 2)  # Value 1 appears 2 times
-        self.assertEqual(freq_dist[3], 3)  # Value 3 appears 3 times
-
-        # Test _calculate_abc_analysis method with sample items
-        sample_items = {
-            1: {'total_qty': 100, 'orders': {1, 2}},
-            2: {'total_qty': 50, 'orders': {1, 3}},
-            3: {'total_qty': 30, 'orders': {2, 3, 4}},
-        }
-        abc_result = analysis._calculate_abc_analysis(sample_items)
+        # Test the ABC ranking with sample item quantities
+        abc_result = abc_ranking({1: 100, 2: 50, 3: 30})
         self.assertIsInstance(abc_result, list)
+        self.assertEqual([entry['item'] for entry in abc_result], [1, 2, 3])
+        self.assertEqual(analysis._format_abc_ranking(abc_result)[0]['product_id'], 1)
 
     def test_eiq_analysis_generation(self):
         """Test EIQ analysis generation"""
@@ -291,16 +285,9 @@ class TestWmsEiqAnalysis(TransactionCase):
         })
 
         # Create sample items with different quantities
-        sample_items = {
-            1: {'total_qty': 500, 'orders': {1, 2, 3, 4}},
-            2: {'total_qty': 300, 'orders': {1, 2}},
-            3: {'total_qty': 100, 'orders': {3, 5}},
-            4: {'total_qty': 50, 'orders': {1}},
-            5: {'total_qty': 30, 'orders': {2, 4}},
-            6: {'total_qty': 20, 'orders': {1, 3, 5}},
-        }
+        item_quantities = {1: 500, 2: 300, 3: 100, 4: 50, 5: 30, 6: 20}
 
-        abc_result = analysis._calculate_abc_analysis(sample_items)
+        abc_result = analysis._format_abc_ranking(abc_ranking(item_quantities))
 
         # Check that ABC analysis returns list of items
         self.assertIsInstance(abc_result, list)
@@ -308,4 +295,83 @@ class TestWmsEiqAnalysis(TransactionCase):
             # First item should be A category (highest quantity)
             first_item = abc_result[0]
             self.assertIn('category', first_item)
-            self.assertIn(first_item['category'], ['A', 'B', 'C'])
\ No newline at end of file
+            self.assertIn(first_item['category'], ['A', 'B', 'C'])
+
+    def test_eiq_accumulator_streaming(self):
+        """Test the streaming EIQ accumulator and summary statistics"""
+        rows = [
+            (1, 10, 2.0), (1, 11, 3.0),
+            (2, 10, 1.0),
+            (3, 10, 4.0), (3, 11, 1.0), (3, 12, 5.0),
+        ]
+        accumulator = EiqAccumulator().consume(rows)
+        self.assertEqual(accumulator.entries, 3)
+        self.assertEqual(accumulator.items, 3)
+        self.assertAlmostEqual(accumulator.quantity, 16.0)
+        self.assertEqual(dict(accumulator.en), {1: 1, 2: 1, 3: 1})
+        self.assertEqual(accumulator.ik[10], 3)
+        self.assertAlmostEqual(accumulator.iq[10], 7.0)
+
+        # Merging split streams gives the same aggregate
+        merged = EiqAccumulator().consume(rows[:3]).merge(
+            EiqAccumulator.from_dict(EiqAccumulator().consume(rows[3:]).to_dict()))
+        self.assertEqual(merged.to_dict(), accumulator.to_dict())
+
+        distribution = histogram_stats(accumulator.en)
+        self.assertEqual(distribution['min'], 1)
+        self.assertEqual(distribution['max'], 3)
+        self.assertEqual(distribution['avg'], 2.0)
+        self.assertEqual(distribution['percentiles']['p50'], 2)
+
+        analysis = self.WmsEiqAnalysis.create({
+            'name': 'Test EIQ Accumulator',
+            'period_start': datetime.now() - timedelta(days=7),
+            'period_end': datetime.now(),
+            'owner_id': self.owner.id,
+            'analysis_type': 'outbound',
+        })
+        stats = analysis._compute_eiq_stats(accumulator)
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['max_items_per_order'], 3)
+        self.assertEqual(stats['max_orders_per_item'], 3)
+        self.assertEqual(stats['detailed_stats']['items_per_order_analysis']['single_item_orders'], 1)
+        self.assertNotIn('orders', stats['detailed_stats']['orders']['quantity_distribution'])
+
+    def test_eiq_analysis_from_daily_partials(self):
+        """Test that covered days are assembled from the EIQ daily partials"""
+        today = datetime.now().date()
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('wms_eiq_analysis.partials_date_from', str(today - timedelta(days=30)))
+        params.set_param('wms_eiq_analysis.partials_last_run', '%s 00:00:00' % today)
+
+        day_1 = EiqAccumulator().consume([(1, self.product1.id, 2.0), (1, self.product2.id, 1.0)])
+        day_2 = EiqAccumulator().consume([(2, self.product1.id, 5.0)])
+        for days_ago, accumulator in ((3, day_1), (2, day_2)):
+            self.env['wms.eiq.daily.partial'].create({
+                'date': today - timedelta(days=days_ago),
+                'owner_id': self.owner.id,
+                'warehouse_id': self.warehouse.id,
+                'picking_type_code': 'outgoing',
+                'entries': accumulator.entries,
+                'items': accumulator.items,
+                'quantity': accumulator.quantity,
+                'payload': json.dumps(accumulator.to_dict()),
+            })
+
+        analysis = self.WmsEiqAnalysis.create({
+            'name': 'Test EIQ Partials',
+            'period_start': today - timedelta(days=7),
+            'period_end': today - timedelta(days=1),
+            'owner_id': self.owner.id,
+            'warehouse_id': self.warehouse.id,
+            'analysis_type': 'outbound',
+        })
+        stats = analysis._calculate_eiq_stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['items'], 2)
+        self.assertAlmostEqual(stats['quantity'], 8.0)
+        self.assertEqual(stats['max_orders_per_item'], 2)
+
+        # Inbound analyses do not use outbound partials
+        analysis.analysis_type = 'inbound'
+        self.assertEqual(analysis._calculate_eiq_stats()['entries'], 0)
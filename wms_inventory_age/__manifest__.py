@@ -10,6 +10,7 @@
     'depends': ['base', 'stock', 'wms_owner'],
     'data': [
         'security/ir.model.access.csv',
+        'data/inventory_age_cron.xml',
         'views/wms_inventory_age_views.xml',
         'views/stock_quant_views.xml',
         'views/menu_views.xml',
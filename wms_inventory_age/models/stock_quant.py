@@ -1,6 +1,11 @@
 from odoo import models, fields, api
 from dateutil.relativedelta import relativedelta
 import datetime
+import logging
+
+from .wms_inventory_age import AGING_PERIOD_LIMITS, aging_period_sql
+
+_logger = logging.getLogger(__name__)
 
 
 class StockQuant(models.Model):
@@ -36,34 +41,107 @@ class StockQuant(models.Model):
     def _compute_aging_period(self):
         """Compute the aging period based on age in days"""
         for quant in self:
-            if quant.age_days <= 30:
-                quant.aging_period = 'current'
-            elif quant.age_days <= 60:
-                quant.aging_period = '30_60'
-            elif quant.age_days <= 90:
-                quant.aging_period = '60_90'
-            elif quant.age_days <= 180:
-                quant.aging_period = '90_180'
-            elif quant.age_days <= 365:
-                quant.aging_period = '180_365'
-            else:
-                quant.aging_period = 'over_365'
+            quant.aging_period = next(
+                (period for period, max_days in AGING_PERIOD_LIMITS if quant.age_days <= max_days), 'over_365'
+            )
 
     @api.depends('age_days')
     def _compute_is_aged_inventory(self):
         """Determine if inventory is aged based on configuration"""
+        # Age configuration of every owner, loaded once for the whole batch
+        thresholds = self.env['wms.inventory.age.config']._get_thresholds()
         for quant in self:
-            # Get the age configuration for the owner or default
-            if hasattr(quant, 'owner_id') and quant.owner_id:
-                config = self.env['wms.inventory.age.config'].search([('owner_id', '=', quant.owner_id.id)], limit=1)
-            else:
-                config = self.env['wms.inventory.age.config'].search([], limit=1)
+            warning_days = thresholds.get(quant.owner_id.id, thresholds[False])[0]
+            quant.is_aged_inventory = quant.age_days > warning_days
 
-            if config:
-                quant.is_aged_inventory = quant.age_days > config.warning_age_days
-            else:
-                # Default: inventory older than 180 days is considered aged
-                quant.is_aged_inventory = quant.age_days > 180
+    @api.model
+    def _cron_refresh_inventory_age(self):
+        """
+        Daily refresh of the stored age fields of all quants, which their
+        dependencies do not trigger as time passes, and creation of the
+        alerts of the stock that crossed its owner's thresholds since the
+        last run. Everything is done with a few set-based queries.
+        """
+        thresholds = self.env['wms.inventory.age.config']._get_thresholds()
+        partner_ids = [partner_id for partner_id in thresholds if partner_id]
+        warning_days, critical_days, auto_alerts = zip(*(thresholds[partner_id] for partner_id in partner_ids)) \
+            if partner_ids else ((), (), ())
+        default_warning, default_critical, default_auto = thresholds[False]
+
+        self.flush_model(['owner_id', 'in_date', 'create_date', 'quantity', 'location_id',
+                          'age_days', 'aging_period', 'is_aged_inventory'])
+        self.env['stock.location'].flush_model(['usage'])
+        today = fields.Date.context_today(self)
+        cte = """
+            WITH thresholds AS (
+                SELECT * FROM unnest(%s::int[], %s::int[], %s::int[], %s::bool[])
+                    AS t(partner_id, warning_days, critical_days, auto_alert)
+            ), aged AS (
+                SELECT q.id, q.age_days AS old_age,
+                       GREATEST(%s::date - COALESCE(q.in_date, q.create_date)::date, 0) AS age_days,
+                       COALESCE(t.warning_days, %s) AS warning_days,
+                       COALESCE(t.critical_days, %s) AS critical_days,
+                       COALESCE(t.auto_alert, %s) AS auto_alert
+                FROM stock_quant q
+                LEFT JOIN thresholds t ON t.partner_id = q.owner_id
+            )
+        """
+        params = [list(partner_ids), list(warning_days), list(critical_days), list(auto_alerts),
+                  today, default_warning, default_critical, default_auto]
+
+        # Stock crossing a threshold since the last refresh, read before the
+        # stored age is updated
+        self.env.cr.execute(cte + """
+            SELECT a.id,
+                   CASE WHEN a.age_days > a.critical_days THEN 'critical' ELSE 'warning' END
+            FROM aged a
+            JOIN stock_quant q ON q.id = a.id
+            JOIN stock_location l ON l.id = q.location_id
+            WHERE a.auto_alert
+              AND q.quantity > 0
+              AND l.usage = 'internal'
+              AND ((a.age_days > a.warning_days AND COALESCE(a.old_age, 0) <= a.warning_days)
+                OR (a.age_days > a.critical_days AND COALESCE(a.old_age, 0) <= a.critical_days))
+        """, params)
+        crossings = dict(self.env.cr.fetchall())
+
+        self.env.cr.execute(cte + """
+            UPDATE stock_quant q
+            SET age_days = a.age_days,
+                aging_period = {aging_period},
+                is_aged_inventory = a.age_days > a.warning_days
+            FROM aged a
+            WHERE a.id = q.id
+              AND (q.age_days IS DISTINCT FROM a.age_days
+                OR q.is_aged_inventory IS DISTINCT FROM (a.age_days > a.warning_days))
+        """.format(aging_period=aging_period_sql('a.age_days')), params)
+        updated = self.env.cr.rowcount
+        self.invalidate_model(['age_days', 'aging_period', 'is_aged_inventory'])
+
+        alerts = self._create_age_alerts(crossings)
+        _logger.info("Inventory age refreshed: %s quant(s) updated, %s alert(s) created", updated, len(alerts))
+        return True
+
+    @api.model
+    def _create_age_alerts(self, crossings):
+        """Create in one batch the alerts ``{quant id: alert type}``"""
+        if not crossings:
+            return self.env['wms.inventory.age.alert']
+        quants = self.browse(list(crossings))
+        owners = {
+            owner['partner_id'][0]: owner['id']
+            for owner in self.env['wms.owner'].search_read(
+                [('partner_id', 'in', quants.owner_id.ids)], ['partner_id'])
+        }
+        return self.env['wms.inventory.age.alert'].create([{
+            'product_id': quant.product_id.id,
+            'location_id': quant.location_id.id,
+            'lot_id': quant.lot_id.id,
+            'owner_id': owners.get(quant.owner_id.id, False),
+            'quantity': quant.quantity,
+            'age_days': quant.age_days,
+            'alert_type': crossings[quant.id],
+        } for quant in quants])
 
     def action_view_inventory_age_report(self):
         """Action to view inventory age for this quant"""
@@ -3,6 +3,27 @@ from odoo.tools import float_compare
 from dateutil.relativedelta import relativedelta
 import datetime
 
+# Upper bound (days, inclusive) of each aging period; older stock is 'over_365'
+AGING_PERIOD_LIMITS = [
+    ('current', 30),
+    ('30_60', 60),
+    ('60_90', 90),
+    ('90_180', 180),
+    ('180_365', 365),
+]
+
+# Thresholds applied to owners without configuration
+DEFAULT_WARNING_AGE_DAYS = 180
+DEFAULT_CRITICAL_AGE_DAYS = 365
+
+
+def aging_period_sql(age_column):
+    """SQL CASE expression giving the aging period of ``age_column`` (days)"""
+    cases = ' '.join(
+        "WHEN %s <= %d THEN '%s'" % (age_column, max_days, period) for period, max_days in AGING_PERIOD_LIMITS
+    )
+    return "CASE %s ELSE 'over_365' END" % cases
+
 
 class WmsInventoryAgeReport(models.TransientModel):
     _name = 'wms.inventory.age.report'
@@ -21,6 +42,9 @@ class WmsInventoryAgeReport(models.TransientModel):
         ('180_365', '180-365 Days'),
         ('over_365', 'Over 365 Days'),
     ], 'Aging Period', help='Filter by specific aging period')
+    summary_only = fields.Boolean('Summary Only', default=False,
+                                  help='Aggregate the stock per owner, product and aging period, '
+                                       'without location and lot details')
     report_lines = fields.One2many('wms.inventory.age.report.line', 'report_id', 'Report Lines', readonly=True)
 
     def action_generate_report(self):
@@ -29,40 +53,9 @@ class WmsInventoryAgeReport(models.TransientModel):
         # Unlink any existing report lines
         self.report_lines.unlink()
 
-        # Build domain for quants
-        domain = [('quantity', '>', 0)]
-        if self.owner_id:
-            domain.append(('owner_id', '=', self.owner_id.id))
-        if self.location_id:
-            domain.append(('location_id', '=', self.location_id.id))
-        if self.product_category_id:
-            domain.append(('product_id.categ_id', '=', self.product_category_id.id))
-
-        quants = self.env['stock.quant'].search(domain)
-
-        for quant in quants:
-            # Calculate the age of the inventory
-            age_days = self._calculate_inventory_age(quant)
-
-            # Determine aging period
-            aging_period = self._get_aging_period(age_days)
-
-            # Only include if aging period matches filter or no filter set
-            if not self.aging_periods or self.aging_periods == aging_period:
-                self.env['wms.inventory.age.report.line'].create({
-                    'report_id': self.id,
-                    'product_id': quant.product_id.id,
-                    'location_id': quant.location_id.id,
-                    'lot_id': quant.lot_id.id,
-                    'quantity': quant.quantity,
-                    'uom_id': quant.product_id.uom_id.id,
-                    'unit_cost': quant.product_id.standard_price,
-                    'total_value': quant.quantity * quant.product_id.standard_price,
-                    'age_days': age_days,
-                    'aging_period': aging_period,
-                    'owner_id': quant.owner_id.id if quant.owner_id else False,
-                    'expiry_date': quant.lot_id.expiry_date if quant.lot_id else False,
-                })
+        rows = self._get_aged_stock()
+        if rows:
+            self.env['wms.inventory.age.report.line'].create(self._prepare_report_lines(rows))
 
         # Return action to display the report
         return {
@@ -74,12 +67,102 @@ class WmsInventoryAgeReport(models.TransientModel):
             'context': {'default_id': self.id},
         }
 
+    def _get_aged_stock(self):
+        """
+        Positive stock matching the report filters, aggregated by owner
+        (partner), product, location, lot and aging period in one query.
+        Location and lot are not grouped in summary mode.
+
+        Returns tuples (partner id, product id, location id, lot id,
+        aging period, quantity, age of the oldest stock in days).
+        """
+        self.ensure_one()
+        self.env['stock.quant'].flush_model(['owner_id', 'product_id', 'location_id', 'lot_id',
+                                             'quantity', 'in_date', 'create_date'])
+        self.env['product.product'].flush_model(['product_tmpl_id'])
+        self.env['product.template'].flush_model(['categ_id'])
+
+        conditions = ['q.quantity > 0']
+        params = [self.date_as_of]
+        if self.owner_id:
+            conditions.append('q.owner_id = %s')
+            params.append(self.owner_id.partner_id.id)
+        if self.location_id:
+            conditions.append('q.location_id = %s')
+            params.append(self.location_id.id)
+        if self.product_category_id:
+            conditions.append('pt.categ_id = %s')
+            params.append(self.product_category_id.id)
+
+        detail = '' if self.summary_only else ', location_id, lot_id'
+        query = """
+            WITH aged AS (
+                SELECT q.owner_id, q.product_id, q.location_id, q.lot_id, q.quantity,
+                       GREATEST(%s::date - COALESCE(q.in_date, q.create_date)::date, 0) AS age_days
+                FROM stock_quant q
+                JOIN product_product pp ON pp.id = q.product_id
+                JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                WHERE {conditions}
+            ), bucketed AS (
+                SELECT aged.*, {aging_period} AS aging_period
+                FROM aged
+            )
+            SELECT owner_id, product_id, {location}, {lot}, aging_period, SUM(quantity), MAX(age_days)
+            FROM bucketed
+            {period_filter}
+            GROUP BY owner_id, product_id{detail}, aging_period
+        """.format(
+            conditions=' AND '.join(conditions),
+            aging_period=aging_period_sql('age_days'),
+            location='NULL::int' if self.summary_only else 'location_id',
+            lot='NULL::int' if self.summary_only else 'lot_id',
+            period_filter='WHERE aging_period = %s' if self.aging_periods else '',
+            detail=detail,
+        )
+        if self.aging_periods:
+            params.append(self.aging_periods)
+        self.env.cr.execute(query, params)
+        return self.env.cr.fetchall()
+
+    def _prepare_report_lines(self, rows):
+        """Report line values of the aggregated stock ``rows``"""
+        self.ensure_one()
+        partner_ids = list({row[0] for row in rows if row[0]})
+        owners = {
+            owner['partner_id'][0]: owner['id']
+            for owner in self.env['wms.owner'].search_read([('partner_id', 'in', partner_ids)], ['partner_id'])
+        }
+        # Browsing the whole set prefetches cost, UoM and expiry in a few queries
+        products = self.env['product.product'].browse({row[1] for row in rows})
+        lots = self.env['stock.lot'].browse({row[3] for row in rows if row[3]})
+        has_expiry = 'expiry_date' in lots._fields
+        costs = {product.id: (product.standard_price, product.uom_id.id) for product in products}
+        expiry_dates = {lot.id: lot.expiry_date for lot in lots} if has_expiry else {}
+
+        vals_list = []
+        for partner_id, product_id, location_id, lot_id, aging_period, quantity, age_days in rows:
+            unit_cost, uom_id = costs[product_id]
+            vals_list.append({
+                'report_id': self.id,
+                'product_id': product_id,
+                'location_id': location_id,
+                'lot_id': lot_id,
+                'quantity': quantity,
+                'uom_id': uom_id,
+                'unit_cost': unit_cost,
+                'age_days': age_days,
+                'aging_period': aging_period,
+                'owner_id': owners.get(partner_id, False),
+                'expiry_date': expiry_dates.get(lot_id, False),
+            })
+        return vals_list
+
     def _calculate_inventory_age(self, quant):
         """Calculate the age of inventory in days"""
-        # For this example, we'll use the creation date of the quant
-        # In a real implementation, this would track when inventory was received
-        if quant.create_date.date() <= self.date_as_of:
-            age = self.date_as_of - quant.create_date.date()
+        # Stock is aged from its incoming date, like the report query
+        inventory_date = (quant.in_date or quant.create_date).date()
+        if inventory_date <= self.date_as_of:
+            age = self.date_as_of - inventory_date
             return age.days
         else:
             # Quant was created after the report date, shouldn't happen normally
@@ -87,18 +170,10 @@ class WmsInventoryAgeReport(models.TransientModel):
 
     def _get_aging_period(self, age_days):
         """Determine the aging period based on age in days"""
-        if age_days <= 30:
-            return 'current'
-        elif age_days <= 60:
-            return '30_60'
-        elif age_days <= 90:
-            return '60_90'
-        elif age_days <= 180:
-            return '90_180'
-        elif age_days <= 365:
-            return '180_365'
-        else:
-            return 'over_365'
+        for period, max_days in AGING_PERIOD_LIMITS:
+            if age_days <= max_days:
+                return period
+        return 'over_365'
 
 
 class WmsInventoryAgeReportLine(models.TransientModel):
@@ -156,11 +231,12 @@ class WmsInventoryAgeAlert(models.Model):
     ], 'Status', default='open', required=True)
     notes = fields.Text('Notes')
 
-    @api.model
-    def create(self, vals):
-        if not vals.get('name'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('wms.inventory.age.alert') or '/'
-        return super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if not vals.get('name'):
+                vals['name'] = self.env['ir.sequence'].next_by_code('wms.inventory.age.alert') or '/'
+        return super().create(vals_list)
 
     def action_acknowledge(self):
         """Acknowledge the alert"""
@@ -191,4 +267,18 @@ class WmsInventoryAgeConfig(models.Model):
 
     _sql_constraints = [
         ('owner_unique', 'UNIQUE(owner_id)', 'Only one configuration per owner is allowed.'),
-    ]
\ No newline at end of file
+    ]
+
+    @api.model
+    def _get_thresholds(self):
+        """
+        Age thresholds per owner, loaded once:
+        ``{partner id: (warning days, critical days, auto create alerts)}``.
+        The key False holds the thresholds of owners without configuration.
+        """
+        thresholds = {False: (DEFAULT_WARNING_AGE_DAYS, DEFAULT_CRITICAL_AGE_DAYS, True)}
+        for config in self.sudo().search([]):
+            thresholds[config.owner_id.partner_id.id or False] = (
+                config.warning_age_days, config.critical_age_days, config.auto_create_alerts,
+            )
+        return thresholds
@@ -257,4 +257,90 @@ class TestWmsInventoryAge(TransactionCase):
                 'owner_id': self.test_owner.id,  # Same owner as config1
                 'warning_age_days': 150,
                 'critical_age_days': 300,
-            })
\ No newline at end of file
+            })
+
+    def test_age_report_aggregates_buckets(self):
+        """Test that report lines aggregate the stock per aging period"""
+        other_location = self.env['stock.location'].create({
+            'name': 'Other Location',
+            'usage': 'internal',
+        })
+        Quant = self.env['stock.quant']
+        old_date = fields.Datetime.now() - timedelta(days=100)
+        for location, quantity, in_date in (
+            (self.test_location, 10.0, False),
+            (other_location, 5.0, False),
+            (self.test_location, 7.0, old_date),
+        ):
+            quant = Quant.create({
+                'product_id': self.test_product.id,
+                'location_id': location.id,
+                'lot_id': self.test_lot.id if in_date else False,
+                'quantity': quantity,
+                'owner_id': self.test_owner.partner_id.id,
+            })
+            if in_date:
+                quant.in_date = in_date
+
+        report = self.env['wms.inventory.age.report'].create({
+            'owner_id': self.test_owner.id,
+            'date_as_of': fields.Date.today(),
+        })
+        report.action_generate_report()
+        self.assertEqual(len(report.report_lines), 3)
+        old_line = report.report_lines.filtered(lambda line: line.aging_period == '90_180')
+        self.assertEqual(old_line.quantity, 7.0)
+        self.assertEqual(old_line.age_days, 100)
+        self.assertEqual(old_line.lot_id, self.test_lot)
+        self.assertEqual(old_line.owner_id, self.test_owner)
+        self.assertEqual(old_line.total_value, 140.0)
+
+        # Summary mode drops the location and lot detail
+        report.summary_only = True
+        report.action_generate_report()
+        self.assertEqual(len(report.report_lines), 2)
+        current_line = report.report_lines.filtered(lambda line: line.aging_period == 'current')
+        self.assertEqual(current_line.quantity, 15.0)
+        self.assertFalse(current_line.location_id)
+
+        # Filtering on a period only keeps its stock
+        report.aging_periods = '90_180'
+        report.action_generate_report()
+        self.assertEqual(report.report_lines.mapped('quantity'), [7.0])
+
+    def test_cron_refresh_inventory_age(self):
+        """Test that the daily refresh ages quants and alerts on crossed thresholds"""
+        self.env['wms.inventory.age.config'].create({
+            'name': 'Cron Config',
+            'owner_id': self.test_owner.id,
+            'warning_age_days': 30,
+            'critical_age_days': 90,
+        })
+        Quant = self.env['stock.quant']
+        quant = Quant.create({
+            'product_id': self.test_product.id,
+            'location_id': self.test_location.id,
+            'quantity': 12.0,
+            'owner_id': self.test_owner.partner_id.id,
+        })
+        self.assertEqual(quant.age_days, 0)
+
+        # Time passes without touching the quant
+        quant.flush_recordset()
+        self.env.cr.execute("UPDATE stock_quant SET in_date = in_date - interval '45 days' WHERE id = %s", [quant.id])
+        Quant.invalidate_model()
+        self.assertEqual(quant.age_days, 0)
+
+        Alert = self.env['wms.inventory.age.alert']
+        Quant._cron_refresh_inventory_age()
+        self.assertEqual(quant.age_days, 45)
+        self.assertEqual(quant.aging_period, '30_60')
+        self.assertTrue(quant.is_aged_inventory)
+        alert = Alert.search([('product_id', '=', self.test_product.id)])
+        self.assertEqual(alert.alert_type, 'warning')
+        self.assertEqual(alert.owner_id, self.test_owner)
+        self.assertEqual(alert.quantity, 12.0)
+
+        # Already alerted stock is not alerted again
+        Quant._cron_refresh_inventory_age()
+        self.assertEqual(Alert.search_count([('product_id', '=', self.test_product.id)]), 1)
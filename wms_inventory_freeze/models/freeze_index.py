@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from itertools import product as cartesian
+
+
+class FreezeIndex(object):
+    """
+    Lookup of active freezes keyed by (location id, product id, lot id).
+
+    A freeze leaves unset the dimensions it does not restrict (e.g. a
+    location freeze has no product); they are stored as None and match any
+    value. Finding the freezes of a quant is then at most 8 dictionary
+    lookups, whatever the number of freezes.
+    """
+
+    def __init__(self, freezes=()):
+        self._freezes = {}
+        self._partial_products = set()
+        for freeze in freezes:
+            self.add(freeze)
+
+    def __bool__(self):
+        return bool(self._freezes)
+
+    @staticmethod
+    def key(location_id, product_id, lot_id):
+        return (location_id or None, product_id or None, lot_id or None)
+
+    def add(self, freeze):
+        """Register a freeze given as a dict with location_id, product_id and lot_id ids"""
+        key = self.key(freeze['location_id'], freeze['product_id'], freeze['lot_id'])
+        if key == (None, None, None):
+            # A freeze without scope does not freeze anything
+            return
+        self._freezes.setdefault(key, []).append(freeze)
+        if freeze.get('freeze_type') == 'partial':
+            self._partial_products.add(key[1])
+
+    def get(self, location_id, product_id, lot_id):
+        """Freezes applying to stock of ``product_id`` / ``lot_id`` in ``location_id``"""
+        found = []
+        for key in cartesian({location_id or None, None}, {product_id or None, None}, {lot_id or None, None}):
+            found.extend(self._freezes.get(key, ()))
+        return found
+
+    def is_frozen(self, location_id, product_id, lot_id):
+        return bool(self.get(location_id, product_id, lot_id))
+
+    def is_blocked(self, location_id, product_id, lot_id):
+        """Whether the stock is entirely frozen (any freeze other than a partial one)"""
+        return any(freeze.get('freeze_type') != 'partial' for freeze in self.get(location_id, product_id, lot_id))
+
+    def has_partial(self, product_id):
+        """Whether partial freezes may apply to ``product_id``"""
+        return bool(self._partial_products & {product_id or None, None})
+
+    def partial_freezes(self, location_id, product_id, lot_id):
+        """Partial freezes (frozen quantity only) applying to the stock"""
+        return [freeze for freeze in self.get(location_id, product_id, lot_id) if freeze.get('freeze_type') == 'partial']
@@ -7,18 +7,78 @@ class StockQuant(models.Model):
     is_frozen = fields.Boolean('Is Frozen', compute='_compute_is_frozen', store=True, compute_sudo=True)
     freeze_ids = fields.One2many('wms.inventory.freeze', compute='_compute_freeze_ids')
 
-    @api.depends('location_id', 'product_id', 'lot_id', 'quantity')
+    @api.depends('location_id', 'product_id', 'lot_id')
     def _compute_is_frozen(self):
-        """Compute if this quant is frozen"""
+        """
+        Compute if this quant is frozen. Only runs when a quant is created or
+        moved to another location / product / lot, never on quantity updates;
+        freezes refresh the flag of their quants when they change.
+        """
+        if not self:
+            return
+        freeze_index = self.env['wms.inventory.freeze']._get_freeze_index(self)
         for quant in self:
-            freeze_records = self.env['wms.inventory.freeze'].search([
-                ('location_id', '=', quant.location_id.id),
-                ('product_id', '=', quant.product_id.id),
-                ('lot_id', '=', quant.lot_id.id),
-                ('status', '=', 'frozen'),
-                ('quantity', '<=', quant.quantity),  # Ensure freeze quantity doesn't exceed available
-            ])
-            quant.is_frozen = bool(freeze_records)
+            quant.is_frozen = freeze_index.is_frozen(quant.location_id.id, quant.product_id.id, quant.lot_id.id)
+
+    # ------------------------------------------------------------------
+    # Freeze-aware reservation
+    #
+    # While reserving (context key ``wms_freeze_reservation``), quants covered
+    # by a location, product or lot freeze are left out of _gather, and the
+    # quantity held by partial freezes is deducted from the available
+    # quantity. Freezes come from the transaction-wide lookup of
+    # wms.inventory.freeze, so reserving a wave costs no freeze query per
+    # quant or move.
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _gather(self, product_id, location_id, lot_id=None, package_id=None, owner_id=None, strict=False, qty=0):
+        quants = super()._gather(product_id, location_id, lot_id=lot_id, package_id=package_id,
+                                 owner_id=owner_id, strict=strict, qty=qty)
+        if not self.env.context.get('wms_freeze_reservation') or not quants:
+            return quants
+        freeze_lookup = self.env['wms.inventory.freeze']._get_freeze_lookup()
+        if not freeze_lookup:
+            return quants
+        return quants.filtered(
+            lambda quant: not freeze_lookup.is_blocked(quant.location_id.id, quant.product_id.id, quant.lot_id.id)
+        )
+
+    @api.model
+    def _get_available_quantity(self, product_id, location_id, lot_id=None, package_id=None, owner_id=None,
+                                strict=False, allow_negative=False):
+        quants = self.with_context(wms_freeze_reservation=True)
+        available_quantity = super(StockQuant, quants)._get_available_quantity(
+            product_id, location_id, lot_id=lot_id, package_id=package_id, owner_id=owner_id,
+            strict=strict, allow_negative=allow_negative)
+        frozen_quantity = quants._get_partially_frozen_quantity(
+            product_id, location_id, lot_id=lot_id, package_id=package_id, owner_id=owner_id, strict=strict)
+        if not frozen_quantity:
+            return available_quantity
+        available_quantity -= frozen_quantity
+        return available_quantity if allow_negative else max(available_quantity, 0.0)
+
+    @api.model
+    def _update_reserved_quantity(self, product_id, location_id, quantity, lot_id=None, package_id=None,
+                                  owner_id=None, strict=True):
+        quants = self.with_context(wms_freeze_reservation=True) if quantity > 0 else self
+        return super(StockQuant, quants)._update_reserved_quantity(
+            product_id, location_id, quantity, lot_id=lot_id, package_id=package_id,
+            owner_id=owner_id, strict=strict)
+
+    @api.model
+    def _get_partially_frozen_quantity(self, product_id, location_id, lot_id=None, package_id=None,
+                                       owner_id=None, strict=False):
+        """Quantity held by the partial freezes applying to the gathered quants"""
+        freeze_lookup = self.env['wms.inventory.freeze']._get_freeze_lookup()
+        if not freeze_lookup.has_partial(product_id.id):
+            return 0.0
+        freezes = {}
+        for quant in self._gather(product_id, location_id, lot_id=lot_id, package_id=package_id,
+                                  owner_id=owner_id, strict=strict):
+            for freeze in freeze_lookup.partial_freezes(quant.location_id.id, quant.product_id.id, quant.lot_id.id):
+                freezes[freeze['id']] = freeze['quantity']
+        return sum(freezes.values())
 
     def _compute_freeze_ids(self):
         """Compute related freeze records"""
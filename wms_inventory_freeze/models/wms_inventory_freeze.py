@@ -1,4 +1,15 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+
+from .freeze_index import FreezeIndex
+
+# Fields defining which quants a freeze applies to
+FREEZE_SCOPE_FIELDS = ('location_id', 'product_id', 'lot_id', 'status')
+
+# Fields read by the reservation freeze lookup
+FREEZE_LOOKUP_FIELDS = FREEZE_SCOPE_FIELDS + ('freeze_type', 'quantity')
+
+# Cursor cache key of the freeze lookup used during reservation
+FREEZE_LOOKUP_CACHE_KEY = 'wms_inventory_freeze.lookup'
 
 
 class WmsInventoryFreeze(models.Model):
@@ -48,11 +59,108 @@ class WmsInventoryFreeze(models.Model):
             else:
                 record.expiry_date = False
 
+    def init(self):
+        tools.create_index(
+            self._cr, 'wms_inventory_freeze_scope_index', self._table,
+            ['location_id', 'product_id', 'lot_id', 'status'],
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if not vals.get('name'):
+                vals['name'] = self.env['ir.sequence'].next_by_code('wms.inventory.freeze') or '/'
+        freezes = super().create(vals_list)
+        self._invalidate_freeze_lookup()
+        self._refresh_frozen_quants(freezes._get_scope_keys())
+        return freezes
+
+    def write(self, vals):
+        if any(name in vals for name in FREEZE_LOOKUP_FIELDS):
+            self._invalidate_freeze_lookup()
+        if not any(name in vals for name in FREEZE_SCOPE_FIELDS):
+            return super().write(vals)
+        keys = self._get_scope_keys()
+        res = super().write(vals)
+        self._refresh_frozen_quants(keys | self._get_scope_keys())
+        return res
+
+    def unlink(self):
+        keys = self._get_scope_keys()
+        res = super().unlink()
+        self._invalidate_freeze_lookup()
+        self._refresh_frozen_quants(keys)
+        return res
+
+    def _get_scope_keys(self):
+        """(location, product, lot) keys of the freezes, None for unset dimensions"""
+        return {
+            FreezeIndex.key(freeze.location_id.id, freeze.product_id.id, freeze.lot_id.id)
+            for freeze in self
+        } - {(None, None, None)}
+
+    @api.model
+    def _get_freeze_index(self, quants=None):
+        """
+        FreezeIndex of the active freezes, loaded with one query. When
+        ``quants`` is given, only the freezes that can apply to them are loaded.
+        """
+        domain = [('status', '=', 'frozen')]
+        if quants is not None:
+            for field_name in ('location_id', 'product_id', 'lot_id'):
+                domain += ['|', (field_name, '=', False), (field_name, 'in', quants[field_name].ids)]
+        return FreezeIndex(self.search_read(
+            domain, ['location_id', 'product_id', 'lot_id', 'freeze_type', 'quantity'], load=None
+        ))
+
+    @api.model
+    def _get_freeze_lookup(self):
+        """
+        FreezeIndex of all active freezes, shared by every reservation of the
+        current transaction: it is loaded once and dropped when a freeze
+        changes or the transaction ends.
+        """
+        cr = self.env.cr
+        lookup = cr.cache.get(FREEZE_LOOKUP_CACHE_KEY)
+        if lookup is None:
+            lookup = cr.cache[FREEZE_LOOKUP_CACHE_KEY] = self.sudo()._get_freeze_index()
+            cr.postcommit.add(self._invalidate_freeze_lookup)
+            cr.postrollback.add(self._invalidate_freeze_lookup)
+        return lookup
+
+    @api.model
+    def _invalidate_freeze_lookup(self):
+        self.env.cr.cache.pop(FREEZE_LOOKUP_CACHE_KEY, None)
+
     @api.model
-    def create(self, vals):
-        if not vals.get('name'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('wms.inventory.freeze') or '/'
-        return super().create(vals)
+    def _refresh_frozen_quants(self, keys):
+        """
+        Recompute stock.quant.is_frozen for every quant in the scope of
+        ``keys`` with a single UPDATE, instead of a freeze search per quant.
+        """
+        if not keys:
+            return
+        self.flush_model(['location_id', 'product_id', 'lot_id', 'status'])
+        self.env['stock.quant'].flush_model(['location_id', 'product_id', 'lot_id', 'is_frozen'])
+        values = ', '.join(['(%s::int, %s::int, %s::int)'] * len(keys))
+        params = [value for key in keys for value in key]
+        self.env.cr.execute("""
+            UPDATE stock_quant q
+               SET is_frozen = EXISTS (
+                       SELECT 1
+                         FROM wms_inventory_freeze f
+                        WHERE f.status = 'frozen'
+                          AND (f.location_id IS NOT NULL OR f.product_id IS NOT NULL OR f.lot_id IS NOT NULL)
+                          AND (f.location_id IS NULL OR f.location_id = q.location_id)
+                          AND (f.product_id IS NULL OR f.product_id = q.product_id)
+                          AND (f.lot_id IS NULL OR f.lot_id = q.lot_id)
+                   )
+              FROM (VALUES %s) AS scope(location_id, product_id, lot_id)
+             WHERE (scope.location_id IS NULL OR scope.location_id = q.location_id)
+               AND (scope.product_id IS NULL OR scope.product_id = q.product_id)
+               AND (scope.lot_id IS NULL OR scope.lot_id = q.lot_id)
+        """ % values, params)
+        self.env['stock.quant'].invalidate_model(['is_frozen'])
 
     def action_unfreeze(self):
         """Unfreeze the inventory"""
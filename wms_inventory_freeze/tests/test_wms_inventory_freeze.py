@@ -231,4 +231,84 @@ class TestWmsInventoryFreeze(TransactionCase):
         quant.refresh()
 
         # Now the quant should be marked as frozen
-        self.assertTrue(quant.is_frozen)
\ No newline at end of file
+        self.assertTrue(quant.is_frozen)
+
+    def test_freeze_refreshes_quants_in_scope(self):
+        """Test that freezes flag and release their quants in bulk"""
+        other_location = self.env['stock.location'].create({
+            'name': 'Other Location',
+            'usage': 'internal',
+        })
+        Quant = self.env['stock.quant']
+        quant = Quant.create({
+            'product_id': self.test_product.id,
+            'location_id': self.test_location.id,
+            'quantity': 10.0,
+        })
+        other_quant = Quant.create({
+            'product_id': self.test_product.id,
+            'location_id': other_location.id,
+            'quantity': 10.0,
+        })
+
+        # A location freeze has no product and freezes the whole location
+        freeze = self.env['wms.inventory.freeze'].create({
+            'owner_id': self.test_owner.id,
+            'location_id': self.test_location.id,
+            'reason': 'audit',
+            'quantity': 0.0,
+            'uom_id': self.test_uom.id,
+            'freeze_type': 'location',
+        })
+        self.assertTrue(quant.is_frozen)
+        self.assertFalse(other_quant.is_frozen)
+
+        # Quantity updates keep the flag
+        quant.quantity = 2.0
+        self.assertTrue(quant.is_frozen)
+
+        # New quants in the frozen location are flagged on creation
+        product_2 = self.env['product.product'].create({'name': 'Other Product', 'type': 'product'})
+        new_quant = Quant.create({
+            'product_id': product_2.id,
+            'location_id': self.test_location.id,
+            'quantity': 1.0,
+        })
+        self.assertTrue(new_quant.is_frozen)
+
+        freeze.action_release()
+        self.assertFalse(quant.is_frozen)
+        self.assertFalse(new_quant.is_frozen)
+
+    def test_freeze_limits_reservation(self):
+        """Test that freezes are deducted from the quantity available for reservation"""
+        Quant = self.env['stock.quant']
+        Quant._update_available_quantity(self.test_product, self.test_location, 10.0)
+        self.assertEqual(Quant._get_available_quantity(self.test_product, self.test_location), 10.0)
+
+        # A partial freeze holds its quantity only
+        partial = self.env['wms.inventory.freeze'].create({
+            'owner_id': self.test_owner.id,
+            'location_id': self.test_location.id,
+            'product_id': self.test_product.id,
+            'reason': 'quality_issue',
+            'quantity': 4.0,
+            'uom_id': self.test_uom.id,
+            'freeze_type': 'partial',
+        })
+        self.assertEqual(Quant._get_available_quantity(self.test_product, self.test_location), 6.0)
+
+        # A location freeze blocks the whole stock of the location
+        location_freeze = self.env['wms.inventory.freeze'].create({
+            'owner_id': self.test_owner.id,
+            'location_id': self.test_location.id,
+            'reason': 'audit',
+            'quantity': 0.0,
+            'uom_id': self.test_uom.id,
+            'freeze_type': 'location',
+        })
+        self.assertEqual(Quant._get_available_quantity(self.test_product, self.test_location), 0.0)
+
+        location_freeze.action_release()
+        partial.action_release()
+        self.assertEqual(Quant._get_available_quantity(self.test_product, self.test_location), 10.0)
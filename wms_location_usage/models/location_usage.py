@@ -1,6 +1,6 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 
 
@@ -113,6 +113,10 @@ class WmsLocationUsage(models.Model):
         ]
         locations = self.env['stock.location'].search(location_domain)
 
+        # Content of every location, by owner, in one grouped query
+        occupancy = self._get_location_occupancy(locations)
+        owner_partner_id = self.owner_id.partner_id.id
+
         total_locations = len(locations)
         occupied_locations = 0
         empty_locations = 0
@@ -122,33 +126,19 @@ class WmsLocationUsage(models.Model):
         # Calculate occupation status for each location
         location_details = []
         for location in locations:
-            # Get inventory in the location
-            quants = self.env['stock.quant'].search([
-                ('location_id', '=', location.id),
-                ('quantity', '>', 0),
-            ])
-
-            location_occupied = len(quants) > 0
-            location_volume = 0.0
-            location_weight = 0.0
-
-            for quant in quants:
-                if quant.owner_id and quant.owner_id.id == self.owner_id.id:
-                    # Calculate volume and weight
-                    product = quant.product_id
-                    quant_volume = product.volume * quant.quantity
-                    quant_weight = product.weight * quant.quantity
-
-                    location_volume += quant_volume
-                    location_weight += quant_weight
-                    used_capacity += quant_volume
-
-            # Add location capacity
-            if location.volume_per_location:
-                total_capacity += location.volume_per_location
-            else:
-                # If location doesn't have volume capacity set, estimate based on goods occupied
-                total_capacity += location_volume * 1.5  # Estimated capacity, can be adjusted based on configuration
+            location_stock = occupancy.get(location.id, {})
+            location_occupied = bool(location_stock)
+
+            # Volume and weight of the analysed owner's goods
+            owner_stock = location_stock.get(owner_partner_id, {})
+            location_volume = owner_stock.get('volume', 0.0)
+            location_weight = owner_stock.get('weight', 0.0)
+            used_capacity += location_volume
+
+            # Add location capacity; if location doesn't have volume capacity set,
+            # estimate based on goods occupied (can be adjusted based on configuration)
+            capacity = location.volume_per_location or location_volume * 1.5
+            total_capacity += capacity
 
             # Count occupation status
             if location_occupied:
@@ -162,8 +152,8 @@ class WmsLocationUsage(models.Model):
                 'is_occupied': location_occupied,
                 'occupied_volume': location_volume,
                 'occupied_weight': location_weight,
-                'capacity': location.volume_per_location or location_volume * 1.5,
-                'usage_rate': (location_volume / (location.volume_per_location or (location_volume * 1.5))) * 100 if (location.volume_per_location or (location_volume * 1.5)) > 0 else 0
+                'capacity': capacity,
+                'usage_rate': (location_volume / capacity) * 100 if capacity > 0 else 0
             })
 
         # Calculate overall occupancy rate
@@ -179,9 +169,9 @@ class WmsLocationUsage(models.Model):
         turnover_rate = self._calculate_turnover_rate()
         avg_residence_time = self._calculate_avg_residence_time()
 
-        # Statistics by zone and category
-        stats_by_zone = self._calculate_stats_by_zone(locations)
-        stats_by_category = self._calculate_stats_by_category(locations)
+        # Statistics by zone and category, rolled up from the same occupancy
+        stats_by_zone = self._calculate_stats_by_zone(locations, occupancy=occupancy)
+        stats_by_category = self._calculate_stats_by_category(locations, occupancy=occupancy)
 
         # Usage trend analysis
         usage_trend = self._calculate_usage_trend()
@@ -209,117 +199,133 @@ class WmsLocationUsage(models.Model):
             'usage_trend': usage_trend
         }
 
+    def _get_location_occupancy(self, locations):
+        """
+        Content of ``locations`` with one grouped query over stock.quant joined
+        to the product dimensions.
+
+        Returns {location_id: {owner partner id (or None): {'quantity',
+        'volume', 'weight', 'quant_count'}}}; only locations holding a
+        positive quantity are present.
+        """
+        location_ids = [location.id for location in locations]
+        if not location_ids:
+            return {}
+
+        self.env['stock.quant'].flush_model(['location_id', 'owner_id', 'product_id', 'quantity'])
+        self.env['product.product'].flush_model(['volume', 'weight'])
+        self.env.cr.execute("""
+            SELECT q.location_id, q.owner_id, COUNT(*), SUM(q.quantity)::float,
+                   SUM(q.quantity * COALESCE(pp.volume, 0))::float,
+                   SUM(q.quantity * COALESCE(pp.weight, 0))::float
+            FROM stock_quant q
+            JOIN product_product pp ON pp.id = q.product_id
+            WHERE q.location_id = ANY(%s) AND q.quantity > 0
+            GROUP BY q.location_id, q.owner_id
+        """, [location_ids])
+
+        occupancy = {}
+        for location_id, owner_id, quant_count, quantity, volume, weight in self.env.cr.fetchall():
+            occupancy.setdefault(location_id, {})[owner_id] = {
+                'quant_count': quant_count,
+                'quantity': quantity,
+                'volume': volume,
+                'weight': weight,
+            }
+        return occupancy
+
     def _calculate_turnover_rate(self):
         """Calculate inventory turnover rate (simplified version)"""
-        # Calculate the frequency of inbound and outbound operations during the specified period
-        domain = [
-            ('date', '>=', self.period_start),
-            ('date', '<=', self.period_end),
-            ('state', '=', 'done'),
-        ]
-
-        if hasattr(self.env['stock.move'], 'owner_id'):
-            domain.append(('owner_id', '=', self.owner_id.id))
-
-        moves = self.env['stock.move'].search(domain)
         # Simplified calculation: turnover rate = outbound quantity / average inventory
         # More complex logic is needed here, returning an estimated value for now
         return 12.0  # Assume 12 turnovers per year
 
     def _calculate_avg_residence_time(self):
         """Calculate average residence time (simplified version)"""
-        # Estimate average residence time by querying the creation time of inventory records
-        quants = self.env['stock.quant'].search([
-            ('location_id', 'child_of', self.warehouse_id.lot_stock_id.id),
-            ('owner_id', '=', self.owner_id.id),
-            ('quantity', '>', 0),
+        # Estimate average residence time from the creation time of inventory records
+        stock_locations = self.env['stock.location'].search([
+            ('id', 'child_of', self.warehouse_id.lot_stock_id.id),
         ])
-
-        total_days = 0
-        count = 0
-        for quant in quants:
-            if quant.create_date:
-                days = (fields.Datetime.now() - quant.create_date).days
-                total_days += days
-                count += 1
-
-        return (total_days / count) if count > 0 else 0.0
-
-    def _calculate_stats_by_zone(self, locations):
+        self.env['stock.quant'].flush_model(['location_id', 'owner_id', 'quantity'])
+        self.env.cr.execute("""
+            SELECT AVG(DATE_PART('day', %s - q.create_date))
+            FROM stock_quant q
+            WHERE q.location_id = ANY(%s)
+              AND q.owner_id = %s
+              AND q.quantity > 0
+              AND q.create_date IS NOT NULL
+        """, [fields.Datetime.now(), stock_locations.ids, self.owner_id.partner_id.id])
+        avg_days = self.env.cr.fetchone()[0]
+        return float(avg_days) if avg_days is not None else 0.0
+
+    def _calculate_stats_by_zone(self, locations, occupancy=None):
         """Statistics by zone"""
-        stats = {}
-        for location in locations:
-            zone = location.location_id.name if location.location_id else 'Unknown Zone'
-            if zone not in stats:
-                stats[zone] = {
-                    'total': 0,
-                    'occupied': 0,
-                    'empty': 0,
-                    'usage_rate': 0.0
-                }
+        return self._rollup_location_stats(
+            locations,
+            lambda location: location.location_id.name if location.location_id else 'Unknown Zone',
+            occupancy=occupancy,
+        )
 
-            stats[zone]['total'] += 1
-            quants = self.env['stock.quant'].search([('location_id', '=', location.id), ('quantity', '>', 0)])
-            if quants:
-                stats[zone]['occupied'] += 1
-            else:
-                stats[zone]['empty'] += 1
-
-        # Calculate usage rate
-        for zone, data in stats.items():
-            data['usage_rate'] = (data['occupied'] / data['total'] * 100) if data['total'] > 0 else 0.0
+    def _calculate_stats_by_category(self, locations, occupancy=None):
+        """Statistics by location category"""
+        return self._rollup_location_stats(
+            locations,
+            lambda location: location.chief_worker.name if hasattr(location, 'chief_worker') and location.chief_worker else 'General Location',
+            occupancy=occupancy,
+        )
 
-        return stats
+    def _rollup_location_stats(self, locations, key, occupancy=None):
+        """Count total / occupied / empty locations per ``key(location)``"""
+        if occupancy is None:
+            occupancy = self._get_location_occupancy(locations)
 
-    def _calculate_stats_by_category(self, locations):
-        """Statistics by location category"""
         stats = {}
         for location in locations:
-            category = location.chief_worker.name if hasattr(location, 'chief_worker') and location.chief_worker else 'General Location'
-            if category not in stats:
-                stats[category] = {
+            group = key(location)
+            if group not in stats:
+                stats[group] = {
                     'total': 0,
                     'occupied': 0,
                     'empty': 0,
                     'usage_rate': 0.0
                 }
 
-            stats[category]['total'] += 1
-            quants = self.env['stock.quant'].search([('location_id', '=', location.id), ('quantity', '>', 0)])
-            if quants:
-                stats[category]['occupied'] += 1
+            stats[group]['total'] += 1
+            if location.id in occupancy:
+                stats[group]['occupied'] += 1
             else:
-                stats[category]['empty'] += 1
+                stats[group]['empty'] += 1
 
         # Calculate usage rate
-        for category, data in stats.items():
+        for group, data in stats.items():
             data['usage_rate'] = (data['occupied'] / data['total'] * 100) if data['total'] > 0 else 0.0
 
         return stats
 
     def _calculate_usage_trend(self):
         """Calculate usage trend"""
-        # Simplified implementation: analyze location usage trend by month
-        trends = []
-        current_date = self.period_start
-        while current_date <= self.period_end:
-            # Calculate location usage for current date
-            quants = self.env['stock.quant'].search([
-                ('create_date', '<=', current_date),
-                ('quantity', '>', 0),
-                ('location_id', 'child_of', self.warehouse_id.lot_stock_id.id),
-                ('owner_id', '=', self.owner_id.id),
-            ])
-
-            trends.append({
-                'date': current_date,
-                'occupied_locations': len(quants),
-                'total_quantity': sum(quant.quantity for quant in quants)
-            })
-
-            current_date += timedelta(days=7)  # Weekly statistics, can be adjusted as needed
-
-        return trends
+        # Simplified implementation: weekly location usage over the period, in one query
+        stock_locations = self.env['stock.location'].search([
+            ('id', 'child_of', self.warehouse_id.lot_stock_id.id),
+        ])
+        self.env['stock.quant'].flush_model(['location_id', 'owner_id', 'quantity'])
+        self.env.cr.execute("""
+            SELECT day::date, COUNT(q.id), COALESCE(SUM(q.quantity), 0)::float
+            FROM generate_series(%s::date, %s::date, interval '7 days') AS day
+            LEFT JOIN stock_quant q
+                   ON q.create_date <= day
+                  AND q.quantity > 0
+                  AND q.location_id = ANY(%s)
+                  AND q.owner_id = %s
+            GROUP BY day
+            ORDER BY day
+        """, [self.period_start, self.period_end, stock_locations.ids, self.owner_id.partner_id.id])
+
+        return [{
+            'date': fields.Date.to_string(day),
+            'occupied_locations': count,
+            'total_quantity': quantity,
+        } for day, count, quantity in self.env.cr.fetchall()]
 
     def _generate_recommendations(self, stats):
         """Generate optimization recommendations"""
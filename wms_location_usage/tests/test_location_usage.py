@@ -282,4 +282,32 @@ class TestWmsLocationUsage(TransactionCase):
         recommendations_html = location_usage._generate_recommendations(stats)
         self.assertIn('<div>', recommendations_html)
         self.assertIn('<ul>', recommendations_html)
-        self.assertIn('recommendations', recommendations_html.lower())
\ No newline at end of file
+        self.assertIn('recommendations', recommendations_html.lower())
+
+    def test_location_occupancy_aggregation(self):
+        """Test the grouped location occupancy and its rollups"""
+        location_usage = self.WmsLocationUsage.create({
+            'name': 'Test Location Occupancy',
+            'period_start': datetime.now() - timedelta(days=7),
+            'period_end': datetime.now(),
+            'owner_id': self.owner.id,
+            'warehouse_id': self.warehouse.id,
+            'analysis_type': 'all',
+        })
+        Quant = self.env['stock.quant']
+        Quant._update_available_quantity(self.product1, self.location1, 10.0, owner_id=self.owner.partner_id)
+        Quant._update_available_quantity(self.product2, self.location1, 5.0)
+
+        occupancy = location_usage._get_location_occupancy(self.location1 | self.location2)
+        self.assertIn(self.location1.id, occupancy)
+        self.assertNotIn(self.location2.id, occupancy)
+        owner_stock = occupancy[self.location1.id][self.owner.partner_id.id]
+        self.assertAlmostEqual(owner_stock['volume'], 0.1)
+        self.assertAlmostEqual(owner_stock['weight'], 10.0)
+        self.assertAlmostEqual(occupancy[self.location1.id][None]['weight'], 10.0)
+
+        stats_by_zone = location_usage._calculate_stats_by_zone(
+            self.location1 | self.location2, occupancy=occupancy)
+        zone = stats_by_zone[self.warehouse.lot_stock_id.name]
+        self.assertEqual(zone['occupied'], 1)
+        self.assertEqual(zone['empty'], 1)
@@ -24,6 +24,7 @@
         'wms_courier',          # For performance metrics on shipping
         'wms_location_usage',   # For location performance metrics
         'wms_eiq_analysis',     # For EIQ-based performance insights
+        'wms_performance_fact', # For daily performance facts
     ],
     'data': [
         'security/ir.model.access.csv',
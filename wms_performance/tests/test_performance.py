@@ -331,4 +331,31 @@ class TestWmsPerformance(TransactionCase):
         service_metrics = report._calculate_service_metrics()
         self.assertIsInstance(service_metrics, dict)
         self.assertIn('score', service_metrics)
-        self.assertIn('service_rate', service_metrics)
\ No newline at end of file
+        self.assertIn('service_rate', service_metrics)
+
+    def test_metrics_from_one_facts_pass(self):
+        """Test that all metrics are derived from the same period facts"""
+        report = self.WmsPerformanceReport.create({
+            'name': 'Test Single Pass Metrics',
+            'period_start': datetime.now() - timedelta(days=7),
+            'period_end': datetime.now(),
+            'owner_id': self.owner.id,
+            'warehouse_id': self.warehouse.id,
+            'report_type': 'weekly',
+        })
+        facts = {
+            'incoming_count': 30, 'outgoing_count': 50, 'internal_count': 20, 'operation_count': 100,
+            'processing_hours': 400.0, 'on_time_count': 45, 'adjustment_count': 5,
+            'incident_count': 1, 'all_incident_count': 1,
+        }
+        throughput = report._calculate_throughput_metrics(facts)
+        self.assertEqual(throughput['total_operations'], 100)
+        self.assertEqual(throughput['inbound_operations'], 30)
+        self.assertEqual(report._calculate_efficiency_metrics(facts)['avg_processing_time'], 4.0)
+        self.assertEqual(report._calculate_quality_metrics(facts)['quality_rate'], 95.0)
+        self.assertEqual(report._calculate_service_metrics(facts)['service_rate'], 90.0)
+        self.assertEqual(report._calculate_safety_metrics(facts)['total_incidents'], 1)
+
+        performance_data = report._calculate_performance_metrics()
+        self.assertEqual(performance_data['metrics']['throughput']['total_operations'],
+                         performance_data['facts']['operation_count'])
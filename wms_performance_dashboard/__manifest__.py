@@ -26,7 +26,8 @@
         "wms_energy_management",
         "wms_safety_management",
         "wms_finance_integration",
-        "wms_returns_management"
+        "wms_returns_management",
+        "wms_performance_fact"
     ],
     "data": [
         "security/ir.model.access.csv",
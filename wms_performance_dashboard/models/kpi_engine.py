@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import ast
+import functools
+import threading
+import time
+
+# Seconds during which evaluated KPI values are served from the cache
+KPI_CACHE_TTL = 300
+
+# Field types whose values read_group can sum
+NUMERIC_FIELD_TYPES = ('integer', 'float', 'monetary')
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_condition(condition):
+    try:
+        domain = ast.literal_eval(condition)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return ()
+    if not isinstance(domain, (list, tuple)):
+        return ()
+    return tuple(tuple(leaf) if isinstance(leaf, list) else leaf for leaf in domain)
+
+
+def parse_condition(condition):
+    """
+    Domain of a KPI ``condition`` string, parsed as a literal (no code is
+    evaluated) and memoized. An invalid condition gives an empty domain.
+    """
+    if not condition:
+        return []
+    return list(_parse_condition(condition.strip()))
+
+
+class TtlCache(object):
+    """Thread-safe mapping whose entries expire ``ttl`` seconds after being set"""
+
+    def __init__(self, ttl=KPI_CACHE_TTL):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def discard(self, predicate):
+        """Drop the entries whose key satisfies ``predicate``"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+
+# KPI values per (database, user id, company ids, owner id, day): {kpi id: (signature, current, previous)}
+kpi_value_cache = TtlCache()
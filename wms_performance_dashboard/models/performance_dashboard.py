@@ -1,8 +1,12 @@
 from odoo import models, fields, api, _, tools
+from collections import defaultdict
 from datetime import datetime, timedelta
 from odoo.exceptions import ValidationError
+import json
 import logging
 
+from .kpi_engine import NUMERIC_FIELD_TYPES, kpi_value_cache, parse_condition
+
 _logger = logging.getLogger(__name__)
 
 
@@ -43,6 +47,20 @@ class WmsDashboardTemplate(models.Model):
     is_active = fields.Boolean('Active', default=True)
     is_default = fields.Boolean('Default Template', help='Only one template can be default per dashboard type')
 
+    def get_kpi_values(self, owner_id=None):
+        """
+        Values of the KPIs of ``owner_id`` (default: the template owner) for
+        the dashboard. The KPIs are evaluated together in grouped passes and
+        served from the KPI cache while it is fresh.
+        """
+        self.ensure_one()
+        owner_id = owner_id or self.default_owner_id.id
+        domain = [('owner_id', '=', owner_id)] if owner_id else []
+        return self.env['wms.performance.kpi'].search_read(domain, [
+            'name', 'code', 'category', 'unit_of_measure', 'target_value', 'benchmark_value',
+            'current_value', 'previous_value', 'trend',
+        ])
+
 
 class WmsDashboardWidget(models.Model):
     _name = 'wms.dashboard.widget'
@@ -129,6 +147,7 @@ class WmsPerformanceKpi(models.Model):
         ('wms.safety.incident', 'Safety Incident'),
         ('wms.financial.transaction', 'Financial Transaction'),
         ('wms.return.authorization', 'Return Authorization'),
+        ('wms.performance.daily.fact', 'Daily Performance Facts'),
     ], string='Source Model', required=True)
     source_field = fields.Char('Source Field', help='Field name in the source model')
     condition = fields.Char('Condition', help='Domain condition for filtering')
@@ -139,9 +158,9 @@ class WmsPerformanceKpi(models.Model):
     unit_of_measure = fields.Char('Unit of Measure', default='%')
 
     # Trend tracking
-    current_value = fields.Float('Current Value', compute='_compute_current_value', store=True)
-    previous_value = fields.Float('Previous Value', compute='_compute_previous_value', store=True)
-    trend = fields.Float('Trend %', compute='_compute_trend', store=True)
+    current_value = fields.Float('Current Value', compute='_compute_kpi_values')
+    previous_value = fields.Float('Previous Value', compute='_compute_kpi_values')
+    trend = fields.Float('Trend %', compute='_compute_kpi_values')
 
     # Alert settings
     alert_threshold = fields.Float('Alert Threshold')
@@ -152,72 +171,212 @@ class WmsPerformanceKpi(models.Model):
 
     owner_id = fields.Many2one('wms.owner', 'Owner', required=True)
 
-    @api.depends('source_model', 'source_field', 'condition', 'owner_id')
-    def _compute_current_value(self):
+    @api.depends('source_model', 'source_field', 'condition', 'calculation_method', 'owner_id')
+    @api.depends_context('uid', 'allowed_company_ids')
+    def _compute_kpi_values(self):
+        values = self._evaluate_kpis()
         for kpi in self:
-            try:
-                records = self._get_filtered_records(kpi)
-                kpi.current_value = self._calculate_kpi_value(kpi, records)
-            except Exception as e:
-                _logger.error(f"Error computing KPI {kpi.name}: {e}")
-                kpi.current_value = 0.0
-
-    @api.depends('source_model', 'source_field', 'condition', 'owner_id')
-    def _compute_previous_value(self):
+            current, previous = values.get(kpi.id, (0.0, 0.0))
+            kpi.current_value = current
+            kpi.previous_value = previous
+            kpi.trend = ((current - previous) / previous) * 100 if previous else 0.0
+
+    def _get_kpi_signature(self):
+        """Settings the cached value of the KPI depends on"""
+        self.ensure_one()
+        return (self.source_model, self.source_field, self.condition, self.calculation_method, self.owner_id.id)
+
+    def _get_kpi_periods(self):
+        """Start of the previous period, start of the current one and its exclusive end"""
+        today = fields.Date.context_today(self)
+        current_start = today.replace(day=1)
+        previous_start = (current_start - timedelta(days=1)).replace(day=1)
+        return previous_start, current_start, today + timedelta(days=1)
+
+    def _evaluate_kpis(self):
+        """
+        Current and previous values of the KPIs, ``{kpi id: (current, previous)}``.
+
+        Values still fresh in the per-owner cache are reused, the others are
+        computed together by ``_compute_kpi_passes`` and cached. The cache is
+        also keyed by user and companies, whose access rules filter the values.
+        """
+        cache_key = (self.env.cr.dbname, self.env.uid, tuple(self.env.companies.ids))
+        today = fields.Date.context_today(self)
+        results = {}
+        pending_ids = []
+        for owner, kpis in self.grouped('owner_id').items():
+            cached = kpi_value_cache.get(cache_key + (owner.id, today)) or {}
+            for kpi in kpis:
+                entry = cached.get(kpi.id)
+                if entry and entry[0] == kpi._get_kpi_signature():
+                    results[kpi.id] = entry[1:]
+                else:
+                    pending_ids.append(kpi.id)
+        if not pending_ids:
+            return results
+
+        pending = self.browse(pending_ids)
+        computed = pending._compute_kpi_passes()
+        results.update(computed)
+        for owner, kpis in pending.grouped('owner_id').items():
+            key = cache_key + (owner.id, today)
+            cached = dict(kpi_value_cache.get(key) or {})
+            cached.update({
+                kpi.id: (kpi._get_kpi_signature(),) + computed[kpi.id]
+                for kpi in kpis if isinstance(kpi.id, int)
+            })
+            kpi_value_cache.set(key, cached)
+        return results
+
+    def _compute_kpi_passes(self):
+        """
+        Evaluate the KPIs with one read_group per source model and domain,
+        shared by every KPI using them. Each pass covers both periods,
+        grouped by month, and computes all the aggregates its KPIs need.
+        """
+        previous_start, current_start, end = self._get_kpi_periods()
+        passes = defaultdict(set)
+        plans = {}
+        results = {}
         for kpi in self:
+            plan = kpi._get_kpi_plan()
+            if plan is None:
+                try:
+                    with self.env.cr.savepoint():
+                        results[kpi.id] = (
+                            self._calculate_kpi_value(kpi, self._get_filtered_records(kpi)),
+                            self._calculate_kpi_value(kpi, self._get_filtered_records(kpi, previous_period=True)),
+                        )
+                except Exception as e:
+                    _logger.error("Error computing KPI %s: %s", kpi.code, e)
+                    results[kpi.id] = (0.0, 0.0)
+                continue
+            plans[kpi.id] = plan
+            for pass_key, aggregate in (plan[0], plan[1]):
+                if pass_key:
+                    passes[pass_key].add(aggregate)
+
+        pass_values = {}
+        for (model_name, domain_key), aggregates in passes.items():
+            model = self.env[model_name]
+            date_field = self._get_kpi_date_field(model)
+            domain = list(parse_condition(domain_key))
+            groupby = []
+            if date_field:
+                domain += [(date_field, '>=', previous_start), (date_field, '<', end)]
+                groupby = ['%s:month' % date_field]
+            aggregates = sorted(aggregates)
+            values = {'current': defaultdict(float), 'previous': defaultdict(float)}
             try:
-                # Get records from previous period (same length as current period)
-                records = self._get_filtered_records(kpi, previous_period=True)
-                kpi.previous_value = self._calculate_kpi_value(kpi, records)
+                with self.env.cr.savepoint():
+                    groups = model._read_group(domain, groupby=groupby, aggregates=aggregates)
             except Exception as e:
-                _logger.error(f"Error computing previous KPI value {kpi.name}: {e}")
-                kpi.previous_value = 0.0
+                _logger.error("Error computing KPIs on %s: %s", model_name, e)
+                groups = []
+            for group in groups:
+                if groupby:
+                    month = fields.Date.to_date(group[0])
+                    periods = ['current'] if month and month >= current_start else ['previous']
+                    group = group[1:]
+                else:
+                    periods = ['current', 'previous']
+                for period in periods:
+                    for aggregate, value in zip(aggregates, group):
+                        values[period][aggregate] += value or 0.0
+            pass_values[(model_name, domain_key)] = values
+
+        for kpi_id, (numerator, denominator, factor) in plans.items():
+            kpi_values = []
+            for period in ('current', 'previous'):
+                value = pass_values[numerator[0]][period][numerator[1]] if numerator[0] else 0.0
+                if denominator[0]:
+                    count = pass_values[denominator[0]][period][denominator[1]]
+                    value = value / count if count else 0.0
+                kpi_values.append(value * factor)
+            results[kpi_id] = tuple(kpi_values)
+        return results
+
+    def _get_kpi_plan(self):
+        """
+        How the KPI is computed from read_group aggregates:
+        ``((pass, aggregate), (pass, aggregate) or (None, None), factor)``
+        for ``numerator [/ denominator] * factor``, where a pass is a
+        (model name, domain) key. Returns None when the source field cannot
+        be aggregated by the database.
+        """
+        self.ensure_one()
+        no_pass = (None, None)
+        if self.source_model not in self.env:
+            return (no_pass, no_pass, 1.0)
+        model = self.env[self.source_model]
+        domain = parse_condition(self.condition) + self._get_owner_domain(model)
+
+        def pass_key(extra=()):
+            return (self.source_model, repr(domain + list(extra)))
+
+        if self.calculation_method == 'count':
+            return ((pass_key(), '__count'), no_pass, 1.0)
+
+        field = model._fields.get(self.source_field or '')
+        if not field:
+            return (no_pass, no_pass, 1.0)
+        if not field.store:
+            return None
+        if field.type == 'boolean':
+            numerator = (pass_key([(field.name, '=', True)]), '__count')
+        elif field.type in NUMERIC_FIELD_TYPES:
+            numerator = (pass_key(), '%s:sum' % field.name)
+        else:
+            return None
+
+        if self.calculation_method == 'sum':
+            return (numerator, no_pass, 1.0)
+        if self.calculation_method == 'ratio':
+            # Average over the records with a non zero value
+            nonzero = [(field.name, '!=', False if field.type == 'boolean' else 0)]
+            numerator = (pass_key(nonzero), numerator[1] if field.type != 'boolean' else '__count')
+            return (numerator, (pass_key(nonzero), '__count'), 1.0)
+        factor = 100.0 if self.calculation_method == 'percentage' else 1.0
+        return (numerator, (pass_key(), '__count'), factor)
+
+    def _get_owner_domain(self, model):
+        """Domain restricting ``model`` to the KPI owner"""
+        field = model._fields.get('owner_id')
+        if not field:
+            return []
+        if field.comodel_name == 'res.partner':
+            return [('owner_id', '=', self.owner_id.partner_id.id)]
+        return [('owner_id', '=', self.owner_id.id)]
 
-    @api.depends('current_value', 'previous_value')
-    def _compute_trend(self):
-        for kpi in self:
-            if kpi.previous_value != 0:
-                kpi.trend = ((kpi.current_value - kpi.previous_value) / kpi.previous_value) * 100
-            else:
-                kpi.trend = 0.0
+    @api.model
+    def _get_kpi_date_field(self, model):
+        for field_name in ('date', 'create_date', 'write_date'):
+            if field_name in model._fields:
+                return field_name
+        return None
 
     def _get_filtered_records(self, kpi, previous_period=False):
         """Get filtered records for KPI calculation"""
         model = self.env[kpi.source_model]
 
         # Base domain
-        domain = []
-        if kpi.condition:
-            try:
-                domain = eval(kpi.condition)
-            except:
-                domain = []
+        domain = parse_condition(kpi.condition)
 
         # Add owner filter if applicable
-        if 'owner_id' in model._fields:
-            domain.append(('owner_id', '=', kpi.owner_id.id))
+        domain += kpi._get_owner_domain(model)
 
         # Add date range filter
-        today = fields.Date.context_today(self)
+        previous_start, current_start, end = self._get_kpi_periods()
         if previous_period:
-            # Calculate previous period (e.g., same length as current month)
-            start_date = today.replace(day=1) - timedelta(days=1)
-            start_date = start_date.replace(day=1)
-            end_date = today.replace(day=1) - timedelta(days=1)
+            start_date, end_date = previous_start, current_start
         else:
-            # Current period (this month)
-            start_date = today.replace(day=1)
-            end_date = today
-
-        if 'date' in model._fields:
-            domain.append(('date', '>=', start_date))
-            domain.append(('date', '<=', end_date))
-        elif 'create_date' in model._fields:
-            domain.append(('create_date', '>=', start_date))
-            domain.append(('create_date', '<=', end_date))
-        elif 'write_date' in model._fields:
-            domain.append(('write_date', '>=', start_date))
-            domain.append(('write_date', '<=', end_date))
+            start_date, end_date = current_start, end
+
+        date_field = self._get_kpi_date_field(model)
+        if date_field:
+            domain.append((date_field, '>=', start_date))
+            domain.append((date_field, '<', end_date))
 
         return model.search(domain)
 
@@ -330,15 +489,33 @@ class WmsPerformanceReport(models.Model):
 
     def _generate_kpi_data(self):
         """Generate KPI data for the report"""
-        # This would typically call methods to calculate KPIs for the report period
-        # For now, we'll just store an empty JSON object
-        self.kpi_results = '{}'
+        # Period totals and the previous period of the same length, from the daily facts
+        Fact = self.env['wms.performance.daily.fact']
+        length = self.period_end - self.period_start
+        previous_end = self.period_start - timedelta(days=1)
+        current = Fact._get_totals(self.period_start, self.period_end, owner=self.owner_id)
+        previous = Fact._get_totals(previous_end - length, previous_end, owner=self.owner_id)
+        self.kpi_results = json.dumps({
+            'current': current,
+            'previous': previous,
+            'trend': {
+                measure: ((value - previous[measure]) / previous[measure] * 100) if previous[measure] else 0.0
+                for measure, value in current.items()
+            },
+        })
 
     def _generate_charts_data(self):
         """Generate charts data for the report"""
-        # This would typically call methods to calculate chart data
-        # For now, we'll just store an empty JSON object
-        self.charts_data = '{}'
+        # Daily series of the period, from the daily facts
+        days = self.env['wms.performance.daily.fact']._get_totals(
+            self.period_start, self.period_end, owner=self.owner_id, by_day=True)
+        self.charts_data = json.dumps({
+            'labels': [fields.Date.to_string(day) for day in sorted(days)],
+            'series': {
+                measure: [days[day][measure] for day in sorted(days)]
+                for measure in ('operation_count', 'outgoing_count', 'on_time_count', 'incident_count')
+            },
+        })
 
     def _generate_alert_summary(self):
         """Generate alert summary for the report"""
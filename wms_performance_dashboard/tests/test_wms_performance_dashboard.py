@@ -290,4 +290,57 @@ class TestWmsPerformanceDashboard(TransactionCase):
         self.assertEqual(widget.size_x, 6)
         self.assertEqual(widget.size_y, 4)
         self.assertEqual(widget.col, 2)
-        self.assertEqual(widget.row, 1)
\ No newline at end of file
+        self.assertEqual(widget.row, 1)
+
+    def test_kpi_grouped_evaluation_and_cache(self):
+        """Test that KPIs are evaluated with aggregates and cached per owner"""
+        picking_vals = {
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+            'location_id': self.env.ref('stock.stock_location_stock').id,
+            'location_dest_id': self.env.ref('stock.stock_location_customers').id,
+            'owner_id': self.test_owner.partner_id.id,
+        }
+        self.env['stock.picking'].create([picking_vals, picking_vals])
+        Kpi = self.env['wms.performance.kpi']
+        count_kpi, percentage_kpi = Kpi.create([{
+            'name': 'Owner Operations',
+            'code': 'OOPS',
+            'category': 'throughput',
+            'calculation_method': 'count',
+            'source_model': 'stock.picking',
+            'owner_id': self.test_owner.id,
+        }, {
+            'name': 'Owner Printed Ratio',
+            'code': 'OPR',
+            'category': 'quality',
+            'calculation_method': 'percentage',
+            'source_model': 'stock.picking',
+            'source_field': 'printed',
+            'condition': "[('state', '!=', 'cancel')]",
+            'owner_id': self.test_owner.id,
+        }])
+        self.assertEqual(count_kpi.current_value, 2.0)
+        self.assertEqual(percentage_kpi.current_value, 0.0)
+
+        # Served from the cache until it expires or the KPI changes
+        self.env['stock.picking'].create(picking_vals)
+        Kpi.invalidate_model()
+        self.assertEqual(count_kpi.current_value, 2.0)
+        count_kpi.condition = "[('state', '!=', 'cancel')]"
+        self.assertEqual(count_kpi.current_value, 3.0)
+
+        # Values cached for other companies are not reused
+        self.env['stock.picking'].create(picking_vals)
+        company = self.env['res.company'].create({'name': 'KPI Cache Company'})
+        Kpi.invalidate_model()
+        self.assertEqual(count_kpi.current_value, 3.0)
+        self.assertEqual(count_kpi.with_company(company).current_value, 4.0)
+
+        template = self.env['wms.dashboard.template'].create({
+            'name': 'Owner Dashboard',
+            'code': 'OD',
+            'dashboard_type': 'operational',
+            'default_owner_id': self.test_owner.id,
+        })
+        values = {kpi['code']: kpi['current_value'] for kpi in template.get_kpi_values()}
+        self.assertEqual(values, {'OOPS': 3.0, 'OPR': 0.0})
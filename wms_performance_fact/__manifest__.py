@@ -0,0 +1,35 @@
+{
+    'name': 'WMS Performance Facts',
+    'version': '18.0.1.0.0',
+    'category': 'Warehouse Management',
+    'summary': 'Daily performance facts for 3PL warehouse dashboards and reports',
+    'description': '''
+        Performance Facts Module
+
+        Materialized daily facts per owner and warehouse, refreshed
+        incrementally by a cron:
+        - Operations by type and processing hours
+        - On-time deliveries
+        - Inventory adjustments
+        - Safety incidents
+
+        Performance KPIs, reports and trends read these facts instead of
+        scanning the operations history.
+    ''',
+    'depends': [
+        'base',
+        'stock',
+        'wms_owner',
+    ],
+    'data': [
+        'security/ir.model.access.csv',
+        'data/performance_fact_cron.xml',
+    ],
+    'demo': [
+    ],
+    'installable': True,
+    'auto_install': False,
+    'application': False,
+    'license': 'LGPL-3',
+    'author': 'genin IT'
+}
@@ -0,0 +1 @@
+from . import performance_fact
\ No newline at end of file
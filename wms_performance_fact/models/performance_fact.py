@@ -0,0 +1,256 @@
+from odoo import models, fields, api
+from collections import defaultdict
+from datetime import datetime, timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Days computed by the first run of the cron
+FACT_BACKFILL_DAYS = 730
+
+# ir.config_parameter keys tracking which days the facts cover
+PARAM_DATE_FROM = 'wms_performance_fact.facts_date_from'
+PARAM_LAST_RUN = 'wms_performance_fact.facts_last_run'
+
+# Additive measures of a daily fact
+FACT_MEASURES = (
+    'incoming_count',
+    'outgoing_count',
+    'internal_count',
+    'operation_count',
+    'processing_hours',
+    'on_time_count',
+    'adjustment_count',
+    'incident_count',
+)
+
+
+class WmsPerformanceDailyFact(models.Model):
+    """
+    Performance Daily Fact - Operations, adjustments and incidents of one day
+    for one owner and warehouse.
+
+    Refreshed incrementally by a cron; KPIs, reports and trends sum the facts
+    of their period instead of scanning pickings, moves and incidents.
+    """
+    _name = 'wms.performance.daily.fact'
+    _description = 'WMS Performance Daily Fact'
+    _order = 'date desc, owner_id, warehouse_id'
+
+    date = fields.Date('Date', required=True, index=True)
+    owner_id = fields.Many2one('wms.owner', 'Owner', required=True, index=True, ondelete='cascade')
+    warehouse_id = fields.Many2one('stock.warehouse', 'Warehouse', ondelete='cascade')
+
+    incoming_count = fields.Integer('Receipts', readonly=True)
+    outgoing_count = fields.Integer('Deliveries', readonly=True)
+    internal_count = fields.Integer('Internal Transfers', readonly=True)
+    operation_count = fields.Integer('Operations', readonly=True)
+    processing_hours = fields.Float('Processing Hours', readonly=True,
+                                    help='Sum of the time between creation and validation of the operations')
+    on_time_count = fields.Integer('On-Time Deliveries', readonly=True)
+    adjustment_count = fields.Integer('Inventory Adjustments', readonly=True)
+    incident_count = fields.Integer('Safety Incidents', readonly=True)
+
+    _sql_constraints = [
+        ('fact_unique', 'unique(date, owner_id, warehouse_id)',
+         'There can be only one performance fact per day, owner and warehouse.'),
+    ]
+
+    @api.model
+    def _get_covered_range(self):
+        """
+        First and last day whose facts are complete, or (None, None). The
+        day of the last run is still open and is never considered covered.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        date_from = params.get_param(PARAM_DATE_FROM)
+        last_run = params.get_param(PARAM_LAST_RUN)
+        if not date_from or not last_run:
+            return None, None
+        return fields.Date.to_date(date_from), fields.Datetime.to_datetime(last_run).date() - timedelta(days=1)
+
+    @api.model
+    def _fetch_fact_values(self, date_from, date_to, owner=None):
+        """
+        Fact values of the days from ``date_from`` to ``date_to`` (included),
+        of ``owner`` when given, aggregated from the live tables with one
+        grouped query per source.
+        """
+        start = datetime.combine(date_from, datetime.min.time())
+        end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+        # owner_id IS NOT NULL for all owners, owner_id = <partner> for one
+        partner_filter, partner_params = ('= %s', [owner.partner_id.id]) if owner else ('IS NOT NULL', [])
+        facts = defaultdict(lambda: dict.fromkeys(FACT_MEASURES, 0))
+        cr = self.env.cr
+
+        self.env['stock.picking'].flush_model(['date', 'date_done', 'scheduled_date', 'state', 'owner_id',
+                                               'picking_type_id'])
+        self.env['stock.picking.type'].flush_model(['code', 'warehouse_id'])
+        cr.execute("""
+            SELECT p.date_done::date, p.owner_id, pt.warehouse_id,
+                   COUNT(*) FILTER (WHERE pt.code = 'incoming'),
+                   COUNT(*) FILTER (WHERE pt.code = 'outgoing'),
+                   COUNT(*) FILTER (WHERE pt.code = 'internal'),
+                   COUNT(*),
+                   COALESCE(SUM(EXTRACT(EPOCH FROM p.date_done - p.date) / 3600.0), 0)::float,
+                   COUNT(*) FILTER (WHERE pt.code = 'outgoing' AND p.date_done <= p.scheduled_date)
+            FROM stock_picking p
+            JOIN stock_picking_type pt ON pt.id = p.picking_type_id
+            WHERE p.state = 'done'
+              AND p.owner_id {partner_filter}
+              AND p.date_done >= %s AND p.date_done < %s
+            GROUP BY 1, 2, 3
+        """.format(partner_filter=partner_filter), partner_params + [start, end])
+        for day, partner_id, warehouse_id, *values in cr.fetchall():
+            facts[(day, partner_id, warehouse_id)].update(zip(
+                ('incoming_count', 'outgoing_count', 'internal_count', 'operation_count',
+                 'processing_hours', 'on_time_count'), values))
+
+        # Inventory adjustments carry the owner on their move
+        self.env['stock.move'].flush_model(['is_inventory', 'state', 'date', 'restrict_partner_id',
+                                            'location_id', 'location_dest_id'])
+        self.env['stock.location'].flush_model(['warehouse_id'])
+        cr.execute("""
+            SELECT m.date::date, m.restrict_partner_id, COALESCE(src.warehouse_id, dest.warehouse_id), COUNT(*)
+            FROM stock_move m
+            JOIN stock_location src ON src.id = m.location_id
+            JOIN stock_location dest ON dest.id = m.location_dest_id
+            WHERE m.is_inventory
+              AND m.state = 'done'
+              AND m.restrict_partner_id {partner_filter}
+              AND m.date >= %s AND m.date < %s
+            GROUP BY 1, 2, 3
+        """.format(partner_filter=partner_filter), partner_params + [start, end])
+        for day, partner_id, warehouse_id, count in cr.fetchall():
+            facts[(day, partner_id, warehouse_id)]['adjustment_count'] = count
+
+        if 'wms.safety.incident' in self.env:
+            self.env['wms.safety.incident'].flush_model(['incident_date', 'owner_id', 'location_id', 'active'])
+            cr.execute("""
+                SELECT i.incident_date::date, o.partner_id, l.warehouse_id, COUNT(*)
+                FROM wms_safety_incident i
+                JOIN wms_owner o ON o.id = i.owner_id
+                LEFT JOIN stock_location l ON l.id = i.location_id
+                WHERE i.active
+                  AND o.partner_id {partner_filter}
+                  AND i.incident_date >= %s AND i.incident_date < %s
+                GROUP BY 1, 2, 3
+            """.format(partner_filter=partner_filter), partner_params + [start, end])
+            for day, partner_id, warehouse_id, count in cr.fetchall():
+                facts[(day, partner_id, warehouse_id)]['incident_count'] = count
+
+        if not facts:
+            return []
+        partner_ids = list({key[1] for key in facts})
+        owners = {
+            owner['partner_id'][0]: owner['id']
+            for owner in self.env['wms.owner'].search_read([('partner_id', 'in', partner_ids)], ['partner_id'])
+        }
+        return [
+            dict(values, date=day, owner_id=owners[partner_id], warehouse_id=warehouse_id or False)
+            for (day, partner_id, warehouse_id), values in facts.items()
+            if partner_id in owners
+        ]
+
+    @api.model
+    def _refresh_days(self, days):
+        """Rebuild the facts of ``days``. Returns the number of facts created."""
+        if not days:
+            return 0
+        days = set(days)
+        self.search([('date', 'in', list(days))]).unlink()
+        vals_list = [vals for vals in self._fetch_fact_values(min(days), max(days)) if vals['date'] in days]
+        self.create(vals_list)
+        return len(vals_list)
+
+    @api.model
+    def _get_days_to_refresh(self, now):
+        """
+        Days to (re)compute: every day since the last run, plus the days of
+        incidents recorded or changed since then (backdated incidents).
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        last_run = params.get_param(PARAM_LAST_RUN)
+        if not last_run:
+            start = now.date() - timedelta(days=FACT_BACKFILL_DAYS)
+            params.set_param(PARAM_DATE_FROM, fields.Date.to_string(start))
+            return [start + timedelta(days=n) for n in range((now.date() - start).days + 1)]
+
+        last_run = fields.Datetime.to_datetime(last_run)
+        days = {last_run.date() + timedelta(days=n) for n in range((now.date() - last_run.date()).days + 1)}
+        if 'wms.safety.incident' in self.env:
+            self.env['wms.safety.incident'].flush_model(['incident_date'])
+            self.env.cr.execute("""
+                SELECT DISTINCT incident_date::date
+                FROM wms_safety_incident
+                WHERE write_date >= %s
+            """, [last_run])
+            date_from = fields.Date.to_date(params.get_param(PARAM_DATE_FROM))
+            days.update(day for day, in self.env.cr.fetchall() if day and day >= date_from)
+        return sorted(days)
+
+    @api.model
+    def _cron_refresh_facts(self):
+        """Incrementally refresh the daily performance facts"""
+        now = fields.Datetime.now()
+        days = self._get_days_to_refresh(now)
+        created = self._refresh_days(days)
+        self.env['ir.config_parameter'].sudo().set_param(PARAM_LAST_RUN, fields.Datetime.to_string(now))
+        _logger.info("Performance facts refreshed for %s day(s), %s fact(s) created", len(days), created)
+        return True
+
+    @api.model
+    def _get_totals(self, date_from, date_to, owner=None, warehouse=None, by_day=False, by_warehouse=False):
+        """
+        Sum of the fact measures from ``date_from`` to ``date_to`` (included)
+        for ``owner`` and ``warehouse`` when given, as ``{measure: value}``.
+        With ``by_day`` and/or ``by_warehouse`` the sums are returned per
+        date, warehouse id or (date, warehouse id).
+
+        Days covered by the cron are read from the stored facts, the other
+        ones (typically today) are aggregated live.
+        """
+        key_fields = (['date'] if by_day else []) + (['warehouse_id'] if by_warehouse else [])
+
+        def make_key(values):
+            key = tuple(values)
+            return key if len(key) > 1 else (key[0] if key else None)
+
+        totals = defaultdict(lambda: dict.fromkeys(FACT_MEASURES, 0))
+        covered_from, covered_to = self._get_covered_range()
+        live_ranges = [(date_from, date_to)]
+
+        if covered_from and covered_from <= date_to and covered_to >= date_from:
+            stored_from, stored_to = max(date_from, covered_from), min(date_to, covered_to)
+            live_ranges = [(date_from, stored_from - timedelta(days=1)), (stored_to + timedelta(days=1), date_to)]
+            domain = [('date', '>=', stored_from), ('date', '<=', stored_to)]
+            if owner:
+                domain.append(('owner_id', '=', owner.id))
+            if warehouse:
+                domain.append(('warehouse_id', '=', warehouse.id))
+            groups = self._read_group(
+                domain,
+                groupby=['date:day' if name == 'date' else name for name in key_fields],
+                aggregates=['%s:sum' % measure for measure in FACT_MEASURES],
+            )
+            for group in groups:
+                key = make_key(
+                    fields.Date.to_date(value) if name == 'date' else value.id
+                    for name, value in zip(key_fields, group)
+                )
+                for measure, value in zip(FACT_MEASURES, group[len(key_fields):]):
+                    totals[key][measure] += value or 0
+
+        for live_from, live_to in live_ranges:
+            if live_from > live_to:
+                continue
+            for vals in self._fetch_fact_values(live_from, live_to, owner=owner):
+                if warehouse and vals['warehouse_id'] != warehouse.id:
+                    continue
+                key = make_key(vals[name] for name in key_fields)
+                for measure in FACT_MEASURES:
+                    totals[key][measure] += vals[measure]
+
+        if key_fields:
+            return dict(totals)
+        return totals[None]
@@ -0,0 +1 @@
+from . import test_performance_fact
\ No newline at end of file
@@ -0,0 +1,71 @@
+from odoo.tests import TransactionCase
+from odoo import fields
+from datetime import timedelta
+
+
+class TestPerformanceFact(TransactionCase):
+    """Test cases for the WMS daily performance facts"""
+
+    def setUp(self):
+        super().setUp()
+        self.Fact = self.env['wms.performance.daily.fact']
+        self.owner = self.env['wms.owner'].create({
+            'name': 'Test Performance Fact Owner',
+            'code': 'TPFO',
+            'is_warehouse_owner': True,
+        })
+        self.warehouse = self.env.ref('stock.warehouse0')
+        self.product = self.env['product.product'].create({
+            'name': 'Test Fact Product',
+            'is_storable': True,
+        })
+
+    def _create_done_picking(self, picking_type, location, location_dest):
+        picking = self.env['stock.picking'].create({
+            'picking_type_id': picking_type.id,
+            'location_id': location.id,
+            'location_dest_id': location_dest.id,
+            'owner_id': self.owner.partner_id.id,
+            'move_ids': [(0, 0, {
+                'name': self.product.name,
+                'product_id': self.product.id,
+                'product_uom_qty': 2.0,
+                'product_uom': self.product.uom_id.id,
+                'location_id': location.id,
+                'location_dest_id': location_dest.id,
+            })],
+        })
+        picking.action_confirm()
+        picking.move_ids.quantity = 2.0
+        picking.button_validate()
+        return picking
+
+    def test_daily_facts_refresh_and_totals(self):
+        """Test that facts are refreshed by day and summed over periods"""
+        stock = self.env.ref('stock.stock_location_stock')
+        self._create_done_picking(self.env.ref('stock.picking_type_in'),
+                                  self.env.ref('stock.stock_location_suppliers'), stock)
+        self._create_done_picking(self.env.ref('stock.picking_type_out'),
+                                  stock, self.env.ref('stock.stock_location_customers'))
+        today = fields.Date.today()
+
+        # Nothing is covered yet: totals are aggregated live
+        totals = self.Fact._get_totals(today, today, owner=self.owner)
+        self.assertEqual(totals['operation_count'], 2)
+        self.assertEqual(totals['incoming_count'], 1)
+        self.assertEqual(totals['outgoing_count'], 1)
+
+        # Once materialized, covered days are read from the facts
+        self.assertEqual(self.Fact._refresh_days([today]), 1)
+        fact = self.Fact.search([('owner_id', '=', self.owner.id), ('date', '=', today)])
+        self.assertEqual(fact.warehouse_id, self.warehouse)
+        self.assertEqual(fact.operation_count, 2)
+        fact.operation_count = 10
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('wms_performance_fact.facts_date_from', str(today - timedelta(days=7)))
+        params.set_param('wms_performance_fact.facts_last_run', '%s 00:00:00' % (today + timedelta(days=1)))
+        totals = self.Fact._get_totals(today - timedelta(days=3), today, owner=self.owner, warehouse=self.warehouse)
+        self.assertEqual(totals['operation_count'], 10)
+
+        by_day = self.Fact._get_totals(today - timedelta(days=3), today, owner=self.owner, by_day=True)
+        self.assertEqual(list(by_day), [today])
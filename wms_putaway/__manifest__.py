@@ -19,6 +19,7 @@
         'views/traceability_report_views.xml',
         'views/wms_traceability_report_line_views.xml',
         'views/stock_lot_traceability_views.xml',
+        'views/stock_picking_views.xml',
         'views/menu_views.xml',
     ],
     'demo': [
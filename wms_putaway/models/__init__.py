@@ -10,4 +10,5 @@ from . import wms_cargo_type
 from . import wms_workzone
 from . import traceability_report
 from . import wms_stock_traceability_report
-from . import stock_lot_traceability
\ No newline at end of file
+from . import stock_lot_traceability
+from . import stock_picking
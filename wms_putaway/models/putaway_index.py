@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+
+class PutawayRuleIndex(object):
+    """
+    In-memory index of active ``wms.putaway.rule`` records.
+
+    Rules are keyed by (owner id, 'product', product id) and
+    (owner id, 'category', category id); owner id is False for general
+    rules. The "Apply In" location is matched on its parent path, which
+    mirrors the ``child_of`` domain used by a rule search, so a lookup does
+    not hit the database.
+    """
+
+    def __init__(self, rules):
+        self._rules = defaultdict(list)
+        for rule in rules:
+            owner_id = rule.owner_id.id or False
+            path = rule.location_in_id.parent_path or ''
+            if rule.product_id:
+                self._rules[(owner_id, 'product', rule.product_id.id)].append((path, rule))
+            if rule.product_category_id:
+                self._rules[(owner_id, 'category', rule.product_category_id.id)].append((path, rule))
+        self._cache = {}
+
+    def get_destinations(self, locations):
+        """ids of the "Put Into" locations of the rules applying under ``locations``"""
+        parent_paths = [location.parent_path or '' for location in locations]
+        destination_ids = set()
+        for rules in self._rules.values():
+            for path, rule in rules:
+                if any(path.startswith(parent_path) for parent_path in parent_paths):
+                    destination_ids.add(rule.location_out_id.id)
+        return destination_ids
+
+    def get_rules(self, owner_id, product, location):
+        """
+        Rules of ``owner_id`` (False for general rules) applying to
+        ``product`` under ``location``, highest priority first.
+        """
+        key = (owner_id or False, product.id, location.id)
+        if key not in self._cache:
+            parent_path = location.parent_path or ''
+            candidates = {}
+            for kind, value in (('product', product.id), ('category', product.categ_id.id)):
+                for path, rule in self._rules.get((owner_id or False, kind, value), []):
+                    if path.startswith(parent_path):
+                        candidates[rule.id] = rule
+            self._cache[key] = sorted(candidates.values(), key=lambda rule: (-rule.priority, rule.id))
+        return self._cache[key]
+
+
+class LocationOccupancy(object):
+    """
+    Snapshot of the content of a set of locations, loaded with a few grouped
+    queries and updated in memory as putaway lines are assigned:
+
+        forecast_weight   current weight plus pending incoming/outgoing lines
+        product_qty       quantity per product
+        total_qty         quantity of all products
+        products          products with a positive quantity
+        packages          packages per package type
+    """
+
+    def __init__(self, env, locations, excluded_sml_ids=None):
+        self.env = env
+        self.forecast_weight = defaultdict(float)
+        self.product_qty = defaultdict(lambda: defaultdict(float))
+        self.total_qty = defaultdict(float)
+        self.products = defaultdict(set)
+        self.packages = defaultdict(lambda: defaultdict(set))
+        self.package_weights = {}
+        self._load(locations, excluded_sml_ids or set())
+
+    def _load(self, locations, excluded_sml_ids):
+        if not locations:
+            return
+        for location, values in locations._get_weight(excluded_sml_ids).items():
+            self.forecast_weight[location.id] = values['forecast_weight']
+
+        groups = self.env['stock.quant']._read_group(
+            [('location_id', 'in', locations.ids)],
+            groupby=['location_id', 'product_id', 'package_id'],
+            aggregates=['quantity:sum'],
+        )
+        for location, product, package, quantity in groups:
+            self.product_qty[location.id][product.id] += quantity
+            self.total_qty[location.id] += quantity
+            if quantity > 0:
+                self.products[location.id].add(product.id)
+                if package:
+                    self.packages[location.id][package.package_type_id.id].add(package.id)
+
+    def load_package_weights(self, packages):
+        """Weight of the pending move lines of each package, in one query"""
+        packages = packages.filtered(lambda package: package.id not in self.package_weights)
+        if not packages:
+            return
+        for package in packages:
+            self.package_weights[package.id] = 0.0
+        groups = self.env['stock.move.line']._read_group(
+            [('result_package_id', 'in', packages.ids), ('state', 'not in', ['done', 'cancel'])],
+            groupby=['result_package_id', 'product_id'],
+            aggregates=['quantity_product_uom:sum'],
+        )
+        for package, product, quantity in groups:
+            self.package_weights[package.id] += quantity * product.weight
+
+    def package_weight(self, package):
+        if package.id not in self.package_weights:
+            self.load_package_weights(package)
+        return self.package_weights[package.id]
+
+    def package_count(self, location, package_type):
+        return len(self.packages[location.id][package_type.id])
+
+    def has_stock(self, location):
+        return bool(self.products[location.id])
+
+    def assign(self, location, product, quantity, package=None):
+        """Account for ``quantity`` of ``product`` being put into ``location``"""
+        if package and package.package_type_id:
+            if package.id not in self.packages[location.id][package.package_type_id.id]:
+                self.forecast_weight[location.id] += self.package_weight(package)
+        else:
+            self.forecast_weight[location.id] += product.weight * quantity
+        self.product_qty[location.id][product.id] += quantity
+        self.total_qty[location.id] += quantity
+        if quantity > 0:
+            self.products[location.id].add(product.id)
+            if package:
+                self.packages[location.id][package.package_type_id.id].add(package.id)
@@ -0,0 +1,63 @@
+from odoo import models, _
+from collections import defaultdict
+
+
+class StockPicking(models.Model):
+    _inherit = 'stock.picking'
+
+    def _get_putaway_plan(self):
+        """
+        Destination plan for all the move lines of the receipts in ``self``.
+
+        Lines are resolved together by wms.putaway.rule._get_putaway_locations,
+        so storage category capacity, owner rules, lot compatibility and the
+        mixing policy take the other lines of the same receipts into account.
+        Returns a dict {stock.move.line: destination location} for the lines
+        a rule applies to.
+        """
+        move_lines = self.move_line_ids.filtered(
+            lambda line: line.state not in ('done', 'cancel') and line.picking_code == 'incoming'
+        ).sorted(lambda line: (line.picking_id.id, line.id))
+        if not move_lines:
+            return {}
+
+        owner_ids = self._get_putaway_owner_ids(move_lines)
+        requests = [{
+            'product': line.product_id,
+            'quantity': line.quantity_product_uom,
+            'location': line.picking_id.location_dest_id,
+            'package': line.result_package_id,
+            'lot': line.lot_id,
+            'owner_id': owner_ids[line.id],
+        } for line in move_lines]
+        destinations = self.env['wms.putaway.rule'].with_context(
+            exclude_sml_ids=set(move_lines.ids)
+        )._get_putaway_locations(requests)
+        return {line: destination for line, destination in zip(move_lines, destinations) if destination}
+
+    def _get_putaway_owner_ids(self, move_lines):
+        """wms.owner id of each of ``move_lines`` as {line id: owner id}, False for the lines without owner"""
+        return {line.id: line.owner_id.id for line in move_lines}
+
+    def _apply_putaway_plan(self, plan):
+        """Write a putaway plan, with one write per destination location"""
+        lines_by_destination = defaultdict(lambda: self.env['stock.move.line'])
+        for line, destination in plan.items():
+            if line.location_dest_id != destination:
+                lines_by_destination[destination] |= line
+        for destination, lines in lines_by_destination.items():
+            lines.write({'location_dest_id': destination.id})
+        return sum(len(lines) for lines in lines_by_destination.values())
+
+    def action_plan_putaway(self):
+        """Plan and apply the putaway of the selected receipts"""
+        updated = self._apply_putaway_plan(self._get_putaway_plan())
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Putaway Planned'),
+                'message': _('%s move line(s) assigned to a putaway location.') % updated,
+                'type': 'success',
+            }
+        }
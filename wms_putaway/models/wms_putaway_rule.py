@@ -1,5 +1,7 @@
 from odoo import models, fields, api
 
+from .putaway_index import LocationOccupancy, PutawayRuleIndex
+
 
 class WmsPutawayRule(models.Model):
     _name = 'wms.putaway.rule'
@@ -26,72 +28,100 @@ class WmsPutawayRule(models.Model):
     )
 
     @api.model
-    def _get_putaway_strategy(self, product, quantity, location, package=None, from_move_id=None, lot=None):
-        """Enhanced to include native Odoo storage categories with 3PL-specific logic and lot tracking"""
-
-        # First try to find a specific rule for the owner with storage category
-        if self.env.context.get('current_owner_id'):
-            owner_id = self.env.context.get('current_owner_id')
-            domain = [
-                ('owner_id', '=', owner_id),
-                '|',
-                ('product_id', '=', product.id),
-                ('product_category_id', '=', product.categ_id.id),
-                ('location_in_id', 'child_of', location.id),
-                ('active', '=', True)
-            ]
-            rules = self.search(domain, order='priority desc')
-            for rule in rules:
-                # Check if the destination location has storage category restrictions
+    def _get_putaway_strategy(self, product, quantity, location, package=None, from_move_id=None, lot=None,
+                              index=None, occupancy=None):
+        """Enhanced to include native Odoo storage categories with 3PL-specific logic and lot tracking
+
+        ``index`` (PutawayRuleIndex) and ``occupancy`` (LocationOccupancy) can be
+        shared by the callers resolving several lines, see _get_putaway_locations.
+        When omitted they are built for this single product.
+        """
+        owner_id = self.env.context.get('current_owner_id')
+        if index is None:
+            index = self._get_rule_index(product)
+        if occupancy is None:
+            occupancy = self._get_location_occupancy(index, [location])
+
+        # First try to find a specific rule for the owner, then general rules
+        owner_ids = [owner_id, False] if owner_id else [False]
+        for rule_owner_id in owner_ids:
+            for rule in index.get_rules(rule_owner_id, product, location):
                 if rule.storage_category_id:
                     # Use native Odoo logic to check storage category compatibility
-                    if self._is_storage_category_compatible(
-                        rule.location_out_id, product, quantity, package, rule.storage_category_id
+                    if not self._is_storage_category_compatible(
+                        rule.location_out_id, product, quantity, package, rule.storage_category_id,
+                        occupancy=occupancy
                     ):
-                        # Additional check for lot compatibility if lot is provided
-                        if lot and rule._check_lot_compatibility(lot, rule.location_out_id):
-                            return rule.location_out_id
-                        elif not lot:
-                            return rule.location_out_id
-                else:
-                    # Use original logic for backward compatibility
-                    if self._location_has_capacity(rule.location_out_id, product, quantity, rule.max_capacity):
-                        # Additional check for lot compatibility if lot is provided
-                        if lot and rule._check_lot_compatibility(lot, rule.location_out_id):
-                            return rule.location_out_id
-                        elif not lot:
-                            return rule.location_out_id
-
-        # Then try general rules with storage categories
-        domain = [
-            ('owner_id', '=', False),
-            '|',
-            ('product_id', '=', product.id),
-            ('product_category_id', '=', product.categ_id.id),
-            ('location_in_id', 'child_of', location.id),
-            ('active', '=', True)
-        ]
-        rules = self.search(domain, order='priority desc')
-        for rule in rules:
-            if rule.storage_category_id:
-                if self._is_storage_category_compatible(
-                    rule.location_out_id, product, quantity, package, rule.storage_category_id
+                        continue
+                # Use original logic for backward compatibility
+                elif not self._location_has_capacity(
+                    rule.location_out_id, product, quantity, rule.max_capacity, occupancy=occupancy
                 ):
-                    # Additional check for lot compatibility if lot is provided
-                    if lot and rule._check_lot_compatibility(lot, rule.location_out_id):
-                        return rule.location_out_id
-                    elif not lot:
-                        return rule.location_out_id
-            else:
-                if self._location_has_capacity(rule.location_out_id, product, quantity, rule.max_capacity):
-                    # Additional check for lot compatibility if lot is provided
-                    if lot and rule._check_lot_compatibility(lot, rule.location_out_id):
-                        return rule.location_out_id
-                    elif not lot:
-                        return rule.location_out_id
+                    continue
+                # Additional check for lot compatibility if lot is provided
+                if lot and not rule._check_lot_compatibility(lot, rule.location_out_id):
+                    continue
+                return rule.location_out_id
 
         return False
 
+    @api.model
+    def _get_rule_index(self, products=None):
+        """Index of the active rules, restricted to ``products`` when given"""
+        domain = [('active', '=', True)]
+        if products:
+            domain += [
+                '|',
+                ('product_id', 'in', products.ids),
+                ('product_category_id', 'in', products.categ_id.ids),
+            ]
+        return PutawayRuleIndex(self.search(domain))
+
+    @api.model
+    def _get_location_occupancy(self, index, locations):
+        """Occupancy snapshot of every "Put Into" location the rules of ``index`` can return"""
+        destinations = self.env['stock.location'].browse(list(index.get_destinations(locations)))
+        return LocationOccupancy(self.env, destinations, self.env.context.get('exclude_sml_ids', set()))
+
+    @api.model
+    def _get_putaway_locations(self, requests):
+        """
+        Resolve putaway for many lines in one pass.
+
+        ``requests`` is a list of dicts with keys product, quantity, location
+        and optionally package, lot and owner_id (wms.owner id, defaults to the
+        ``current_owner_id`` context key). The rules are indexed and the
+        occupancy of their destinations loaded once; each resolved line is
+        accounted for in the occupancy before the next one is resolved.
+
+        Returns the list of destination locations (False when no rule
+        applies), in the order of ``requests``.
+        """
+        if not requests:
+            return []
+        products = self.env['product.product'].union(*[request['product'] for request in requests])
+        index = self._get_rule_index(products)
+        locations = self.env['stock.location'].union(*[request['location'] for request in requests])
+        occupancy = self._get_location_occupancy(index, locations)
+        packages = self.env['stock.quant.package'].union(*[
+            request['package'] for request in requests if request.get('package')
+        ])
+        occupancy.load_package_weights(packages)
+
+        default_owner_id = self.env.context.get('current_owner_id')
+        results = []
+        for request in requests:
+            owner_id = request.get('owner_id') or default_owner_id
+            destination = self.with_context(current_owner_id=owner_id)._get_putaway_strategy(
+                request['product'], request['quantity'], request['location'],
+                package=request.get('package'), lot=request.get('lot'),
+                index=index, occupancy=occupancy,
+            )
+            if destination:
+                occupancy.assign(destination, request['product'], request['quantity'], request.get('package'))
+            results.append(destination)
+        return results
+
     def _check_lot_compatibility(self, lot, location):
         """Check if a specific lot is compatible with this location considering 3PL requirements"""
         # Check if lot belongs to the same owner as the location (if owner is specified)
@@ -106,21 +136,20 @@ class WmsPutawayRule(models.Model):
         # Check if location can accommodate this specific lot
         return True
 
-    def _is_storage_category_compatible(self, location, product, quantity, package, storage_category):
+    def _is_storage_category_compatible(self, location, product, quantity, package, storage_category,
+                                        occupancy=None):
         """Check if location with storage category can accept the product/package"""
+        if occupancy is None:
+            occupancy = LocationOccupancy(self.env, location, self.env.context.get('exclude_sml_ids', set()))
+
         # Check max weight if applicable
         if storage_category.max_weight > 0:
-            forecast_weight = location._get_weight(self.env.context.get('exclude_sml_ids', set()))[location]['forecast_weight']
-            product_weight = product.weight
+            forecast_weight = occupancy.forecast_weight[location.id]
             if package and package.package_type_id:
-                # For packages, get total weight of packages in location
-                package_smls = self.env['stock.move.line'].search([
-                    ('result_package_id', '=', package.id),
-                    ('state', 'not in', ['done', 'cancel'])
-                ])
-                total_weight = forecast_weight + sum(
-                    sml.quantity_product_uom * sml.product_id.weight for sml in package_smls
-                )
+                # For packages, add the weight of the package content unless already counted
+                total_weight = forecast_weight
+                if package.id not in occupancy.packages[location.id][package.package_type_id.id]:
+                    total_weight += occupancy.package_weight(package)
             else:
                 total_weight = forecast_weight + (product.weight * quantity)
 
@@ -133,9 +162,7 @@ class WmsPutawayRule(models.Model):
                 lambda pc: pc.package_type_id == package.package_type_id
             )
             if package_capacity:
-                current_count = len(location.quant_ids.filtered(
-                    lambda q: q.package_id and q.package_id.package_type_id == package.package_type_id
-                ))
+                current_count = occupancy.package_count(location, package.package_type_id)
                 if current_count >= package_capacity.quantity:
                     return False
         elif storage_category.product_capacity_ids:
@@ -143,31 +170,27 @@ class WmsPutawayRule(models.Model):
                 lambda pc: pc.product_id == product
             )
             if product_capacity:
-                current_qty = sum(location.quant_ids.filtered(
-                    lambda q: q.product_id == product
-                ).mapped('quantity'))
+                current_qty = occupancy.product_qty[location.id][product.id]
                 if current_qty >= product_capacity.quantity:
                     return False
 
         # Check product mixing policy
         if storage_category.allow_new_product == 'empty':
-            if location.quant_ids.filtered(lambda q: q.quantity > 0):
+            if occupancy.has_stock(location):
                 return False
         elif storage_category.allow_new_product == 'same':
-            existing_products = location.quant_ids.filtered(lambda q: q.quantity > 0).mapped('product_id')
-            if existing_products and product not in existing_products:
+            existing_products = occupancy.products[location.id]
+            if existing_products and product.id not in existing_products:
                 return False
 
         return True
 
-    def _location_has_capacity(self, location, product, quantity, max_capacity):
+    def _location_has_capacity(self, location, product, quantity, max_capacity, occupancy=None):
         """Check if location has capacity based on custom max_capacity field"""
         if max_capacity and max_capacity > 0:
-            # Check current capacity usage for this location
-            current_quants = self.env['stock.quant'].search([
-                ('location_id', '=', location.id),
-                ('product_id', '!=', product.id)  # Different from the product we're checking
-            ])
-            current_count = sum(quant.quantity for quant in current_quants)
+            if occupancy is None:
+                occupancy = LocationOccupancy(self.env, location)
+            # Current capacity usage of products different from the one we're checking
+            current_count = occupancy.total_qty[location.id] - occupancy.product_qty[location.id][product.id]
             return (current_count + 1) <= max_capacity  # Simplified capacity check
-        return True
\ No newline at end of file
+        return True
@@ -131,4 +131,132 @@ class TestWmsPutaway(TransactionCase):
         })
 
         self.assertNotEqual(rule1.owner_id.id, rule2.owner_id.id)
-        self.assertNotEqual(rule1.abc_classification, rule2.abc_classification)
\ No newline at end of file
+        self.assertNotEqual(rule1.abc_classification, rule2.abc_classification)
+
+    def test_putaway_locations_batch_uses_occupancy(self):
+        """Test that batch putaway accounts for lines already assigned"""
+        stock = self.env.ref('stock.stock_location_stock')
+        category = self.env['stock.storage.category'].create({
+            'name': 'Empty Bins Only',
+            'allow_new_product': 'empty',
+        })
+        bin_1 = self.env['stock.location'].create({'name': 'Bin 1', 'location_id': stock.id})
+        bin_2 = self.env['stock.location'].create({'name': 'Bin 2', 'location_id': stock.id})
+        product_2 = self.env['product.product'].create({
+            'name': 'Second Product',
+            'type': 'product',
+            'categ_id': self.test_product.categ_id.id,
+        })
+        Rule = self.env['wms.putaway.rule']
+        for destination, priority in ((bin_1, 20), (bin_2, 10)):
+            Rule.create({
+                'name': 'Rule %s' % destination.name,
+                'product_category_id': self.test_product.categ_id.id,
+                'location_in_id': stock.id,
+                'location_out_id': destination.id,
+                'storage_category_id': category.id,
+                'priority': priority,
+            })
+
+        # Single line resolution picks the highest priority bin
+        self.assertEqual(Rule._get_putaway_strategy(self.test_product, 1.0, stock), bin_1)
+
+        destinations = Rule._get_putaway_locations([
+            {'product': self.test_product, 'quantity': 1.0, 'location': stock},
+            {'product': product_2, 'quantity': 1.0, 'location': stock},
+        ])
+        self.assertEqual(destinations, [bin_1, bin_2])
+
+    def test_picking_putaway_plan(self):
+        """Test planning the putaway of a whole receipt"""
+        stock = self.env.ref('stock.stock_location_stock')
+        category = self.env['stock.storage.category'].create({
+            'name': 'Single Product Bins',
+            'allow_new_product': 'empty',
+        })
+        bins = self.env['stock.location']
+        Rule = self.env['wms.putaway.rule']
+        for name, priority in (('Bin A', 20), ('Bin B', 10)):
+            bin_location = self.env['stock.location'].create({'name': name, 'location_id': stock.id})
+            bins |= bin_location
+            Rule.create({
+                'name': 'Rule %s' % name,
+                'product_category_id': self.test_product.categ_id.id,
+                'location_in_id': stock.id,
+                'location_out_id': bin_location.id,
+                'storage_category_id': category.id,
+                'priority': priority,
+            })
+        product_2 = self.env['product.product'].create({
+            'name': 'Second Product',
+            'type': 'product',
+            'categ_id': self.test_product.categ_id.id,
+        })
+
+        receipt = self.env['stock.picking'].create({
+            'picking_type_id': self.env.ref('stock.picking_type_in').id,
+            'location_id': self.env.ref('stock.stock_location_suppliers').id,
+            'location_dest_id': stock.id,
+            'move_ids': [(0, 0, {
+                'name': product.name,
+                'product_id': product.id,
+                'product_uom_qty': 5.0,
+                'product_uom': product.uom_id.id,
+                'location_id': self.env.ref('stock.stock_location_suppliers').id,
+                'location_dest_id': stock.id,
+            }) for product in (self.test_product, product_2)],
+        })
+        receipt.action_confirm()
+
+        plan = receipt._get_putaway_plan()
+        self.assertEqual(len(plan), 2)
+        # Both lines cannot share the same empty bin
+        self.assertEqual(set(location.id for location in plan.values()), set(bins.ids))
+
+        receipt.action_plan_putaway()
+        self.assertEqual(receipt.move_line_ids.location_dest_id, bins)
+
+    def test_picking_putaway_plan_owner_rules(self):
+        """Test that owned receipt lines follow the rules of their owner"""
+        stock = self.env.ref('stock.stock_location_stock')
+        suppliers = self.env.ref('stock.stock_location_suppliers')
+        owner_bin = self.env['stock.location'].create({'name': 'Owner Bin', 'location_id': stock.id})
+        general_bin = self.env['stock.location'].create({'name': 'General Bin', 'location_id': stock.id})
+        Rule = self.env['wms.putaway.rule']
+        Rule.create({
+            'name': 'General Rule',
+            'product_id': self.test_product.id,
+            'location_in_id': stock.id,
+            'location_out_id': general_bin.id,
+            'priority': 20,
+        })
+        Rule.create({
+            'name': 'Owner Rule',
+            'owner_id': self.test_owner.id,
+            'product_id': self.test_product.id,
+            'location_in_id': stock.id,
+            'location_out_id': owner_bin.id,
+            'priority': 10,
+        })
+
+        receipt = self.env['stock.picking'].create({
+            'picking_type_id': self.env.ref('stock.picking_type_in').id,
+            'location_id': suppliers.id,
+            'location_dest_id': stock.id,
+            'move_ids': [(0, 0, {
+                'name': self.test_product.name,
+                'product_id': self.test_product.id,
+                'product_uom_qty': 5.0,
+                'product_uom': self.test_product.uom_id.id,
+                'location_id': suppliers.id,
+                'location_dest_id': stock.id,
+                'owner_id': owner.id,
+            }) for owner in (self.test_owner, self.env['wms.owner'])],
+        })
+        receipt.action_confirm()
+
+        plan = receipt._get_putaway_plan()
+        owned_line = receipt.move_line_ids.filtered('owner_id')
+        self.assertEqual(owned_line.owner_id, self.test_owner)
+        self.assertEqual(plan[owned_line], owner_bin)
+        self.assertEqual(plan[receipt.move_line_ids - owned_line], general_bin)
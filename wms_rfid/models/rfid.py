@@ -1,11 +1,21 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
+from odoo.tools import split_every
 import json
 from datetime import datetime, timedelta
 import logging
 
+from .rfid_ingest import collapse_reads, normalize_read
+from .rfid_reconcile import count_tags, reconcile_counts
+
 _logger = logging.getLogger(__name__)
 
+# Transactions created per ORM batch by the read ingestion
+RFID_CREATE_BATCH = 1000
+
+# Tag fields kept in the UID index
+RFID_INDEX_FIELDS = ('rfid_uid', 'active', 'product_id', 'location_id', 'lot_id')
+
 class WmsRfidTag(models.Model):
     """
     RFID Tag - RFID tags used in the warehouse
@@ -70,6 +80,36 @@ class WmsRfidTag(models.Model):
 
     notes = fields.Text('Notes')
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        tags = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return tags
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(name in vals for name in RFID_INDEX_FIELDS):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_uid_index(self):
+        """
+        Active tags by RFID UID as ``{uid: (tag id, product id, location id,
+        lot id)}``, cached until a tag is created, modified or deleted.
+        """
+        index = {}
+        for tag in self.sudo().search_read([('rfid_uid', '!=', False)],
+                                           ['rfid_uid', 'product_id', 'location_id', 'lot_id'], load=None):
+            index[tag['rfid_uid'].strip()] = (tag['id'], tag['product_id'], tag['location_id'], tag['lot_id'])
+        return index
+
     @api.depends('current_load', 'capacity')
     def _compute_utilization_rate(self):
         for tag in self:
@@ -122,6 +162,22 @@ class WmsRfidTag(models.Model):
                 'status': 'damaged',
             })
 
+    @api.model
+    def _update_last_scanned(self, scan_times):
+        """Set ``last_scanned`` of the tags ``{tag id: datetime}`` with a single UPDATE"""
+        if not scan_times:
+            return
+        self.flush_model(['last_scanned'])
+        values = ', '.join(['(%s::int, %s::timestamp)'] * len(scan_times))
+        params = [value for item in scan_times.items() for value in item]
+        self.env.cr.execute("""
+            UPDATE wms_rfid_tag t
+            SET last_scanned = v.scanned
+            FROM (VALUES {values}) AS v(id, scanned)
+            WHERE t.id = v.id AND (t.last_scanned IS NULL OR t.last_scanned < v.scanned)
+        """.format(values=values), params)
+        self.browse(list(scan_times)).invalidate_recordset(['last_scanned'])
+
 
 class WmsRfidReader(models.Model):
     """
@@ -181,6 +237,8 @@ class WmsRfidReader(models.Model):
     integration_enabled = fields.Boolean('Integration Enabled', default=True)
     auto_scan_enabled = fields.Boolean('Auto Scan Enabled', default=False)
     scan_interval = fields.Integer('Auto Scan Interval (seconds)', default=30)
+    dedup_window = fields.Integer('Deduplication Window (seconds)', default=5,
+                                  help='Repeated reads of a tag within this window are recorded as one transaction')
 
     # Traceability
     installation_date = fields.Date('Installation Date')
@@ -215,6 +273,90 @@ class WmsRfidReader(models.Model):
             # In a real implementation, this would call the RFID reader API
             _logger.info(f"Scanning for tags with reader: {reader.name}")
 
+    def ingest_reads(self, reads, transaction_type='read'):
+        """
+        Record a batch of raw reads of the reader, e.g. as pushed by a dock
+        door portal. ``reads`` is a list of dicts with ``uid``, ``rssi``,
+        ``antenna`` and ``timestamp`` (see ``normalize_read``).
+
+        Repeated reads of a tag within the deduplication window, including
+        the last transaction already recorded, are collapsed into one
+        transaction; tags are resolved through the cached UID index and the
+        transactions are created in batches, without chatter. Returns the
+        counts of received, duplicate and unknown reads and created
+        transactions.
+        """
+        self.ensure_one()
+        normalized = [read for read in map(normalize_read, reads) if read]
+        bursts = collapse_reads(normalized, self.dedup_window)
+        result = {'received': len(reads), 'duplicates': len(normalized) - len(bursts), 'unknown': 0, 'created': 0}
+        if not bursts:
+            return result
+
+        # Bursts continuing the last recorded transaction of their tag
+        window = timedelta(seconds=self.dedup_window)
+        last_recorded = self._get_last_transaction_times({burst['uid'] for burst in bursts},
+                                                         min(burst['timestamp'] for burst in bursts) - window)
+        new_bursts = []
+        for burst in bursts:
+            last = last_recorded.get(burst['uid'])
+            if last and burst['timestamp'] - last < window:
+                result['duplicates'] += 1
+                continue
+            new_bursts.append(burst)
+
+        uid_index = self.env['wms.rfid.tag']._get_uid_index()
+        vals_list = []
+        last_scanned = {}
+        for burst in new_bursts:
+            tag = uid_index.get(burst['uid'])
+            if not tag:
+                result['unknown'] += 1
+                continue
+            tag_id, product_id, location_id, lot_id = tag
+            last_scanned[tag_id] = max(last_scanned.get(tag_id, burst['last_seen']), burst['last_seen'])
+            vals_list.append({
+                'transaction_type': transaction_type,
+                'tag_id': tag_id,
+                'reader_id': self.id,
+                'rfid_uid': burst['uid'],
+                'timestamp': burst['timestamp'],
+                'source_location_id': self.location_id.id or location_id,
+                'product_id': product_id,
+                'lot_id': lot_id,
+                'raw_data': json.dumps({
+                    'rssi': burst['rssi'],
+                    'antenna': burst['antenna'],
+                    'reads': burst['count'],
+                    'last_seen': fields.Datetime.to_string(burst['last_seen']),
+                }),
+            })
+
+        if vals_list:
+            # One sequence number per batch, suffixed per transaction
+            prefix = self.env['ir.sequence'].next_by_code('wms.rfid.transaction') or self.code
+            for position, vals in enumerate(vals_list, start=1):
+                vals['name'] = '%s/%s' % (prefix, position)
+            Transaction = self.env['wms.rfid.transaction'].with_context(
+                tracking_disable=True, mail_create_nolog=True, mail_notrack=True)
+            for batch in split_every(RFID_CREATE_BATCH, vals_list, list):
+                Transaction.create(batch)
+            result['created'] = len(vals_list)
+            self.env['wms.rfid.tag']._update_last_scanned(last_scanned)
+        return result
+
+    def _get_last_transaction_times(self, uids, since):
+        """Time of the last transaction of the reader per UID, after ``since``"""
+        self.ensure_one()
+        self.env['wms.rfid.transaction'].flush_model(['reader_id', 'rfid_uid', 'timestamp'])
+        self.env.cr.execute("""
+            SELECT rfid_uid, MAX(timestamp)
+            FROM wms_rfid_transaction
+            WHERE reader_id = %s AND rfid_uid IN %s AND timestamp >= %s
+            GROUP BY rfid_uid
+        """, [self.id, tuple(uids), since])
+        return dict(self.env.cr.fetchall())
+
 
 class WmsRfidTransaction(models.Model):
     """
@@ -284,11 +426,12 @@ class WmsRfidTransaction(models.Model):
 
     notes = fields.Text('Notes')
 
-    @api.model
-    def create(self, vals):
-        if vals.get('name', _('New')) == _('New'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('wms.rfid.transaction') or _('New')
-        return super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('name', _('New')) == _('New'):
+                vals['name'] = self.env['ir.sequence'].next_by_code('wms.rfid.transaction') or _('New')
+        return super().create(vals_list)
 
     def action_verify_transaction(self):
         """Verify the RFID transaction"""
@@ -384,11 +527,93 @@ class WmsRfidInventory(models.Model):
     def _calculate_results(self):
         """Calculate inventory results"""
         for inventory in self:
-            # This would calculate actual results based on RFID scanned data
-            # For now, we'll set dummy values
-            inventory.items_counted = 0  # Would be calculated from RFID transactions
-            inventory.discrepancies_found = 0  # Would be calculated from comparison
-            inventory.accuracy_rate = 100.0  # Would be calculated from accuracy
+            inventory.write(inventory._reconcile())
+
+    def _get_count_locations(self):
+        """Locations covered by the count"""
+        self.ensure_one()
+        if self.include_sublocations:
+            return self.env['stock.location'].search([('id', 'child_of', self.location_id.id)])
+        return self.location_id
+
+    def _get_read_tag_ids(self, locations):
+        """Tags read in ``locations`` during the count, by its readers if any"""
+        self.ensure_one()
+        self.env['wms.rfid.transaction'].flush_model(['tag_id', 'reader_id', 'timestamp', 'source_location_id'])
+        query = """
+            SELECT DISTINCT tag_id
+            FROM wms_rfid_transaction
+            WHERE timestamp >= %s AND timestamp <= %s
+              AND source_location_id IN %s
+        """
+        params = [self.date_start, self.date_end or fields.Datetime.now(), tuple(locations.ids)]
+        if self.reader_ids:
+            query += " AND reader_id IN %s"
+            params.append(tuple(self.reader_ids.ids))
+        self.env.cr.execute(query, params)
+        return {tag_id for tag_id, in self.env.cr.fetchall()}
+
+    def _get_expected_quantities(self, locations, excluded_product_ids):
+        """Quantities on hand per (product id, lot id) in ``locations``"""
+        self.ensure_one()
+        domain = [('location_id', 'in', locations.ids)]
+        if not self.count_zero:
+            domain.append(('quantity', '>', 0))
+        if self.owner_id:
+            domain.append(('owner_id', '=', self.owner_id.partner_id.id))
+        if excluded_product_ids:
+            domain.append(('product_id', 'not in', list(excluded_product_ids)))
+        groups = self.env['stock.quant']._read_group(
+            domain, groupby=['product_id', 'lot_id'], aggregates=['quantity:sum'])
+        return {(product.id, lot.id or False): quantity for product, lot, quantity in groups}
+
+    def _reconcile(self):
+        """
+        Reconcile the tags read during the count with the expected content of
+        the counted locations, with set operations over one load of each
+        side:
+
+        - product tags count for one unit of their product and lot, and are
+          compared to the quantities of the quants;
+        - other tags (pallets, containers...) are compared to the tags
+          assigned to the counted locations, a missing or unexpected tag
+          being one discrepancy.
+
+        Returns the values of the result fields.
+        """
+        self.ensure_one()
+        locations = self._get_count_locations()
+        excluded_product_ids = set(self.excluded_product_ids.ids) if self.exclude_products else set()
+        read_tag_ids = self._get_read_tag_ids(locations)
+
+        tags = self.env['wms.rfid.tag'].search_read(
+            ['|', ('id', 'in', list(read_tag_ids)), ('location_id', 'in', locations.ids)],
+            ['product_id', 'lot_id', 'location_id'], load=None)
+        tag_index = {tag['id']: (tag['product_id'], tag['lot_id']) for tag in tags}
+        location_ids = set(locations.ids)
+        assigned_tag_ids = {
+            tag['id'] for tag in tags if not tag['product_id'] and tag['location_id'] in location_ids
+        }
+
+        counted, other_read_tag_ids = count_tags(read_tag_ids, tag_index, excluded_product_ids)
+        expected = self._get_expected_quantities(locations, excluded_product_ids)
+        lines, discrepancies = reconcile_counts(expected, counted)
+
+        tag_lines = other_read_tag_ids | assigned_tag_ids
+        tag_discrepancies = other_read_tag_ids ^ assigned_tag_ids
+        total_lines = lines + len(tag_lines)
+        total_discrepancies = len(discrepancies) + len(tag_discrepancies)
+
+        products = self.env['product.product'].browse({product_id for product_id, lot_id in discrepancies})
+        prices = {product.id: product.standard_price for product in products}
+        return {
+            'items_counted': sum(counted.values()) + len(other_read_tag_ids),
+            'discrepancies_found': total_discrepancies,
+            'accuracy_rate': (total_lines - total_discrepancies) / total_lines * 100 if total_lines else 100.0,
+            'variance_value': sum(
+                difference * prices[product_id] for (product_id, lot_id), difference in discrepancies.items()
+            ),
+        }
 
     def action_generate_report(self):
         """Generate inventory report"""
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta, timezone
+
+from odoo import fields
+
+
+def normalize_read(read):
+    """
+    Raw reader read as ``(uid, timestamp, rssi, antenna)``. The read is a
+    dict with ``uid`` (or ``rfid_uid``), ``timestamp`` (datetime, server
+    formatted string or UTC epoch seconds), ``rssi`` and ``antenna``.
+    Returns None for reads without UID.
+    """
+    uid = (read.get('uid') or read.get('rfid_uid') or '').strip()
+    if not uid:
+        return None
+    timestamp = read.get('timestamp')
+    if isinstance(timestamp, (int, float)):
+        timestamp = datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+    else:
+        timestamp = fields.Datetime.to_datetime(timestamp) or fields.Datetime.now()
+    rssi = read.get('rssi')
+    return uid, timestamp, float(rssi) if rssi is not None else None, read.get('antenna')
+
+
+def collapse_reads(reads, window):
+    """
+    Collapse the repeated reads of a tag: reads of the same UID less than
+    ``window`` seconds after the first read of their burst are folded into
+    it. ``reads`` are normalized reads, in any order.
+
+    Returns one dict per burst (uid, timestamp, last_seen, rssi, antenna,
+    count), ``rssi`` and ``antenna`` being those of the strongest read.
+    """
+    window = timedelta(seconds=window)
+    bursts = []
+    open_bursts = {}
+    for uid, timestamp, rssi, antenna in sorted(reads, key=lambda read: read[1]):
+        burst = open_bursts.get(uid)
+        if burst is None or timestamp - burst['timestamp'] >= window:
+            burst = open_bursts[uid] = {
+                'uid': uid,
+                'timestamp': timestamp,
+                'last_seen': timestamp,
+                'rssi': rssi,
+                'antenna': antenna,
+                'count': 0,
+            }
+            bursts.append(burst)
+        burst['count'] += 1
+        burst['last_seen'] = timestamp
+        if rssi is not None and (burst['rssi'] is None or rssi > burst['rssi']):
+            burst['rssi'] = rssi
+            burst['antenna'] = antenna
+    return bursts
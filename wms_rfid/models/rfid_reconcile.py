@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+
+def reconcile_counts(expected, counted, precision=1e-6):
+    """
+    Diff a cycle count.
+
+    ``expected`` and ``counted`` map a key (e.g. (product id, lot id)) to a
+    quantity. Every key of either side is a count line; returns
+    ``(lines, discrepancies)`` where ``discrepancies`` maps the keys whose
+    counted quantity differs from the expected one to ``counted - expected``.
+    """
+    keys = set(expected) | set(counted)
+    discrepancies = {}
+    for key in keys:
+        difference = counted.get(key, 0.0) - expected.get(key, 0.0)
+        if abs(difference) > precision:
+            discrepancies[key] = difference
+    return len(keys), discrepancies
+
+
+def count_tags(tag_ids, tag_index, excluded_product_ids=()):
+    """
+    Quantities per (product id, lot id) of the product tags ``tag_ids``,
+    each tag counting for one unit, and the ids of the tags without product.
+    ``tag_index`` maps a tag id to its (product id, lot id).
+    """
+    counted = Counter()
+    other_tags = set()
+    for tag_id in tag_ids:
+        product_id, lot_id = tag_index.get(tag_id, (None, None))
+        if not product_id:
+            other_tags.add(tag_id)
+        elif product_id not in excluded_product_ids:
+            counted[(product_id, lot_id or False)] += 1
+    return counted, other_tags
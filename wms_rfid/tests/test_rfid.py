@@ -1,4 +1,5 @@
 from odoo.tests import TransactionCase, tagged
+from odoo import fields
 from odoo.exceptions import ValidationError
 from datetime import datetime, timedelta
 import json
@@ -481,7 +482,80 @@ class TestWmsRfid(TransactionCase):
         # Call the calculation method
         inventory._calculate_results()
 
-        # After calculation, should still be default values (as method is currently dummy)
+        # Nothing is expected in the location and no tag was read: no line to reconcile
         self.assertEqual(inventory.items_counted, 0)
         self.assertEqual(inventory.discrepancies_found, 0)
-        self.assertEqual(inventory.accuracy_rate, 100.0)  # Method sets this to 100.0
\ No newline at end of file
+        self.assertEqual(inventory.accuracy_rate, 100.0)  # 100% as there is no discrepancy
+
+    def test_rfid_reader_ingest_reads(self):
+        """Test bulk ingestion of raw reads with deduplication"""
+        self.rfid_reader.dedup_window = 5
+        start = datetime(2024, 1, 1, 8, 0, 0)
+        reads = [
+            {'uid': '123456789ABC', 'rssi': -60, 'antenna': 1, 'timestamp': start},
+            {'uid': '123456789ABC', 'rssi': -40, 'antenna': 2, 'timestamp': start + timedelta(seconds=1)},
+            {'uid': '123456789ABC', 'rssi': -70, 'antenna': 1, 'timestamp': start + timedelta(seconds=3)},
+            # A new burst once the window has elapsed
+            {'uid': '123456789ABC', 'rssi': -50, 'antenna': 3, 'timestamp': start + timedelta(seconds=6)},
+            {'uid': 'UNKNOWN_UID', 'rssi': -50, 'antenna': 1, 'timestamp': start},
+            {'uid': '', 'timestamp': start},
+        ]
+        result = self.rfid_reader.ingest_reads(reads)
+        self.assertEqual(result, {'received': 6, 'duplicates': 2, 'unknown': 1, 'created': 2})
+
+        transactions = self.WmsRfidTransaction.search([('reader_id', '=', self.rfid_reader.id)], order='timestamp')
+        self.assertEqual(len(transactions), 2)
+        self.assertEqual(transactions.tag_id, self.rfid_tag)
+        self.assertEqual(transactions[0].product_id, self.product1)
+        self.assertEqual(json.loads(transactions[0].raw_data)['antenna'], 2)
+        self.assertEqual(json.loads(transactions[0].raw_data)['reads'], 3)
+        self.assertEqual(self.rfid_tag.last_scanned, start + timedelta(seconds=6))
+
+        # Reads continuing the last recorded transaction are duplicates
+        result = self.rfid_reader.ingest_reads([
+            {'uid': '123456789ABC', 'rssi': -45, 'antenna': 1, 'timestamp': start + timedelta(seconds=8)},
+        ])
+        self.assertEqual(result['duplicates'], 1)
+        self.assertEqual(result['created'], 0)
+
+    def test_rfid_inventory_reconciliation(self):
+        """Test reconciliation of the tags read with the expected stock"""
+        self.env['stock.quant']._update_available_quantity(self.product1, self.location_src, 2.0)
+        self.env['stock.quant']._update_available_quantity(self.product2, self.location_src, 1.0)
+        self.WmsRfidTag.create({
+            'name': 'TEST_TAG_002',
+            'tag_type': 'product',
+            'product_id': self.product1.id,
+            'rfid_uid': 'UID_002',
+        })
+        self.WmsRfidTag.create({
+            'name': 'TEST_PALLET_001',
+            'tag_type': 'location',
+            'location_id': self.location_src.id,
+            'rfid_uid': 'UID_PALLET',
+        })
+
+        inventory = self.WmsRfidInventory.create({
+            'location_id': self.warehouse.lot_stock_id.id,
+            'warehouse_id': self.warehouse.id,
+            'reader_ids': [(6, 0, self.rfid_reader.ids)],
+        })
+        inventory.action_start_inventory()
+        # Both product 1 tags are read, product 2 and the pallet are not
+        self.rfid_reader.ingest_reads([
+            {'uid': '123456789ABC', 'rssi': -50, 'antenna': 1, 'timestamp': fields.Datetime.now()},
+            {'uid': 'UID_002', 'rssi': -50, 'antenna': 1, 'timestamp': fields.Datetime.now()},
+        ])
+        inventory.action_complete_inventory()
+
+        self.assertEqual(inventory.items_counted, 2)
+        # Product 2 is missing (-1 unit at 10.0) and so is the pallet tag
+        self.assertEqual(inventory.discrepancies_found, 2)
+        self.assertAlmostEqual(inventory.accuracy_rate, 100.0 / 3)
+        self.assertEqual(inventory.variance_value, -10.0)
+
+        # Excluded products are left out of the count
+        inventory.write({'exclude_products': True, 'excluded_product_ids': [(6, 0, self.product2.ids)]})
+        inventory._calculate_results()
+        self.assertEqual(inventory.discrepancies_found, 1)
+        self.assertEqual(inventory.variance_value, 0.0)
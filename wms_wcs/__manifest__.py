@@ -25,6 +25,7 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/wcs_data.xml',
         'views/wcs_views.xml',
     ],
     'demo': [
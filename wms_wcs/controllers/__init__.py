@@ -0,0 +1 @@
+from . import wcs
\ No newline at end of file
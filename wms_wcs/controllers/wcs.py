@@ -0,0 +1,24 @@
+import hmac
+import logging
+from odoo import http
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+
+class WcsController(http.Controller):
+    @http.route('/wms/wcs/device_status', type='json', auth='public', methods=['POST'], csrf=False)
+    def device_status(self, system, states, api_key=None, **kwargs):
+        """
+        Receive a batch of device states from a WCS, e.g.
+        ``{"system": "WCS01", "api_key": "...", "states": [{"device": "CV01",
+        "status": "working", "load": 12, "timestamp": 1700000000}]}``.
+        Only systems with an API key accept device states.
+        """
+        wcs_system = request.env['wms.wcs.system'].sudo().search([('code', '=', system)], limit=1)
+        if not wcs_system:
+            return {'error': 'Unknown WCS system'}
+        if not wcs_system.api_key or not hmac.compare_digest(wcs_system.api_key, api_key or ''):
+            _logger.warning("Device states refused for WCS system %s: invalid API key", system)
+            return {'error': 'Invalid API key'}
+        return wcs_system.ingest_device_states(states or [])
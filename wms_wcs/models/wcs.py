@@ -1,12 +1,21 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 import json
 import requests
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
 import logging
 
+from .wcs_device_state import device_state_caches, normalize_state
+from .wcs_transport import DISPATCH_PROTOCOLS, backoff_delay, get_local_endpoint, http_session
+
 _logger = logging.getLogger(__name__)
 
+# Tasks accepted by the WCS and not done yet, occupying their device
+IN_FLIGHT_DOMAIN = [('dispatch_status', '=', 'dispatched'), ('state', 'in', ['sent', 'in_progress'])]
+
 
 class WmsWcsSystem(models.Model):
     """
@@ -40,7 +49,10 @@ class WmsWcsSystem(models.Model):
         ('tcp', 'TCP'),
         ('modbus', 'Modbus'),
         ('opc_ua', 'OPC-UA'),
-    ], string='Protocol', default='http')
+        ('local', 'Local Stand-in'),
+    ], string='Protocol', default='http',
+        help='Tasks of HTTP(S) systems are dispatched to the API URL, those of local systems to an '
+             'in-process stand-in WCS')
     username = fields.Char('Username')
     password = fields.Char('Password')
 
@@ -58,6 +70,20 @@ class WmsWcsSystem(models.Model):
         ('error', 'Error'),
     ], string='Connection Status', default='disconnected', readonly=True)
 
+    # Task dispatch
+    dispatch_batch_size = fields.Integer('Tasks per Message', default=50,
+                                         help='Maximum number of tasks sent to the WCS in one message')
+    dispatch_max_retries = fields.Integer('Max Dispatch Retries', default=5,
+                                          help='Failed dispatches are retried this many times before the '
+                                               'task fails')
+    dispatch_retry_delay = fields.Integer('Retry Delay (seconds)', default=30,
+                                          help='Delay before the first retry, doubled at each new retry')
+    dispatch_timeout = fields.Float('Dispatch Timeout (seconds)', default=10.0)
+
+    # Device monitoring
+    heartbeat_timeout = fields.Integer('Heartbeat Timeout (seconds)', default=60,
+                                       help='Devices silent for longer are reported offline')
+
     # WCS devices
     device_ids = fields.One2many('wms.wcs.device', 'wcs_system_id', 'Devices')
 
@@ -87,6 +113,196 @@ class WmsWcsSystem(models.Model):
             # For now, we'll just log the action
             _logger.info(f"Syncing devices for WCS system: {system.name}")
 
+    def _post_to_wcs(self, payload):
+        """Send ``payload`` to the WCS and return its decoded response"""
+        self.ensure_one()
+        if self.protocol == 'local':
+            return get_local_endpoint(self.code).handle(payload)
+        headers = {'Authorization': 'Bearer %s' % self.api_key} if self.api_key else {}
+        response = http_session.post(self.api_url, json=payload, headers=headers, timeout=self.dispatch_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _get_device_slots(self):
+        """
+        Number of tasks each device of the system can still receive, as
+        ``{device id: slots}``: its max capacity minus its dispatched tasks
+        not done yet, zero while inactive, in maintenance or in error.
+        Devices without max capacity are not limited and left out.
+        """
+        self.ensure_one()
+        in_flight = {
+            device.id: count
+            for device, count in self.env['wms.wcs.task']._read_group(
+                [('wcs_system_id', '=', self.id), ('device_id', '!=', False)] + IN_FLIGHT_DOMAIN,
+                groupby=['device_id'], aggregates=['__count'],
+            )
+        }
+        slots = {}
+        for device in self.with_context(active_test=False).device_ids:
+            if not device.is_active or device.device_status in ('maintenance', 'error'):
+                slots[device.id] = 0
+            elif device.max_capacity:
+                slots[device.id] = max(int(device.max_capacity) - in_flight.get(device.id, 0), 0)
+        return slots
+
+    def _fetch_due_tasks(self, limit, excluded_device_ids):
+        """
+        Lock and return the next ``limit`` tasks waiting in the queue, by
+        priority, skipping the tasks locked by a concurrent dispatch and those
+        of the devices ``excluded_device_ids``.
+        """
+        self.ensure_one()
+        Task = self.env['wms.wcs.task']
+        Task.flush_model(['wcs_system_id', 'state', 'dispatch_status', 'next_dispatch', 'device_id',
+                          'priority', 'date_created'])
+        query = """
+            SELECT id
+            FROM wms_wcs_task
+            WHERE wcs_system_id = %s
+              AND state = 'sent'
+              AND dispatch_status IN ('queued', 'retry')
+              AND next_dispatch <= %s
+        """
+        params = [self.id, fields.Datetime.now()]
+        if excluded_device_ids:
+            query += " AND (device_id IS NULL OR device_id NOT IN %s)"
+            params.append(tuple(excluded_device_ids))
+        query += " ORDER BY priority DESC, date_created, id LIMIT %s FOR UPDATE SKIP LOCKED"
+        params.append(limit)
+        self.env.cr.execute(query, params)
+        return Task.browse([task_id for task_id, in self.env.cr.fetchall()])
+
+    def _dispatch_batch(self, tasks):
+        """Send ``tasks`` to the WCS in one message and record the outcome"""
+        self.ensure_one()
+        payload = {
+            'system': self.code,
+            'batch': '%s-%s' % (self.code, uuid.uuid4().hex[:12]),
+            'tasks': [task._prepare_wcs_payload() for task in tasks],
+        }
+        started = time.monotonic()
+        try:
+            response = self._post_to_wcs(payload)
+        except (requests.RequestException, OSError, ValueError) as e:
+            duration = time.monotonic() - started
+            _logger.warning("Dispatch of %s task(s) to WCS %s failed: %s", len(tasks), self.name, e)
+            tasks._schedule_dispatch_retry(str(e))
+            status, message, response_data = 'error', str(e), False
+        else:
+            duration = time.monotonic() - started
+            rejected = response.get('rejected') or {}
+            rejected_tasks = tasks.filtered(lambda task: task.name in rejected)
+            (tasks - rejected_tasks)._mark_dispatched(payload['batch'], response)
+            for task in rejected_tasks:
+                task.write({
+                    'state': 'failed',
+                    'dispatch_status': 'failed',
+                    'error_message': rejected[task.name],
+                })
+            status = 'warning' if rejected_tasks else 'success'
+            message = _('%(count)s task(s) sent, %(rejected)s rejected',
+                        count=len(tasks), rejected=len(rejected_tasks))
+            response_data = json.dumps(response, default=str)
+        self.env['wms.wcs.integration.log'].create({
+            'wcs_system_id': self.id,
+            'operation': 'send_task',
+            'status': status,
+            'message': message,
+            'request_data': json.dumps(payload, default=str),
+            'response_data': response_data,
+            'duration': duration,
+            'task_id': tasks.id if len(tasks) == 1 else False,
+        })
+        return status != 'error'
+
+    def _dispatch_queue(self, max_batches=20):
+        """
+        Send the queued tasks of the system to its WCS, up to ``max_batches``
+        messages of ``dispatch_batch_size`` tasks. Tasks of devices at full
+        capacity stay queued until the device has free slots again; failed
+        messages are retried with exponential backoff. Outside of tests each
+        message is committed on its own: a crash only replays the message in
+        progress (the WCS deduplicates on the task references) and concurrent
+        dispatchers share the queue.
+
+        Returns the number of tasks sent.
+        """
+        self.ensure_one()
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        slots = self._get_device_slots()
+        sent = 0
+        for __ in range(max_batches):
+            full_devices = [device_id for device_id, free in slots.items() if free <= 0]
+            tasks = self._fetch_due_tasks(max(self.dispatch_batch_size, 1), full_devices)
+            if not tasks:
+                break
+            batch = self.env['wms.wcs.task']
+            for task in tasks:
+                device_id = task.device_id.id
+                if device_id in slots:
+                    if slots[device_id] <= 0:
+                        continue
+                    slots[device_id] -= 1
+                batch |= task
+            if not batch:
+                continue
+            if self._dispatch_batch(batch):
+                sent += len(batch)
+            if auto_commit:
+                self.env.cr.commit()
+        self.device_ids._update_command_queue_size()
+        return sent
+
+    def ingest_device_states(self, states):
+        """
+        Record a batch of device states reported by the WCS (see
+        ``normalize_state``). States are coalesced in the device state cache
+        and written to the devices with a single UPDATE at the end of the
+        report, as other workers (e.g. the monitoring cron) only see the
+        stored states.
+
+        Returns ``{'accepted': <number of states kept>, 'unknown': <codes of
+        the devices not found in the system>}``.
+        """
+        self.ensure_one()
+        Device = self.env['wms.wcs.device']
+        index = Device._get_device_index().get(self.id, {})
+        statuses = dict(Device._fields['device_status'].selection)
+        now = fields.Datetime.now()
+        reported = {}
+        unknown = []
+        for state in states:
+            state = normalize_state(state, now, statuses)
+            if state is None:
+                continue
+            code, heartbeat, status, load = state
+            device_id = index.get(code)
+            if not device_id:
+                unknown.append(code)
+                continue
+            previous = reported.get(device_id)
+            if previous is None or heartbeat >= previous[0]:
+                reported[device_id] = (
+                    heartbeat,
+                    status if status is not None or previous is None else previous[1],
+                    load if load is not None or previous is None else previous[2],
+                )
+        cache = Device._get_device_state_cache()
+        accepted = cache.update(reported)
+        Device._flush_device_states()
+        return {'accepted': accepted, 'unknown': unknown}
+
+    @api.model
+    def _cron_dispatch_tasks(self):
+        """Drain the outbound task queue of the WCS systems"""
+        systems = self.search([('protocol', 'in', DISPATCH_PROTOCOLS)])
+        for system in systems:
+            sent = system._dispatch_queue()
+            if sent:
+                _logger.info("%s task(s) dispatched to WCS system %s", sent, system.name)
+        return True
+
 
 class WmsWcsDevice(models.Model):
     """
@@ -138,6 +354,131 @@ class WmsWcsDevice(models.Model):
 
     notes = fields.Text('Notes')
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        devices = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return devices
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'code' in vals or 'wcs_system_id' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_device_index(self):
+        """
+        Devices by system and code as ``{system id: {code: device id}}``,
+        cached until a device is created, modified or deleted.
+        """
+        index = {}
+        for device in self.sudo().with_context(active_test=False).search_read([], ['wcs_system_id', 'code'],
+                                                                              load=None):
+            index.setdefault(device['wcs_system_id'], {})[device['code']] = device['id']
+        return index
+
+    @api.model
+    def _get_device_state_cache(self):
+        """State cache of the devices of the database, seeded from the devices on first use"""
+        cache = device_state_caches[self.env.cr.dbname]
+        if not cache.loaded:
+            cache.load(self._read_device_states())
+        return cache
+
+    @api.model
+    def _read_device_states(self, device_ids=None):
+        """Stored states of the devices that already sent a heartbeat"""
+        domain = [('last_heartbeat', '!=', False)]
+        if device_ids is not None:
+            domain.append(('id', 'in', device_ids))
+        return {
+            device['id']: (device['last_heartbeat'], device['device_status'], device['current_load'])
+            for device in self.sudo().search_read(domain, ['last_heartbeat', 'device_status', 'current_load'])
+        }
+
+    @api.model
+    def _flush_device_states(self):
+        """
+        Write the states reported since the last flush to the devices with a
+        single UPDATE, never overriding a more recent heartbeat. States are
+        flushed again if the transaction is rolled back.
+        """
+        cache = self._get_device_state_cache()
+        pending = cache.take_pending()
+        if not pending:
+            return 0
+        self.env.cr.postrollback.add(lambda: cache.restore_pending(pending))
+        self.flush_model(['last_heartbeat', 'device_status', 'current_load'])
+        values = ', '.join(['(%s::int, %s::timestamp, %s::varchar, %s::float)'] * len(pending))
+        params = [
+            value
+            for device_id, (heartbeat, status, load) in pending.items()
+            for value in (device_id, heartbeat, status, load)
+        ]
+        self.env.cr.execute("""
+            UPDATE wms_wcs_device d
+            SET last_heartbeat = v.heartbeat,
+                device_status = COALESCE(v.status, d.device_status),
+                current_load = COALESCE(v.load, d.current_load)
+            FROM (VALUES {values}) AS v(id, heartbeat, status, load)
+            WHERE d.id = v.id AND (d.last_heartbeat IS NULL OR d.last_heartbeat <= v.heartbeat)
+        """.format(values=values), params)
+        self.browse(list(pending)).invalidate_recordset(['last_heartbeat', 'device_status', 'current_load'])
+        return len(pending)
+
+    @api.model
+    def _check_device_heartbeats(self):
+        """
+        Report offline the devices silent for longer than the heartbeat
+        timeout of their system, with a warning in the integration log.
+        Silent devices are found in the state cache. The devices whose
+        stored state may be newer (silent, offline or never loaded, as other
+        workers receive the reports) are read back first.
+        """
+        cache = self._get_device_state_cache()
+        now = fields.Datetime.now()
+        systems = self.env['wms.wcs.system'].sudo().with_context(active_test=False).search([])
+        deadlines = {system.id: now - timedelta(seconds=system.heartbeat_timeout or 60) for system in systems}
+        device_deadlines = {
+            device_id: deadlines.get(system_id)
+            for system_id, devices in self._get_device_index().items()
+            for device_id in devices.values()
+        }
+        stale = cache.find_stale(device_deadlines, device_deadlines.get)
+        if not stale:
+            return self.browse()
+        cache.load(self._read_device_states(list(stale)))
+        devices = self.sudo().browse(sorted(cache.find_silent(device_deadlines.get)))
+        if not devices:
+            return devices
+        devices.write({'device_status': 'offline'})
+        cache.mark_offline(devices.ids)
+        self.env['wms.wcs.integration.log'].sudo().create([{
+            'wcs_system_id': device.wcs_system_id.id,
+            'device_id': device.id,
+            'operation': 'heartbeat',
+            'status': 'warning',
+            'message': _('Device %(device)s offline, last heartbeat at %(heartbeat)s',
+                         device=device.name, heartbeat=device.last_heartbeat),
+        } for device in devices])
+        return devices
+
+    @api.model
+    def _cron_monitor_devices(self):
+        """Flush the reported device states and report the silent devices offline"""
+        flushed = self._flush_device_states()
+        offline = self._check_device_heartbeats()
+        if flushed or offline:
+            _logger.info("WCS device states: %s flushed, %s device(s) offline", flushed, len(offline))
+        return True
+
     @api.depends('current_load', 'max_capacity')
     def _compute_efficiency_rate(self):
         for device in self:
@@ -153,15 +494,28 @@ class WmsWcsDevice(models.Model):
             # For now, we'll just log the action
             _logger.info(f"Sending command to device {device.name}: {command_data}")
 
+    def _update_command_queue_size(self):
+        """Store the number of dispatched tasks the devices have not done yet"""
+        if not self:
+            return
+        counts = {
+            device.id: count
+            for device, count in self.env['wms.wcs.task']._read_group(
+                [('device_id', 'in', self.ids)] + IN_FLIGHT_DOMAIN,
+                groupby=['device_id'], aggregates=['__count'],
+            )
+        }
+        for device in self:
+            if device.command_queue_size != counts.get(device.id, 0):
+                device.command_queue_size = counts.get(device.id, 0)
+
     def action_refresh_status(self):
         """Refresh the device status from WCS system"""
-        for device in self:
-            # This would refresh status from the WCS system
-            # For now, we'll just update the heartbeat
-            device.write({
-                'last_heartbeat': fields.Datetime.now(),
-                'device_status': 'idle',  # Simulate status update
-            })
+        # This would refresh status from the WCS system
+        # For now, we'll just report a heartbeat through the state cache
+        now = fields.Datetime.now()
+        self._get_device_state_cache().update({device.id: (now, 'idle', None) for device in self})
+        self._flush_device_states()
 
 
 class WmsWcsTask(models.Model):
@@ -245,13 +599,26 @@ class WmsWcsTask(models.Model):
     error_message = fields.Text('Error Message')
     retry_count = fields.Integer('Retry Count', default=0)
 
+    # Outbound queue
+    dispatch_status = fields.Selection([
+        ('queued', 'Queued'),
+        ('retry', 'Waiting for Retry'),
+        ('dispatched', 'Dispatched'),
+        ('failed', 'Failed'),
+    ], string='Dispatch Status', readonly=True, copy=False, index=True,
+        help='Delivery of the task to the WCS once sent')
+    next_dispatch = fields.Datetime('Next Dispatch Attempt', readonly=True, copy=False)
+    dispatch_batch = fields.Char('Dispatch Message', readonly=True, copy=False,
+                                 help='Reference of the message that delivered the task to the WCS')
+
     notes = fields.Text('Notes')
 
-    @api.model
-    def create(self, vals):
-        if vals.get('name', _('New')) == _('New'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('wms.wcs.task') or _('New')
-        return super().create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('name', _('New')) == _('New'):
+                vals['name'] = self.env['ir.sequence'].next_by_code('wms.wcs.task') or _('New')
+        return super().create(vals_list)
 
     @api.depends('start_time', 'end_time')
     def _compute_duration(self):
@@ -272,15 +639,76 @@ class WmsWcsTask(models.Model):
                 })
 
     def action_send_to_wcs(self):
-        """Send the task to the WCS system"""
-        for task in self:
-            if task.state == 'confirmed':
-                # Here we would send the task to the WCS system
-                # For now, we'll just update the state
-                task.write({
-                    'state': 'sent',
-                    'date_sent': fields.Datetime.now(),
+        """
+        Send the task to the WCS system: the task is put in the outbound queue
+        of its system, delivered in the background by the dispatch cron.
+        """
+        tasks = self.filtered(lambda task: task.state == 'confirmed')
+        if not tasks:
+            return
+        now = fields.Datetime.now()
+        tasks.write({
+            'state': 'sent',
+            'date_sent': now,
+            'dispatch_status': 'queued',
+            'next_dispatch': now,
+            'dispatch_batch': False,
+        })
+        cron = self.env.ref('wms_wcs.ir_cron_wms_wcs_dispatch', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    def _prepare_wcs_payload(self):
+        """Task as sent to the WCS"""
+        self.ensure_one()
+        return {
+            'reference': self.name,
+            'type': self.task_type,
+            'priority': int(self.priority or 0),
+            'device': self.device_id.code or None,
+            'source': self.source_location_id.complete_name or None,
+            'destination': self.destination_location_id.complete_name or None,
+            'product': self.product_id.default_code or self.product_id.display_name or None,
+            'lot': self.lot_id.name or None,
+            'quantity': self.quantity,
+            'uom': self.product_uom.name or None,
+            'data': self.task_data or None,
+        }
+
+    def _mark_dispatched(self, batch, response):
+        """Record the delivery of the tasks in the WCS message ``batch``"""
+        self.write({
+            'dispatch_status': 'dispatched',
+            'dispatch_batch': batch,
+            'next_dispatch': False,
+            'wcs_response': json.dumps(response, default=str),
+            'error_message': False,
+        })
+        self.device_id.write({'last_command': fields.Datetime.now()})
+
+    def _schedule_dispatch_retry(self, error):
+        """
+        Put back the tasks of a failed message in the queue, the delay before
+        the next attempt doubling at each retry. Tasks out of retries fail.
+        """
+        now = fields.Datetime.now()
+        for (system, retry_count), tasks in self.grouped(lambda task: (task.wcs_system_id, task.retry_count)).items():
+            attempt = retry_count + 1
+            if attempt > system.dispatch_max_retries:
+                tasks.write({
+                    'state': 'failed',
+                    'dispatch_status': 'failed',
+                    'next_dispatch': False,
+                    'error_message': error,
                 })
+                continue
+            delay = backoff_delay(system.dispatch_retry_delay, attempt)
+            tasks.write({
+                'dispatch_status': 'retry',
+                'next_dispatch': now + timedelta(seconds=delay),
+                'retry_count': attempt,
+                'error_message': error,
+            })
 
     def action_start_task(self):
         """Mark the task as started by the WCS system"""
@@ -316,6 +744,8 @@ class WmsWcsTask(models.Model):
                     'state': 'confirmed',
                     'retry_count': task.retry_count + 1,
                     'error_message': False,
+                    'dispatch_status': False,
+                    'next_dispatch': False,
                 })
 
 
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from odoo import fields
+
+
+def normalize_state(state, now, statuses):
+    """
+    Device state reported by the WCS as ``(code, heartbeat, status, load)``.
+    The state is a dict with ``device`` (device code), ``timestamp``
+    (datetime, server formatted string or UTC epoch seconds, now by
+    default and never later), ``status`` (ignored unless in ``statuses``)
+    and ``load``. Returns None for states without device.
+    """
+    code = state.get('device')
+    if not code:
+        return None
+    timestamp = state.get('timestamp')
+    if isinstance(timestamp, (int, float)):
+        timestamp = datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+    else:
+        timestamp = fields.Datetime.to_datetime(timestamp) or now
+    status = state.get('status')
+    load = state.get('load')
+    return (
+        code,
+        min(timestamp, now),
+        status if status in statuses else None,
+        float(load) if load is not None else None,
+    )
+
+
+class DeviceStateCache:
+    """
+    Latest state reported by the devices of a database, shared by the
+    requests of the worker: ``{device id: (heartbeat, status, load)}``.
+
+    Reports are coalesced in memory; the devices changed since the last flush
+    are written back in bulk by whoever takes them with ``take_pending``.
+    Other workers have their own cache, kept in sync with ``load``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states = {}
+        self.pending = set()
+        self.offline = set()
+        self.loaded = False
+
+    def load(self, states):
+        """
+        Seed the cache with the stored states. A stored state replaces the
+        cached one unless older, or as old and not flushed yet: a status
+        written by another worker for the same heartbeat (e.g. offline) wins.
+        Devices stored online again are no longer considered offline.
+        """
+        with self.lock:
+            for device_id, state in states.items():
+                current = self.states.get(device_id)
+                if current is None or state[0] > current[0] \
+                        or (state[0] == current[0] and device_id not in self.pending):
+                    self.states[device_id] = state
+                    if state[1] != 'offline':
+                        self.offline.discard(device_id)
+            self.loaded = True
+
+    def update(self, states):
+        """
+        Record reported states ``{device id: (heartbeat, status, load)}``,
+        ``status`` and ``load`` being None when not reported. Reports older
+        than the known state are ignored. Returns the number of states kept.
+        """
+        kept = 0
+        with self.lock:
+            for device_id, (heartbeat, status, load) in states.items():
+                current = self.states.get(device_id)
+                if current is not None:
+                    if heartbeat < current[0]:
+                        continue
+                    status = status if status is not None else current[1]
+                    load = load if load is not None else current[2]
+                self.states[device_id] = (heartbeat, status, load)
+                self.pending.add(device_id)
+                self.offline.discard(device_id)
+                kept += 1
+        return kept
+
+    def take_pending(self):
+        """States changed since the last flush, which are now considered flushed"""
+        with self.lock:
+            pending = {device_id: self.states[device_id] for device_id in self.pending}
+            self.pending.clear()
+        return pending
+
+    def restore_pending(self, device_ids):
+        """Mark ``device_ids`` as not flushed again, after a failed flush"""
+        with self.lock:
+            self.pending.update(device_ids)
+
+    def find_stale(self, device_ids, get_deadline):
+        """
+        Devices among ``device_ids`` whose stored state may be more recent
+        than the cached one: the ones never loaded, the ones reported offline
+        and the silent ones (see ``find_silent``).
+        """
+        stale = set(self.find_silent(get_deadline))
+        with self.lock:
+            stale.update(device_id for device_id in device_ids if device_id not in self.states)
+            stale.update(self.offline)
+        return stale
+
+    def find_silent(self, get_deadline):
+        """
+        Online devices not reported offline yet and not heard from since
+        their deadline, ``get_deadline(device id)`` (None to skip a device).
+        """
+        with self.lock:
+            silent = []
+            for device_id, (heartbeat, status, load) in self.states.items():
+                if status == 'offline' or device_id in self.offline:
+                    continue
+                deadline = get_deadline(device_id)
+                if deadline is not None and heartbeat < deadline:
+                    silent.append(device_id)
+            return silent
+
+    def mark_offline(self, device_ids):
+        with self.lock:
+            self.offline.update(device_ids)
+
+
+device_state_caches = defaultdict(DeviceStateCache)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import requests
+
+# Protocols whose systems receive their tasks through the dispatch queue
+DISPATCH_PROTOCOLS = ('http', 'https', 'local')
+
+# Upper bound of the delay between two dispatch attempts of a task (seconds)
+MAX_RETRY_DELAY = 3600
+
+# Keep-alive connections shared by the dispatches of a worker
+http_session = requests.Session()
+
+
+def backoff_delay(base, attempt, cap=MAX_RETRY_DELAY):
+    """Delay in seconds before the ``attempt``-th retry (1-based), doubling each time"""
+    return min(base * 2 ** (attempt - 1), cap)
+
+
+class LocalWcsEndpoint:
+    """
+    In-process stand-in for a WCS, used by the systems with the ``local``
+    protocol (tests, demos). It accepts every batch and records it, except:
+
+    - while ``fail_next`` is positive, calls fail as an unreachable WCS;
+    - tasks whose reference is in ``rejected`` are refused with its reason.
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.fail_next = 0
+        self.rejected = {}
+
+    def handle(self, payload):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise ConnectionError('Local WCS endpoint unavailable')
+        self.batches.append(payload)
+        references = [task['reference'] for task in payload['tasks']]
+        rejected = {ref: self.rejected[ref] for ref in references if ref in self.rejected}
+        return {
+            'batch': payload['batch'],
+            'accepted': [ref for ref in references if ref not in rejected],
+            'rejected': rejected,
+        }
+
+
+_local_endpoints = {}
+
+
+def get_local_endpoint(code):
+    """Stand-in endpoint of the WCS system with code ``code``"""
+    return _local_endpoints.setdefault(code, LocalWcsEndpoint())
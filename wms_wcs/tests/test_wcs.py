@@ -1,8 +1,12 @@
-from odoo.tests import TransactionCase, tagged
+from odoo.tests import HttpCase, TransactionCase, tagged
+from odoo import fields
 from odoo.exceptions import ValidationError
 from datetime import datetime, timedelta
 import json
 
+from odoo.addons.wms_wcs.models.wcs_device_state import DeviceStateCache, device_state_caches
+from odoo.addons.wms_wcs.models.wcs_transport import get_local_endpoint
+
 
 @tagged('wms_wcs', 'at_install')
 class TestWmsWcs(TransactionCase):
@@ -406,4 +410,186 @@ class TestWmsWcs(TransactionCase):
         })
 
         self.assertEqual(task.source_document, f'stock.picking,{picking.id}')
-        self.assertEqual(task.quantity, 8.0)
\ No newline at end of file
+        self.assertEqual(task.quantity, 8.0)
+
+    def test_wcs_task_dispatch_queue(self):
+        """Test batched dispatch of queued tasks with device capacity and retries"""
+        system = self.WmsWcsSystem.create({
+            'name': 'Local WCS System',
+            'code': 'TWCSLOCAL',
+            'system_type': 'conveyor',
+            'protocol': 'local',
+            'dispatch_batch_size': 2,
+            'dispatch_retry_delay': 30,
+        })
+        device = self.WmsWcsDevice.create({
+            'name': 'Local Conveyor',
+            'code': 'TLC001',
+            'wcs_system_id': system.id,
+            'device_type': 'conveyor',
+            'max_capacity': 2.0,
+        })
+        endpoint = get_local_endpoint(system.code)
+        endpoint.batches.clear()
+        tasks = self.WmsWcsTask.create([{
+            'task_type': 'move',
+            'wcs_system_id': system.id,
+            'device_id': device.id,
+            'quantity': 1.0,
+        } for __ in range(3)] + [{
+            'task_type': 'label',
+            'wcs_system_id': system.id,
+        }])
+        tasks.action_confirm_task()
+        tasks.action_send_to_wcs()
+        self.assertEqual(set(tasks.mapped('state')), {'sent'})
+        self.assertEqual(set(tasks.mapped('dispatch_status')), {'queued'})
+
+        # The device takes 2 tasks, the third one waits for a free slot
+        self.assertEqual(system._dispatch_queue(), 3)
+        self.assertEqual(len(endpoint.batches), 2)
+        dispatched = tasks.filtered(lambda task: task.dispatch_status == 'dispatched')
+        self.assertEqual(len(dispatched), 3)
+        self.assertEqual(device.command_queue_size, 2)
+        waiting = tasks - dispatched
+        self.assertEqual(waiting.dispatch_status, 'queued')
+        log = self.WmsWcsIntegrationLog.search([('wcs_system_id', '=', system.id)], limit=1)
+        self.assertEqual(log.status, 'success')
+        self.assertGreaterEqual(log.duration, 0.0)
+
+        # Once a task is done, the failed message is retried with backoff
+        (dispatched & tasks.filtered('device_id'))[0].write({'state': 'completed'})
+        endpoint.fail_next = 1
+        self.assertEqual(system._dispatch_queue(), 0)
+        self.assertEqual(waiting.dispatch_status, 'retry')
+        self.assertEqual(waiting.retry_count, 1)
+        self.assertGreater(waiting.next_dispatch, waiting.date_sent)
+        waiting.next_dispatch = waiting.date_sent
+        self.assertEqual(system._dispatch_queue(), 1)
+        self.assertEqual(waiting.dispatch_status, 'dispatched')
+
+        # Tasks refused by the WCS fail
+        rejected = self.WmsWcsTask.create({'task_type': 'sort', 'wcs_system_id': system.id})
+        rejected.action_confirm_task()
+        rejected.action_send_to_wcs()
+        endpoint.rejected[rejected.name] = 'Unknown destination'
+        system._dispatch_queue()
+        self.assertEqual(rejected.state, 'failed')
+        self.assertEqual(rejected.error_message, 'Unknown destination')
+
+    def test_wcs_device_state_ingestion(self):
+        """Test cached ingestion of device states and offline detection"""
+        device_state_caches.pop(self.env.cr.dbname, None)
+        shuttle = self.WmsWcsDevice.create({
+            'name': 'Test Shuttle',
+            'code': 'TSH001',
+            'wcs_system_id': self.wcs_system.id,
+            'device_type': 'agv',
+        })
+        now = fields.Datetime.now()
+        result = self.wcs_system.ingest_device_states([
+            {'device': 'TSD001', 'status': 'working', 'load': 12, 'timestamp': now - timedelta(seconds=5)},
+            {'device': 'TSD001', 'status': 'idle', 'timestamp': now - timedelta(seconds=10)},
+            {'device': 'TSH001', 'status': 'working', 'timestamp': now - timedelta(minutes=5)},
+            {'device': 'UNKNOWN', 'status': 'idle'},
+        ])
+        self.assertEqual(result['accepted'], 2)
+        self.assertEqual(result['unknown'], ['UNKNOWN'])
+
+        # States are written in bulk at the end of the report, the most recent one winning
+        self.assertFalse(device_state_caches[self.env.cr.dbname].pending)
+        self.assertEqual(self.wcs_device.device_status, 'working')
+        self.assertEqual(self.wcs_device.current_load, 12.0)
+        self.assertEqual(self.wcs_device.last_heartbeat, now - timedelta(seconds=5))
+
+        # The shuttle is silent for longer than the timeout of its system
+        offline = self.WmsWcsDevice._check_device_heartbeats()
+        self.assertEqual(offline, shuttle)
+        self.assertEqual(shuttle.device_status, 'offline')
+        self.assertTrue(self.WmsWcsIntegrationLog.search([
+            ('device_id', '=', shuttle.id), ('operation', '=', 'heartbeat'), ('status', '=', 'warning'),
+        ]))
+        self.assertFalse(self.WmsWcsDevice._check_device_heartbeats())
+
+        # A worker still caching the shuttle online takes the stored offline status
+        cache = device_state_caches[self.env.cr.dbname]
+        cache.states[shuttle.id] = (shuttle.last_heartbeat, 'working', None)
+        cache.offline.discard(shuttle.id)
+        self.assertFalse(self.WmsWcsDevice._check_device_heartbeats())
+
+    def test_wcs_device_state_workers(self):
+        """Test offline detection by a cron worker from the states reported to an HTTP worker"""
+        dbname = self.env.cr.dbname
+        http_cache, cron_cache = DeviceStateCache(), DeviceStateCache()
+        self.addCleanup(device_state_caches.pop, dbname, None)
+        shuttle = self.WmsWcsDevice.create({
+            'name': 'Test Shuttle',
+            'code': 'TSH001',
+            'wcs_system_id': self.wcs_system.id,
+            'device_type': 'agv',
+        })
+
+        # The cron worker loads its cache before the shuttle ever reports
+        device_state_caches[dbname] = cron_cache
+        self.assertFalse(self.WmsWcsDevice._check_device_heartbeats())
+
+        # The HTTP worker stores the report at the end of the request
+        device_state_caches[dbname] = http_cache
+        now = fields.Datetime.now()
+        self.wcs_system.ingest_device_states([
+            {'device': 'TSH001', 'status': 'working', 'timestamp': now - timedelta(minutes=5)},
+        ])
+        self.assertFalse(http_cache.pending)
+        self.assertEqual(shuttle.device_status, 'working')
+
+        # The cron worker reads the shuttle it never saw and reports it offline
+        device_state_caches[dbname] = cron_cache
+        self.assertEqual(self.WmsWcsDevice._check_device_heartbeats(), shuttle)
+        self.assertEqual(shuttle.device_status, 'offline')
+
+        # The shuttle reports again to the HTTP worker, the cron worker sees it online
+        device_state_caches[dbname] = http_cache
+        self.wcs_system.ingest_device_states([{'device': 'TSH001', 'status': 'idle'}])
+        device_state_caches[dbname] = cron_cache
+        self.assertFalse(self.WmsWcsDevice._check_device_heartbeats())
+        self.assertNotIn(shuttle.id, cron_cache.offline)
+        self.assertEqual(cron_cache.states[shuttle.id][1], 'idle')
+        self.assertEqual(shuttle.device_status, 'idle')
+
+
+@tagged('wms_wcs', 'post_install', '-at_install')
+class TestWmsWcsDeviceStatusRoute(HttpCase):
+
+    def _post_states(self, system, api_key=None):
+        response = self.url_open('/wms/wcs/device_status', data=json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {
+                'system': system.code,
+                'api_key': api_key,
+                'states': [{'device': 'RTD001', 'status': 'working', 'load': 3}],
+            },
+        }), headers={'Content-Type': 'application/json'})
+        return response.json()['result']
+
+    def test_device_status_requires_api_key(self):
+        """Test that device states are only accepted with the API key of the system"""
+        system = self.env['wms.wcs.system'].create({
+            'name': 'Route Test WCS',
+            'code': 'RTWCS001',
+            'system_type': 'conveyor',
+        })
+        self.env['wms.wcs.device'].create({
+            'name': 'Route Test Device',
+            'code': 'RTD001',
+            'wcs_system_id': system.id,
+            'device_type': 'conveyor',
+        })
+
+        # Systems without API key refuse every report
+        self.assertEqual(self._post_states(system), {'error': 'Invalid API key'})
+        self.assertEqual(self._post_states(system, 'any-key'), {'error': 'Invalid API key'})
+
+        system.api_key = 'secret-key'
+        self.assertEqual(self._post_states(system, 'wrong-key'), {'error': 'Invalid API key'})
+        self.assertEqual(self._post_states(system, 'secret-key'), {'accepted': 1, 'unknown': []})
@@ -1,10 +1,12 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 import json
-import requests
 from datetime import datetime, timedelta
+from functools import partial
 import logging
 
+from .wechat_client import HTTP_TIMEOUT, INVALID_TOKEN_ERRCODES, TOKEN_REFRESH_MARGIN, http_session, token_cache
+
 _logger = logging.getLogger(__name__)
 
 
@@ -60,45 +62,67 @@ class WmsWechatApp(models.Model):
 
     notes = fields.Text('Notes')
 
-    def get_access_token(self):
-        """Get access token from WeChat API"""
+    def write(self, vals):
+        res = super().write(vals)
+        if any(name in vals for name in ('app_id', 'app_secret', 'api_base_url')):
+            for app in self:
+                token_cache.invalidate(app._get_token_key())
+        return res
+
+    def _get_token_key(self):
+        return self.env.cr.dbname, self.id
+
+    def _fetch_access_token(self, force=False):
+        """
+        Access token of the app as ``(token, expires in seconds)``: the one
+        stored by another worker when still valid (unless ``force``), else a
+        new one requested from the WeChat API and stored.
+        """
+        self.ensure_one()
+        now = fields.Datetime.now()
+        self.invalidate_recordset(['access_token', 'token_expires'])
+        if not force and self.access_token and self.token_expires \
+                and self.token_expires > now + timedelta(seconds=TOKEN_REFRESH_MARGIN):
+            return self.access_token, (self.token_expires - now).total_seconds()
+
+        url = f"{self.api_base_url}/cgi-bin/token"
+        params = {
+            'grant_type': 'client_credential',
+            'appid': self.app_id,
+            'secret': self.app_secret,
+        }
+        result = http_session.get(url, params=params, timeout=HTTP_TIMEOUT).json()
+        if 'access_token' not in result:
+            raise ValueError(result.get('errmsg') or 'No access token returned')
+        expires_in = result.get('expires_in', 7200)
+        self.write({
+            'access_token': result['access_token'],
+            'token_expires': now + timedelta(seconds=expires_in),
+            'connection_status': 'connected',
+        })
+        return result['access_token'], expires_in
+
+    def get_access_token(self, force=False):
+        """Get access token from WeChat API, a new one if ``force`` is set"""
         for app in self:
-            if app.token_expires and app.token_expires > fields.Datetime.now():
-                # Token is still valid
-                return app.access_token
-            else:
-                # Request new token
-                url = f"{app.api_base_url}/cgi-bin/token"
-                params = {
-                    'grant_type': 'client_credential',
-                    'appid': app.app_id,
-                    'secret': app.app_secret,
-                }
-
-                try:
-                    response = requests.get(url, params=params)
-                    result = response.json()
-                    if 'access_token' in result:
-                        app.write({
-                            'access_token': result['access_token'],
-                            'token_expires': fields.Datetime.now() + timedelta(seconds=result.get('expires_in', 7200) - 300),  # 5 min buffer
-                            'connection_status': 'connected',
-                        })
-                        return result['access_token']
-                    else:
-                        app.write({'connection_status': 'error'})
-                        return None
-                except Exception as e:
-                    app.write({
-                        'connection_status': 'error',
-                        'notes': f'Error getting access token: {str(e)}'
-                    })
-                    return None
+            # Tokens are cached by the process and refreshed ahead of expiry
+            try:
+                return token_cache.get(app._get_token_key(), partial(app.sudo()._fetch_access_token, force=force),
+                                       force=force)
+            except ValueError:
+                app.write({'connection_status': 'error'})
+                return None
+            except Exception as e:
+                app.write({
+                    'connection_status': 'error',
+                    'notes': f'Error getting access token: {str(e)}'
+                })
+                return None
 
     def action_test_connection(self):
         """Test connection to WeChat API"""
         for app in self:
-            token = app.get_access_token()
+            token = app.get_access_token(force=True)
             if token:
                 app.write({
                     'connection_status': 'connected',
@@ -291,8 +315,15 @@ class WmsWechatMessage(models.Model):
                 pass
 
             try:
-                response = requests.post(url, json=data)
-                result = response.json()
+                result = http_session.post(url, params={'access_token': access_token}, json=data,
+                                           timeout=HTTP_TIMEOUT).json()
+                if result.get('errcode') in INVALID_TOKEN_ERRCODES:
+                    # Token revoked before its expiry (e.g. requested elsewhere), retry once with a new one
+                    access_token = app.get_access_token(force=True)
+                    if not access_token:
+                        return False
+                    result = http_session.post(url, params={'access_token': access_token}, json=data,
+                                               timeout=HTTP_TIMEOUT).json()
                 if result.get('errcode') == 0:
                     self.write({
                         'status': 'sent',
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Tokens are refreshed this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+
+# (connect, read) timeouts of the calls to the WeChat API, in seconds
+HTTP_TIMEOUT = (5, 15)
+
+# Seconds a thread waits for the token being fetched by another one, longer
+# than a token request (see HTTP_TIMEOUT)
+TOKEN_LOCK_TIMEOUT = 30
+
+# Error codes of the WeChat API for an invalid or expired access token
+INVALID_TOKEN_ERRCODES = (40001, 40014, 42001)
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Keep-alive connections shared by the WeChat API calls of the process
+http_session = _make_session()
+
+
+class TokenCache:
+    """
+    Access tokens shared by the threads of the process, by key (database and
+    app). A single thread fetches the token of a key at a time: callers
+    wait for it (at most ``TOKEN_LOCK_TIMEOUT`` seconds) when there is no
+    valid token, and keep using the current one while it is refreshed ahead
+    of its expiry.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.refresh_locks = {}
+
+    def get(self, key, fetch, margin=TOKEN_REFRESH_MARGIN, force=False):
+        """
+        Token of ``key``, fetched with ``fetch()`` -> ``(token, expires in
+        seconds)`` when missing or expiring within ``margin`` seconds, or
+        when ``force`` is set (e.g. the current token was rejected).
+        Errors of ``fetch`` are raised when no valid token is left.
+        """
+        if force:
+            self.invalidate(key)
+        token, expires = self.tokens.get(key, (None, 0))
+        now = time.monotonic()
+        if token and expires - now > margin:
+            return token
+        with self.lock:
+            refresh_lock = self.refresh_locks.setdefault(key, threading.Lock())
+        still_valid = token and expires > now
+        if still_valid:
+            if not refresh_lock.acquire(blocking=False):
+                # Another thread is refreshing it
+                return token
+        elif not refresh_lock.acquire(timeout=TOKEN_LOCK_TIMEOUT):
+            raise TimeoutError('Timed out waiting for the access token being fetched')
+        try:
+            current, expires = self.tokens.get(key, (None, 0))
+            if not force and current and expires - time.monotonic() > margin:
+                return current
+            try:
+                token, expires_in = fetch()
+            except Exception:
+                if still_valid:
+                    return token
+                raise
+            self.tokens[key] = (token, time.monotonic() + expires_in)
+            return token
+        finally:
+            refresh_lock.release()
+
+    def invalidate(self, key):
+        self.tokens.pop(key, None)
+
+
+token_cache = TokenCache()
@@ -3,6 +3,9 @@ from odoo.exceptions import ValidationError
 from datetime import datetime, timedelta
 import json
 import mock
+import threading
+
+from odoo.addons.wms_wechat.models.wechat_client import TokenCache, http_session
 
 
 @tagged('wms_wechat', 'at_install')
@@ -360,7 +363,7 @@ class TestWmsWechat(TransactionCase):
         self.assertEqual(notification.status, 'read')
         self.assertIsNotNone(notification.date_read)
 
-    @mock.patch('requests.get')
+    @mock.patch.object(http_session, 'get')
     def test_wechat_app_connection_test(self, mock_get):
         """Test WeChat app connection functionality"""
         # Mock the API response
@@ -379,11 +382,15 @@ class TestWmsWechat(TransactionCase):
         self.assertEqual(self.wechat_app.connection_status, 'connected')
         self.assertIsNotNone(self.wechat_app.last_sync)
 
+        # Each test requests a new token from the API
+        self.wechat_app.action_test_connection()
+        self.assertEqual(mock_get.call_count, 2)
+
     def test_wechat_app_get_access_token(self):
         """Test getting access token from WeChat API"""
         # This test would require mocking the API call in a real scenario
         # For now, we'll test the method directly with a mock
-        with mock.patch('requests.get') as mock_get:
+        with mock.patch.object(http_session, 'get') as mock_get:
             mock_get.return_value.json.return_value = {
                 'access_token': 'mocked_token',
                 'expires_in': 7200
@@ -496,4 +503,60 @@ class TestWmsWechat(TransactionCase):
         self.assertEqual(incoming_message.sender_openid, self.wechat_user.openid)
         self.assertEqual(incoming_message.content, 'inventory request')
         self.assertEqual(incoming_message.direction, 'in')
-        self.assertTrue(incoming_message.is_processed)
\ No newline at end of file
+        self.assertTrue(incoming_message.is_processed)
+
+    def test_wechat_access_token_cache(self):
+        """Test that access tokens are cached and renewed once revoked"""
+        message = self.WmsWechatMessage.create({
+            'name': 'TEST_MSG_TOKEN',
+            'message_type': 'text',
+            'sender_openid': self.wechat_app.app_id,
+            'receiver_openid': self.wechat_user.openid,
+            'app_id': self.wechat_app.id,
+            'content': 'Your picking is ready',
+            'direction': 'out',
+        })
+        with mock.patch.object(http_session, 'get') as mock_get, \
+                mock.patch.object(http_session, 'post') as mock_post:
+            mock_get.return_value.json.side_effect = [
+                {'access_token': 'first_token', 'expires_in': 7200},
+                {'access_token': 'second_token', 'expires_in': 7200},
+            ]
+            mock_post.return_value.json.side_effect = [
+                {'errcode': 0, 'msgid': 'MSG1'},
+                {'errcode': 40001, 'errmsg': 'invalid credential'},
+                {'errcode': 0, 'msgid': 'MSG2'},
+            ]
+
+            # The token is requested once for several messages
+            self.assertTrue(message.send_message(self.wechat_user.openid, 'Your picking is ready'))
+            self.assertEqual(self.wechat_app.get_access_token(), 'first_token')
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertEqual(mock_post.call_args.kwargs['params'], {'access_token': 'first_token'})
+
+            # A revoked token is renewed and the message sent again
+            self.assertTrue(message.send_message(self.wechat_user.openid, 'Your picking is ready'))
+            self.assertEqual(mock_get.call_count, 2)
+            self.assertEqual(mock_post.call_args.kwargs['params'], {'access_token': 'second_token'})
+            self.assertEqual(self.wechat_app.access_token, 'second_token')
+
+    def test_wechat_token_refresh_wait(self):
+        """Test that threads stop waiting for a token fetched by another one"""
+        cache = TokenCache()
+        fetch = mock.Mock(return_value=('new_token', 7200))
+        refresh_lock = cache.refresh_locks.setdefault('key', threading.Lock())
+        refresh_lock.acquire()
+        try:
+            with mock.patch('odoo.addons.wms_wechat.models.wechat_client.TOKEN_LOCK_TIMEOUT', 0.01):
+                with self.assertRaises(TimeoutError):
+                    cache.get('key', fetch)
+        finally:
+            refresh_lock.release()
+        fetch.assert_not_called()
+
+        # A forced fetch replaces a token still valid
+        self.assertEqual(cache.get('key', fetch), 'new_token')
+        fetch.return_value = ('forced_token', 7200)
+        self.assertEqual(cache.get('key', fetch), 'new_token')
+        self.assertEqual(cache.get('key', fetch, force=True), 'forced_token')
+        self.assertEqual(fetch.call_count, 2)